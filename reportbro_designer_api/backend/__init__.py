@@ -9,9 +9,11 @@
 from .backends.base import BackendBase
 from .backends.db import DBBackend
 from .backends.s3 import S3Backend
+from .cache import TemplateCache
 
 __all__ = [
     "BackendBase",
     "DBBackend",
     "S3Backend",
+    "TemplateCache",
 ]
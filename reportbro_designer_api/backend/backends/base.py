@@ -6,20 +6,57 @@
 
 @desc: factory
 """
+import base64
+import gzip
+import json
 from abc import ABC
 from abc import abstractmethod
+from typing import Any
+from typing import AsyncIterator
+from typing import Dict
 from typing import List
 from typing import Optional
 from uuid import uuid1
 
 import shortuuid
 
+from ...errors import ClientParamsError
 from .. import schemas as sa
+from ..cache import TemplateCache
+
+# template body encodings, empty means plain json
+CONTENT_ENCODINGS = ("", "gzip")
 
 
 class BackendBase(ABC):
     """BackendBase."""
 
+    project_name: str = "default"
+    template_cache: Optional[TemplateCache] = None
+    content_encoding: str = ""
+
+    @staticmethod
+    def check_content_encoding(encoding: str) -> str:
+        """Check template body encoding supported."""
+        if encoding not in CONTENT_ENCODINGS:
+            raise ValueError(f"content encoding not support[{encoding}]")
+        return encoding
+
+    @staticmethod
+    def encode_report(report: dict, encoding: str = "") -> bytes:
+        """Encode template body as compact json, compressed by encoding."""
+        data = json.dumps(report, separators=(",", ":"), ensure_ascii=False)
+        if encoding == "gzip":
+            return gzip.compress(data.encode("utf8"), mtime=0)
+        return data.encode("utf8")
+
+    @staticmethod
+    def decode_report(data: bytes, encoding: str = "") -> dict:
+        """Decode template body, plain json when no encoding."""
+        if encoding == "gzip":
+            data = gzip.decompress(data)
+        return json.loads(data.decode("utf8"))
+
     def gen_uuid(self) -> str:
         """Generate uuid."""
         return str(uuid1())
@@ -69,6 +106,65 @@ class BackendBase(ABC):
         """Get templates list."""
         raise NotImplementedError
 
+    @staticmethod
+    def encode_cursor(data: Dict[str, Any]) -> str:
+        """Encode opaque page cursor."""
+        body = json.dumps(data, separators=(",", ":"))
+        return base64.urlsafe_b64encode(body.encode("utf8")).decode("utf8")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Dict[str, Any]:
+        """Decode opaque page cursor."""
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode("utf8")))
+        except ValueError as ex:
+            raise ClientParamsError(f"cursor invaild[{cursor}]") from ex
+
+        if not isinstance(data, dict):
+            raise ClientParamsError(f"cursor invaild[{cursor}]")
+        return data
+
+    async def get_templates_page(
+        self,
+        project: Optional[str] = None,
+        template_name: Optional[str] = None,
+        template_type: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> sa.TemplatePage:
+        """Get templates page, cursor is the offset of next page by default."""
+        offset = self.decode_cursor(cursor).get("offset", 0) if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise ClientParamsError(f"cursor invaild[{cursor}]")
+
+        items = await self.get_templates_list(
+            None, None, project, template_name, template_type, limit, offset
+        )
+        next_cursor = None
+        if len(items) >= limit:
+            next_cursor = self.encode_cursor({"offset": offset + len(items)})
+        return sa.TemplatePage(items=items, next_cursor=next_cursor)
+
+    async def iter_templates(
+        self,
+        project: Optional[str] = None,
+        template_name: Optional[str] = None,
+        template_type: Optional[str] = None,
+        page_size: int = 100,
+    ) -> AsyncIterator[sa.TemplateInfo]:
+        """Iterate all templates page by page."""
+        cursor = None
+        while True:
+            page = await self.get_templates_page(
+                project, template_name, template_type, page_size, cursor
+            )
+            for i in page.items:
+                yield i
+
+            if not page.next_cursor:
+                break
+            cursor = page.next_cursor
+
     async def get_templates_version_list(
         self,
         tid: str,
@@ -79,6 +175,24 @@ class BackendBase(ABC):
         """Get templates version list."""
         raise NotImplementedError
 
+    async def get_templates_version_page(
+        self,
+        tid: str,
+        project: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> sa.TemplatePage:
+        """Get templates version page, cursor is the offset of next page by default."""
+        offset = self.decode_cursor(cursor).get("offset", 0) if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise ClientParamsError(f"cursor invaild[{cursor}]")
+
+        items = await self.get_templates_version_list(tid, project, limit, offset)
+        next_cursor = None
+        if len(items) >= limit:
+            next_cursor = self.encode_cursor({"offset": offset + len(items)})
+        return sa.TemplatePage(items=items, next_cursor=next_cursor)
+
     @abstractmethod
     async def get_template(
         self,
@@ -89,6 +203,53 @@ class BackendBase(ABC):
         """Get templates."""
         raise NotImplementedError
 
+    async def get_template_cached(
+        self,
+        tid: str,
+        version_id: Optional[str] = None,
+        project: Optional[str] = None,
+    ) -> Optional[sa.TemplateConfigInfo]:
+        """Get templates, template version is served from template cache.
+
+        Without version_id, the current version_id is resolved from
+        the version cache, so saves are picked up within its ttl.
+        """
+        if self.template_cache is None:
+            return await self.get_template(tid, version_id, project)
+
+        project = project or self.project_name
+        current = not version_id
+        if current:
+            version_id = self.template_cache.get_version(tid, project)
+
+        if version_id:
+            template = self.template_cache.get(tid, version_id, project)
+            if template is not None:
+                return template
+
+        template = await self.get_template(
+            tid, None if current else version_id, project
+        )
+        if template is not None:
+            self.template_cache.set(template, project)
+            if current:
+                self.template_cache.set_version(tid, template.version_id, project)
+        return template
+
+    def invalidate_template_cache(
+        self,
+        tid: str,
+        version_id: Optional[str] = None,
+        project: Optional[str] = None,
+        deleted: bool = False,
+    ):
+        """Invalidate template cache after template saved or deleted."""
+        if self.template_cache is None:
+            return
+
+        project = project or self.project_name
+        self.template_cache.invalidate(tid, version_id, project, deleted)
+
     @abstractmethod
     async def put_template(
         self,
@@ -6,27 +6,55 @@
 
 @desc: sql Api
 """
+import hashlib
+import json
 from contextlib import asynccontextmanager
+from datetime import datetime
 from functools import partial
 from functools import wraps
 from inspect import signature
 from typing import Awaitable
 from typing import Callable
+from typing import Iterable
 from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import Type
 from typing import TypeVar
 from typing import Union
 
+from sqlalchemy import and_
 from sqlalchemy import delete
+from sqlalchemy import exists
+from sqlalchemy import insert
+from sqlalchemy import or_
 from sqlalchemy import select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import load_only
 
+from reportbro_designer_api.errors import BackendError
+
 from .. import models as mm
 from .. import schemas as sa
+from ..cache import TemplateCache
 from .base import BackendBase
+from .base import ClientParamsError
+
+Keyset = Tuple[datetime, str]
+
+# times to insert and lock a content row deleted by a concurrent gc
+CONTENT_PUT_RETRY = 3
+
+
+def make_content_hash(report: dict) -> str:
+    """Make template content hash, same report always get same hash."""
+    body = json.dumps(report, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf8")).hexdigest()
 
 
 def session_begin(session_maker: async_sessionmaker[AsyncSession]):
@@ -90,12 +118,17 @@ class DBBackendClient(object):
         project: str = "default",
         default_template: Optional[dict] = None,
         query_max_limit: int = 1000,
+        template_cache: Optional[TemplateCache] = None,
+        content_encoding: str = "",
     ):
         """init."""
         super().__init__()
         if default_template is None:
             default_template = {}
 
+        self.content_encoding = BackendBase.check_content_encoding(content_encoding)
+
+        self.template_cache = template_cache
         self.project_name = project
         self.async_session = async_session
         self.default_template = default_template
@@ -110,8 +143,7 @@ class DBBackendClient(object):
             await session.execute(delete(tbl))
             await session.commit()
 
-    @provide_db
-    async def _get_template_list(
+    def template_list_query(
         self,
         tid: Optional[str] = None,
         version_id: Optional[str] = None,
@@ -119,10 +151,9 @@ class DBBackendClient(object):
         template_name: Optional[str] = None,
         template_type: Optional[str] = None,
         limit: int = 10,
-        offset: int = 0,
-        session: Optional[AsyncSession] = None,
-    ) -> List[sa.TemplateInfo]:
-        """Get templates."""
+        after: Optional[Keyset] = None,
+    ):
+        """Make templates query, seek rows after (created_at, tid)."""
         query = (
             select(mm.Templates)
             .options(
@@ -136,26 +167,32 @@ class DBBackendClient(object):
                     mm.Templates.project,
                 )
             )
-            .order_by(mm.Templates.created_at.desc())
+            .order_by(mm.Templates.created_at.desc(), mm.Templates.tid.desc())
             .limit(min(limit, self.query_max_limit))
-            .offset(offset)
         )
         query = self.pick_condition(
             query, tid, version_id, project, template_name, template_type
         )
-        assert session
-        results = await session.execute(query)
-        return [sa.TemplateInfo.model_validate(i) for i in results.scalars()]
+        if after:
+            query = query.where(
+                or_(
+                    mm.Templates.created_at < after[0],
+                    and_(
+                        mm.Templates.created_at == after[0],
+                        mm.Templates.tid < after[1],
+                    ),
+                )
+            )
+        return query
 
-    @provide_db
-    async def _get_templates_version_list(
+    def templates_version_query(
         self,
         tid: str,
         project: Optional[str] = None,
         limit: int = 10,
-        offset: int = 0,
-        session: Optional[AsyncSession] = None,
-    ) -> List[sa.TemplateInfo]:
+        after: Optional[Keyset] = None,
+    ):
+        """Make templates version query, seek rows after (created_at, version_id)."""
         query = (
             select(mm.TemplatesVersion)
             .options(
@@ -169,18 +206,98 @@ class DBBackendClient(object):
                     mm.TemplatesVersion.project,
                 )
             )
-            .order_by(mm.TemplatesVersion.created_at.desc())
+            .order_by(
+                mm.TemplatesVersion.created_at.desc(),
+                mm.TemplatesVersion.version_id.desc(),
+            )
             .limit(min(limit, self.query_max_limit))
-            .offset(offset)
         )
         query = self.pick_condition(
             query, tid, None, project, None, None, class_=mm.TemplatesVersion
         )
+        if after:
+            query = query.where(
+                or_(
+                    mm.TemplatesVersion.created_at < after[0],
+                    and_(
+                        mm.TemplatesVersion.created_at == after[0],
+                        mm.TemplatesVersion.version_id < after[1],
+                    ),
+                )
+            )
+        return query
+
+    @provide_db
+    async def _get_template_list(
+        self,
+        tid: Optional[str] = None,
+        version_id: Optional[str] = None,
+        project: Optional[str] = None,
+        template_name: Optional[str] = None,
+        template_type: Optional[str] = None,
+        limit: int = 10,
+        offset: int = 0,
+        session: Optional[AsyncSession] = None,
+    ) -> List[sa.TemplateInfo]:
+        """Get templates."""
+        query = self.template_list_query(
+            tid, version_id, project, template_name, template_type, limit
+        ).offset(offset)
+        assert session
+        results = await session.execute(query)
+        return [sa.TemplateInfo.model_validate(i) for i in results.scalars()]
+
+    @provide_db
+    async def _get_template_page(
+        self,
+        project: Optional[str] = None,
+        template_name: Optional[str] = None,
+        template_type: Optional[str] = None,
+        limit: int = 10,
+        after: Optional[Keyset] = None,
+        session: Optional[AsyncSession] = None,
+    ) -> Tuple[List[sa.TemplateInfo], Optional[Keyset]]:
+        """Get templates page, return the keyset of the last row."""
+        query = self.template_list_query(
+            None, None, project, template_name, template_type, limit, after
+        )
+        assert session
+        results = await session.execute(query)
+        rows = list(results.scalars())
+        last = (rows[-1].created_at, rows[-1].tid) if rows else None
+        return [sa.TemplateInfo.model_validate(i) for i in rows], last
 
+    @provide_db
+    async def _get_templates_version_list(
+        self,
+        tid: str,
+        project: Optional[str] = None,
+        limit: int = 10,
+        offset: int = 0,
+        session: Optional[AsyncSession] = None,
+    ) -> List[sa.TemplateInfo]:
+        query = self.templates_version_query(tid, project, limit).offset(offset)
         assert session
         results = await session.execute(query)
         return [sa.TemplateInfo.from_orm(i) for i in results.scalars()]
 
+    @provide_db
+    async def _get_templates_version_page(
+        self,
+        tid: str,
+        project: Optional[str] = None,
+        limit: int = 10,
+        after: Optional[Keyset] = None,
+        session: Optional[AsyncSession] = None,
+    ) -> Tuple[List[sa.TemplateInfo], Optional[Keyset]]:
+        """Get templates version page, return the keyset of the last row."""
+        query = self.templates_version_query(tid, project, limit, after)
+        assert session
+        results = await session.execute(query)
+        rows = list(results.scalars())
+        last = (rows[-1].created_at, rows[-1].version_id) if rows else None
+        return [sa.TemplateInfo.model_validate(i) for i in rows], last
+
     @provide_db
     async def _is_template_exist(
         self,
@@ -243,6 +360,166 @@ class DBBackendClient(object):
             return None
         return tmp
 
+    @provide_db
+    async def _get_template_body(
+        self,
+        tid: str,
+        version_id: Optional[str] = None,
+        project: Optional[str] = None,
+        session: Optional[AsyncSession] = None,
+    ) -> Optional[Tuple[mm.TemplatesVersion, dict]]:
+        """Get templates version and body, current version when no version_id."""
+        query = (
+            select(
+                mm.TemplatesVersion,
+                mm.TemplatesContent.content_encoding,
+                mm.TemplatesContent.template_config,
+                mm.TemplatesContent.template_body,
+            )
+            .join(
+                mm.TemplatesContent,
+                mm.TemplatesContent.content_hash == mm.TemplatesVersion.content_hash,
+            )
+            .limit(1)
+        )
+        query = self.pick_condition(
+            query, tid, version_id, project, class_=mm.TemplatesVersion
+        )
+        if not version_id:
+            query = query.join(
+                mm.Templates,
+                and_(
+                    mm.Templates.tid == mm.TemplatesVersion.tid,
+                    mm.Templates.project == mm.TemplatesVersion.project,
+                    mm.Templates.version_id == mm.TemplatesVersion.version_id,
+                ),
+            )
+
+        assert session
+        results = await session.execute(query)
+        row = results.first()
+        if not row:
+            return None
+
+        version, content_encoding, template_config, template_body = row
+        if content_encoding:
+            template_config = BackendBase.decode_report(template_body, content_encoding)
+        return version, template_config or {}
+
+    @provide_db
+    async def _put_content(
+        self,
+        report: dict,
+        session: Optional[AsyncSession] = None,
+    ) -> str:
+        """Put templates content when not exist, return content hash."""
+        content_hash = make_content_hash(report)
+        if self.content_encoding:
+            values = dict(
+                content_hash=content_hash,
+                content_encoding=self.content_encoding,
+                template_body=BackendBase.encode_report(report, self.content_encoding),
+            )
+        else:
+            values = dict(content_hash=content_hash, template_config=report)
+
+        assert session
+        conn = await session.connection()
+        # a concurrent save may insert the same content, and a concurrent
+        # delete may gc it, so insert or skip, then lock the row until commit
+        for _ in range(CONTENT_PUT_RETRY):
+            await self._insert_content(conn.dialect.name, values, session=session)
+            if await self._lock_content(content_hash, session=session):
+                return content_hash
+
+        raise BackendError(f"put template content failed[{content_hash}]")
+
+    @provide_db
+    async def _insert_content(
+        self,
+        dialect: str,
+        values: dict,
+        session: Optional[AsyncSession] = None,
+    ):
+        """Insert templates content, do nothing when content exist."""
+        table = mm.TemplatesContent.__table__
+        assert session
+        if dialect == "postgresql":
+            await session.execute(
+                pg_insert(table).values(**values).on_conflict_do_nothing()
+            )
+        elif dialect == "sqlite":
+            await session.execute(
+                sqlite_insert(table).values(**values).on_conflict_do_nothing()
+            )
+        elif dialect == "mysql":
+            query = mysql_insert(table).values(**values)
+            await session.execute(
+                query.on_duplicate_key_update(content_hash=query.inserted.content_hash)
+            )
+        else:
+            try:
+                async with session.begin_nested():
+                    await session.execute(insert(table).values(**values))
+            except IntegrityError:
+                pass
+
+    @provide_db
+    async def _lock_content(
+        self,
+        content_hash: str,
+        session: Optional[AsyncSession] = None,
+    ) -> bool:
+        """Share lock templates content, gc can not delete it until commit."""
+        query = (
+            select(mm.TemplatesContent.content_hash)
+            .where(mm.TemplatesContent.content_hash == content_hash)
+            .with_for_update(read=True)
+        )
+
+        assert session
+        results = await session.execute(query)
+        return results.scalars().first() is not None
+
+    @provide_db
+    async def _gc_contents(
+        self,
+        content_hashes: Iterable[str],
+        session: Optional[AsyncSession] = None,
+    ):
+        """Delete contents not used by any version."""
+        content_hashes = sorted(content_hashes)
+        if not content_hashes:
+            return
+
+        # lock contents first, wait for saves holding a share lock to commit,
+        # so the delete below see their versions
+        query = (
+            select(mm.TemplatesContent.content_hash)
+            .where(mm.TemplatesContent.content_hash.in_(content_hashes))
+            .order_by(mm.TemplatesContent.content_hash)
+            .with_for_update()
+        )
+
+        assert session
+        results = await session.execute(query)
+        content_hashes = list(results.scalars())
+        if not content_hashes:
+            return
+
+        query = (
+            delete(mm.TemplatesContent)
+            .where(
+                mm.TemplatesContent.content_hash.in_(content_hashes),
+                ~exists().where(
+                    mm.TemplatesVersion.content_hash
+                    == mm.TemplatesContent.content_hash
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(query)
+
     @provide_db
     async def _lock_template_versions(
         self,
@@ -255,7 +532,11 @@ class DBBackendClient(object):
             select(mm.TemplatesVersion)
             .options(
                 load_only(
-                    mm.TemplatesVersion.created_at, mm.TemplatesVersion.version_id
+                    mm.TemplatesVersion.created_at,
+                    mm.TemplatesVersion.version_id,
+                    mm.TemplatesVersion.template_name,
+                    mm.TemplatesVersion.template_type,
+                    mm.TemplatesVersion.content_hash,
                 )
             )
             .where(
@@ -314,6 +595,9 @@ class DBBackendClient(object):
         assert session
         # 更新或创建template
         project = self.project_name if not project else project
+        # lock template row before content row, same order as delete and gc
+        templage = await self._get_template(tid, session=session, lock=True)
+        content_hash = await self._put_content(report, session=session)
         add_list: List[Union[mm.TemplatesVersion, mm.Templates]] = [
             mm.TemplatesVersion(
                 tid=tid,
@@ -321,16 +605,14 @@ class DBBackendClient(object):
                 project=project,
                 template_name=template_name,
                 template_type=template_type,
-                template_config=report,
+                content_hash=content_hash,
             ),
         ]
-        templage = await self._get_template(tid, session=session, lock=True)
         if templage:
             templage.project = project
             templage.version_id = version_id
             templage.template_name = template_name
             templage.template_type = template_type
-            templage.template_config = report
 
         else:
             add_list.append(
@@ -340,7 +622,6 @@ class DBBackendClient(object):
                     project=project,
                     template_name=template_name,
                     template_type=template_type,
-                    template_config=report,
                 )
             )
 
@@ -368,7 +649,10 @@ class DBBackendClient(object):
         if not template:
             return
 
+        versions = await self._lock_template_versions(tid, project, session=session)
+        deleted = versions
         if version_id:
+            deleted = [i for i in versions if i.version_id == version_id]
             query = delete(mm.TemplatesVersion).where(
                 mm.TemplatesVersion.tid == tid,
                 mm.TemplatesVersion.version_id == version_id,
@@ -376,7 +660,6 @@ class DBBackendClient(object):
             )
             await session.execute(query)
 
-            versions = await self._lock_template_versions(tid, project, session=session)
             versions = sorted(
                 iter(i for i in versions if i.version_id != version_id),
                 key=lambda x: x.created_at,
@@ -384,14 +667,10 @@ class DBBackendClient(object):
 
             # if version table empty, all file deleted
             if versions:
-                last_version = await self._get_template_version(
-                    tid, versions[-1].version_id, project=project, session=session
-                )
-                assert last_version
+                last_version = versions[-1]
                 template.version_id = last_version.version_id
                 template.template_type = last_version.template_type
                 template.template_name = last_version.template_name
-                template.template_config = last_version.template_config
 
             else:
                 query = delete(mm.Templates).where(
@@ -413,6 +692,8 @@ class DBBackendClient(object):
             )
             await session.execute(query)
 
+        await self._gc_contents({i.content_hash for i in deleted}, session=session)
+
 
 class DBBackend(DBBackendClient, BackendBase):
     """DBBackend."""
@@ -461,6 +742,60 @@ class DBBackend(DBBackendClient, BackendBase):
         r = await self._get_templates_version_list(tid, project, limit, offset)
         return r
 
+    @staticmethod
+    def encode_keyset(created_at: datetime, key: str) -> str:
+        """Encode keyset cursor."""
+        return BackendBase.encode_cursor({"c": created_at.isoformat(), "k": key})
+
+    @staticmethod
+    def decode_keyset(cursor: Optional[str]) -> Optional[Keyset]:
+        """Decode keyset cursor."""
+        if not cursor:
+            return None
+
+        data = BackendBase.decode_cursor(cursor)
+        try:
+            return datetime.fromisoformat(data["c"]), str(data["k"])
+        except (KeyError, TypeError, ValueError) as ex:
+            raise ClientParamsError(f"cursor invaild[{cursor}]") from ex
+
+    async def get_templates_page(
+        self,
+        project: Optional[str] = None,
+        template_name: Optional[str] = None,
+        template_type: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> sa.TemplatePage:
+        """Get templates page, seek by (created_at, tid) of the last row."""
+        project = self.project_name if not project else project
+        limit = min(limit, self.query_max_limit)
+        items, last = await self._get_template_page(
+            project, template_name, template_type, limit, self.decode_keyset(cursor)
+        )
+        next_cursor = None
+        if last and len(items) >= limit:
+            next_cursor = self.encode_keyset(*last)
+        return sa.TemplatePage(items=items, next_cursor=next_cursor)
+
+    async def get_templates_version_page(
+        self,
+        tid: str,
+        project: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> sa.TemplatePage:
+        """Get templates version page, seek by (created_at, version_id) of the last row."""
+        project = self.project_name if not project else project
+        limit = min(limit, self.query_max_limit)
+        items, last = await self._get_templates_version_page(
+            tid, project, limit, self.decode_keyset(cursor)
+        )
+        next_cursor = None
+        if last and len(items) >= limit:
+            next_cursor = self.encode_keyset(*last)
+        return sa.TemplatePage(items=items, next_cursor=next_cursor)
+
     async def get_template(
         self,
         tid: str,
@@ -469,16 +804,13 @@ class DBBackend(DBBackendClient, BackendBase):
     ) -> Optional[sa.TemplateConfigInfo]:
         """Get templates."""
         project = self.project_name if not project else project
-        if version_id:
-            r = await self._get_template_version(tid, version_id, project)
-        else:
-            r = await self._get_template(tid, project)
-
+        r = await self._get_template_body(tid, version_id, project)
         if not r:
             return None
 
-        y = sa.TemplateConfigInfo.from_orm(r)
-        y.report = r.template_config if r.template_config else {}
+        version, template_config = r
+        y = sa.TemplateConfigInfo.from_orm(version)
+        y.report = template_config if template_config else {}
         return y
 
     async def put_template(
@@ -505,6 +837,7 @@ class DBBackend(DBBackendClient, BackendBase):
         r = await self._put_template(
             tid, version_id, template_name, template_type, report, project
         )
+        self.invalidate_template_cache(tid, project=project)
         return r
 
     async def delete_template(
@@ -516,4 +849,5 @@ class DBBackend(DBBackendClient, BackendBase):
         """Delete templates version."""
         project = self.project_name if not project else project
         r = await self._delete_template(tid, version_id, project)
+        self.invalidate_template_cache(tid, version_id, project, deleted=True)
         return r
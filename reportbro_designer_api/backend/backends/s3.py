@@ -7,25 +7,40 @@
 @desc: S3 Api
 """
 
+import asyncio
 import base64
 import json
 from contextlib import asynccontextmanager
 from io import BytesIO
+from typing import Any
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
+
+from botocore.client import ClientError
 
 from reportbro_designer_api.errors import BackendError
+from reportbro_designer_api.utils.cache import LRUCache
+from reportbro_designer_api.utils.logger import LOGGER
 from reportbro_designer_api.utils.s3_client import S3Client
 from reportbro_designer_api.utils.s3_client import hook_create_bucket_when_not_exist
 from reportbro_designer_api.utils.s3_client import hook_object_not_exist
 
 from .. import schemas as sa
+from ..cache import TemplateCache
 from .base import BackendBase
 
+Manifest = Dict[str, Dict[str, Any]]
+
 
 class S3BackendClient:
-    """S3Backend."""
+    """S3Backend.
+
+    Template metadata is kept in a manifest object per project, listing
+    reconcile it with list_objects_v2 ETag and LastModified, and only head
+    the stale objects.
+    """
 
     def __init__(
         self,
@@ -33,15 +48,27 @@ class S3BackendClient:
         project: str = "default",
         default_template: Optional[dict] = None,
         query_max_limit: int = 1000,
+        template_cache: Optional[TemplateCache] = None,
+        head_concurrency: int = 16,
+        content_encoding: str = "",
     ):
         """Init s3."""
         self._s3cli = s3cli
         if default_template is None:
             default_template = {}
 
+        self.content_encoding = BackendBase.check_content_encoding(content_encoding)
+
+        self.template_cache = template_cache
         self.project_name = project
         self.default_template = default_template
         self.query_max_limit = query_max_limit
+        self.head_concurrency = head_concurrency
+        self.manifests: Dict[str, Manifest] = {}
+        # template versions are immutable, cache their metadata
+        self.version_infos: LRUCache[sa.TemplateInfo] = LRUCache(
+            10000, name="s3 template versions"
+        )
 
     @property
     def bucket_name(self):
@@ -86,41 +113,149 @@ class S3BackendClient:
         else:
             return "/".join([self._s3cli.TEMPLATES_PREFIX, project])
 
+    def make_manifest_key(self, project: Optional[str] = None):
+        """Make manifest key."""
+        if not project:
+            project = self.project_name
+
+        return "/".join(
+            [self._s3cli.MANIFEST_PREFIX, self._s3cli.TEMPLATES_PREFIX, project + ".json"]
+        )
+
+    async def _load_manifest(self, client, project: str) -> Manifest:
+        """Load manifest, from memory or s3."""
+        manifest = self.manifests.get(project)
+        if manifest is not None:
+            return manifest
+
+        try:
+            res = await client.get_object(
+                Bucket=self.bucket_name, Key=self.make_manifest_key(project)
+            )
+            manifest = json.loads(await res["Body"].read())
+        except ClientError as ex:
+            if ex.response.get("Error", {}).get("Code", "") not in ["404", "NoSuchKey"]:
+                raise
+            manifest = {}
+
+        self.manifests[project] = manifest
+        return manifest
+
+    async def _save_manifest(self, client, project: str, manifest: Manifest):
+        """Save manifest, failure only make next listing head again."""
+        try:
+            await client.put_object(
+                Bucket=self.bucket_name,
+                Key=self.make_manifest_key(project),
+                Body=BytesIO(json.dumps(manifest).encode()),
+                ContentType="application/json",
+            )
+        except ClientError as ex:
+            LOGGER.warning("save templates manifest failed[%s][%s]", project, ex)
+
+    @staticmethod
+    def is_manifest_fresh(entry: Optional[Dict[str, Any]], obj: dict) -> bool:
+        """Manifest entry match the listed object."""
+        return (
+            entry is not None
+            and entry["etag"] == obj["ETag"]
+            and entry["last_modified"] == obj["LastModified"].isoformat()
+        )
+
+    async def _head_templates(self, client, objs: List[dict]) -> List[sa.TemplateInfo]:
+        """Head objects with bounded concurrency, in order."""
+        semaphore = asyncio.Semaphore(self.head_concurrency)
+
+        async def head_object(obj: dict) -> sa.TemplateInfo:
+            kwargs = {"VersionId": obj["VersionId"]} if obj.get("VersionId") else {}
+            async with semaphore:
+                head = await client.head_object(
+                    Bucket=self.bucket_name, Key=obj["Key"], **kwargs
+                )
+            return self.__conv_dict(obj, head)
+
+        return await asyncio.gather(*[head_object(i) for i in objs])
+
+    async def _reconcile_manifest(
+        self, client, project: str, contents: List[dict], complete: bool
+    ) -> Manifest:
+        """Head stale objects of a listing page into manifest.
+
+        Deleted templates are pruned when the listing is complete.
+        """
+        manifest = await self._load_manifest(client, project)
+        stale = [
+            i for i in contents if not self.is_manifest_fresh(manifest.get(i["Key"]), i)
+        ]
+        for obj, tinfo in zip(stale, await self._head_templates(client, stale)):
+            manifest[obj["Key"]] = {
+                "etag": obj["ETag"],
+                "last_modified": obj["LastModified"].isoformat(),
+                "info": tinfo.model_dump(mode="json"),
+            }
+
+        removed = []
+        if complete:
+            keys = {i["Key"] for i in contents}
+            removed = [i for i in manifest if i not in keys]
+            for key in removed:
+                manifest.pop(key)
+
+        if stale or removed:
+            await self._save_manifest(client, project, manifest)
+        return manifest
+
     @hook_create_bucket_when_not_exist()
-    async def _get_templates_list(
+    async def _get_templates_page(
         self,
-        tid: Optional[str] = None,
-        version_id: Optional[str] = None,
         project: Optional[str] = None,
         template_name: Optional[str] = None,
         template_type: Optional[str] = None,
         limit: int = 10,
-        offset: int = 0,
-    ) -> List[sa.TemplateInfo]:
-        """Get templates list."""
-        assert (
-            (template_name or not template_name)
-            and (version_id or not version_id)
-            and (offset >= 0)
-        )
+        start_after: Optional[str] = None,
+    ) -> Tuple[List[sa.TemplateInfo], Optional[str]]:
+        """Get templates page after the key, filtered by manifest.
 
+        Listing pages are read until the page is filled, return the last key
+        of the page, None when no more templates.
+        """
+        if not project:
+            project = self.project_name
+
+        first_page = not start_after
+        res: List[sa.TemplateInfo] = []
         async with self.s3cli() as client:
             _id_prefix = self.make_template_key(project=project)
-            r = await client.list_objects_v2(
-                Bucket=self.bucket_name, Prefix=_id_prefix, MaxKeys=limit
-            )
-            res = []
-            for obj in r.get("Contents", []):
-                head = await client.head_object(Bucket=self.bucket_name, Key=obj["Key"])
-                tinfo = self.__conv_dict(obj, head)
+            while True:
+                kwargs = {"StartAfter": start_after} if start_after else {}
+                r = await client.list_objects_v2(
+                    Bucket=self.bucket_name,
+                    Prefix=_id_prefix,
+                    MaxKeys=self.query_max_limit,
+                    **kwargs,
+                )
+                contents = r.get("Contents", [])
+                truncated = r.get("IsTruncated", False)
+                manifest = await self._reconcile_manifest(
+                    client, project, contents, first_page and not truncated
+                )
+                for index, obj in enumerate(contents):
+                    tinfo = sa.TemplateInfo(**manifest[obj["Key"]]["info"])
+                    if (template_type and template_type != tinfo.template_type) or (
+                        template_name and template_name != tinfo.template_name
+                    ):
+                        continue
 
-                if (template_type and template_type != tinfo.template_type) or (
-                    template_name and template_name != tinfo.template_name
-                ):
-                    continue
+                    res.append(tinfo)
+                    if len(res) >= limit:
+                        more = truncated or index < len(contents) - 1
+                        return res, obj["Key"] if more else None
 
-                res.append(tinfo)
-            return res
+                if not truncated or not contents:
+                    return res, None
+
+                first_page = False
+                start_after = contents[-1]["Key"]
 
     @classmethod
     def __conv_dict(cls, obj, head):
@@ -141,24 +276,36 @@ class S3BackendClient:
         project: Optional[str] = None,
         limit: int = 10,
         offset: int = 0,
+        version_id_marker: Optional[str] = None,
     ) -> List[sa.TemplateInfo]:
-        """Get templates list."""
+        """Get templates list, list versions after version_id_marker when given."""
         assert offset >= 0
 
         async with self.s3cli() as client:
             _id_prefix = self.make_template_key(tid, project=project)
+            markers = {}
+            if version_id_marker:
+                markers = {"KeyMarker": _id_prefix, "VersionIdMarker": version_id_marker}
+
             r = await client.list_object_versions(
-                Bucket=self.bucket_name, Prefix=_id_prefix, MaxKeys=limit
+                Bucket=self.bucket_name, Prefix=_id_prefix, MaxKeys=limit, **markers
             )
 
+            versions = r.get("Versions", [])
+            stale = [
+                i
+                for i in versions
+                if f"{i['Key']}@{i['VersionId']}" not in self.version_infos
+            ]
+            for obj, tinfo in zip(stale, await self._head_templates(client, stale)):
+                self.version_infos.set(f"{obj['Key']}@{obj['VersionId']}", tinfo, 1)
+
             res = []
-            for obj in r.get("Versions", []):
-                head = await client.head_object(
-                    Bucket=self.bucket_name,
-                    Key=obj["Key"],
-                    VersionId=obj.get("VersionId", ""),
-                )
-                tinfo = self.__conv_dict(obj, head)
+            for obj in versions:
+                tinfo = self.version_infos.get(f"{obj['Key']}@{obj['VersionId']}")
+                if tinfo is None:
+                    # evicted while listing a huge history
+                    tinfo = (await self._head_templates(client, [obj]))[0]
                 res.append(tinfo)
             return res
 
@@ -183,11 +330,18 @@ class S3BackendClient:
 
         object_key = self.make_template_key(tid, project)
         async with self.s3cli() as client:
+            kwargs = {}
+            if self.content_encoding:
+                kwargs["ContentEncoding"] = self.content_encoding
+
             res = await client.put_object(
                 Bucket=self.bucket_name,
                 Key=object_key,
-                Body=BytesIO(json.dumps(report, indent=2).encode()),
+                Body=BytesIO(
+                    BackendBase.encode_report(report, self.content_encoding)
+                ),
                 ContentType="application/json",
+                **kwargs,
                 Metadata=self.encode_matedata(
                     {
                         "template_name": template_name,
@@ -225,7 +379,7 @@ class S3BackendClient:
                 res = await client.get_object(Bucket=self.bucket_name, Key=object_key)
 
             data = await res["Body"].read()
-            body = json.loads(str(data.decode("utf8")))
+            body = BackendBase.decode_report(data, res.get("ContentEncoding", ""))
             if not body and self.default_template:
                 body = self.default_template
 
@@ -276,6 +430,8 @@ class S3Backend(S3BackendClient, BackendBase):
     async def clean_all(self):
         """Clean database, This api only use for test."""
         await self._s3cli.clear_bucket()
+        self.manifests.clear()
+        self.version_infos.clear()
 
     async def is_template_exist(
         self,
@@ -299,10 +455,35 @@ class S3Backend(S3BackendClient, BackendBase):
         offset: int = 0,
     ) -> List[sa.TemplateInfo]:
         """Get templates list."""
-        r = await self._get_templates_list(
-            tid, version_id, project, template_name, template_type, limit, offset
+        assert offset >= 0
+        res: List[sa.TemplateInfo] = []
+        async for i in self.iter_templates(project, template_name, template_type):
+            if offset > 0:
+                offset -= 1
+                continue
+
+            res.append(i)
+            if len(res) >= limit:
+                break
+        return res
+
+    async def get_templates_page(
+        self,
+        project: Optional[str] = None,
+        template_name: Optional[str] = None,
+        template_type: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> sa.TemplatePage:
+        """Get templates page, cursor is the last key of previous page."""
+        start_after = self.decode_cursor(cursor).get("key") if cursor else None
+        items, last_key = await self._get_templates_page(
+            project, template_name, template_type, limit, start_after
+        )
+        return sa.TemplatePage(
+            items=items,
+            next_cursor=self.encode_cursor({"key": last_key}) if last_key else None,
         )
-        return r
 
     async def get_templates_version_list(
         self,
@@ -315,6 +496,23 @@ class S3Backend(S3BackendClient, BackendBase):
         r = await self._get_templates_version_list(tid, project, limit, offset)
         return r
 
+    async def get_templates_version_page(
+        self,
+        tid: str,
+        project: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> sa.TemplatePage:
+        """Get templates version page, cursor is the last version id of previous page."""
+        marker = self.decode_cursor(cursor).get("version_id") if cursor else None
+        items = await self._get_templates_version_list(
+            tid, project, limit, version_id_marker=marker
+        )
+        next_cursor = None
+        if len(items) >= limit:
+            next_cursor = self.encode_cursor({"version_id": items[-1].version_id})
+        return sa.TemplatePage(items=items, next_cursor=next_cursor)
+
     async def get_template(
         self,
         tid: str,
@@ -340,6 +538,7 @@ class S3Backend(S3BackendClient, BackendBase):
         r = await self._put_templates(
             tid, template_name, template_type, report, project
         )
+        self.invalidate_template_cache(tid, project=project)
         return r
 
     async def delete_template(
@@ -350,4 +549,5 @@ class S3Backend(S3BackendClient, BackendBase):
     ):
         """Delete templates version."""
         r = await self._delete_template(tid, version_id, project)
+        self.invalidate_template_cache(tid, version_id, project, deleted=True)
         return r
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 13:21:44.
+
+@author: ppolxda
+
+@desc: Template cache
+"""
+import json
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from ..utils.cache import CacheStats
+from ..utils.cache import LRUCache
+from . import schemas as sa
+
+TemplateKey = Tuple[str, str, str]
+VersionKey = Tuple[str, str]
+
+
+class TemplateCache(object):
+    """Cache of template versions, keyed by (project, tid, version_id).
+
+    A template version never change, so entries never go stale.
+    The report is kept as compact json and loaded on every get,
+    because reportbro write render state back into the report definition.
+
+    The current version of a template is kept as a tid -> version_id pointer,
+    which expire after `version_ttl` seconds or when the template is saved.
+    """
+
+    def __init__(self, max_size: int, version_ttl: float = 0):
+        """__init__."""
+        self.cache: LRUCache[Tuple[sa.TemplateInfo, bytes]] = LRUCache(
+            max_size, name="template"
+        )
+        self.versions: Optional[LRUCache[str]] = None
+        if version_ttl > 0:
+            self.versions = LRUCache(max_size, name="version", ttl=version_ttl)
+
+    @property
+    def stats(self) -> CacheStats:
+        """Cache stats."""
+        return self.cache.stats
+
+    @property
+    def stats_list(self) -> List[CacheStats]:
+        """All cache stats."""
+        if self.versions is None:
+            return [self.cache.stats]
+        return [self.cache.stats, self.versions.stats]
+
+    @staticmethod
+    def make_key(
+        tid: str, version_id: str, project: Optional[str] = None
+    ) -> TemplateKey:
+        """Make cache key."""
+        return (project or "", tid, version_id)
+
+    def get(
+        self, tid: str, version_id: str, project: Optional[str] = None
+    ) -> Optional[sa.TemplateConfigInfo]:
+        """Get template version."""
+        item = self.cache.get(self.make_key(tid, version_id, project))
+        if item is None:
+            return None
+
+        info, report = item
+        return sa.TemplateConfigInfo(**info.model_dump(), report=json.loads(report))
+
+    def set(self, template: sa.TemplateConfigInfo, project: Optional[str] = None):
+        """Set template version."""
+        report = json.dumps(
+            template.report, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf8")
+        info = sa.TemplateInfo(**template.model_dump(exclude={"report"}))
+        self.cache.set(
+            self.make_key(template.tid, template.version_id, project),
+            (info, report),
+            len(report),
+        )
+
+    def get_version(self, tid: str, project: Optional[str] = None) -> Optional[str]:
+        """Get current version_id of template."""
+        if self.versions is None:
+            return None
+        return self.versions.get((project or "", tid))
+
+    def set_version(self, tid: str, version_id: str, project: Optional[str] = None):
+        """Set current version_id of template."""
+        if self.versions is None:
+            return
+        self.versions.set((project or "", tid), version_id, len(tid) + len(version_id))
+
+    def invalidate(
+        self,
+        tid: str,
+        version_id: Optional[str] = None,
+        project: Optional[str] = None,
+        deleted: bool = False,
+    ):
+        """Remove current version_id of template, call after template changed.
+
+        Deleted versions are removed too, all versions when version_id is None.
+        """
+        if self.versions is not None:
+            self.versions.pop((project or "", tid))
+
+        if not deleted:
+            return
+
+        if version_id:
+            self.cache.pop(self.make_key(tid, version_id, project))
+            return
+
+        for key in [i for i in self.cache.data if i[:2] == (project or "", tid)]:
+            self.cache.pop(key)
+
+    def clear(self):
+        """Remove all templates."""
+        self.cache.clear()
+        if self.versions is not None:
+            self.versions.clear()
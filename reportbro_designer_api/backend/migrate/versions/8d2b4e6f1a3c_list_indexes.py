@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""list indexes
+
+Revision ID: 8d2b4e6f1a3c
+Revises: 5c1f0e7a9b2d
+Create Date: 2026-10-18 17:05:31.482916
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2b4e6f1a3c'
+down_revision = '5c1f0e7a9b2d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_templates_project_created_at',
+        'templates',
+        ['project', 'created_at', 'tid'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_templates_project_type_name',
+        'templates',
+        ['project', 'template_type', 'template_name', 'created_at'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_templates_version_project_tid_created_at',
+        'templates_version',
+        ['project', 'tid', 'created_at', 'version_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        'ix_templates_version_project_tid_created_at', table_name='templates_version'
+    )
+    op.drop_index('ix_templates_project_type_name', table_name='templates')
+    op.drop_index('ix_templates_project_created_at', table_name='templates')
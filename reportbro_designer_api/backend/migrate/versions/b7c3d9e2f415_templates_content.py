@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""templates content
+
+Revision ID: b7c3d9e2f415
+Revises: 8d2b4e6f1a3c
+Create Date: 2026-10-18 17:41:08.903127
+
+"""
+import hashlib
+import json
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c3d9e2f415'
+down_revision = '8d2b4e6f1a3c'
+branch_labels = None
+depends_on = None
+
+# versions moved in each batch
+BATCH_SIZE = 500
+
+templates = sa.table(
+    'templates',
+    sa.column('tid', sa.String),
+    sa.column('project', sa.String),
+    sa.column('version_id', sa.String),
+    sa.column('template_config', sa.JSON),
+)
+templates_version = sa.table(
+    'templates_version',
+    sa.column('tid', sa.String),
+    sa.column('version_id', sa.String),
+    sa.column('project', sa.String),
+    sa.column('template_config', sa.JSON),
+    sa.column('content_hash', sa.String),
+)
+templates_content = sa.table(
+    'templates_content',
+    sa.column('content_hash', sa.String),
+    sa.column('template_config', sa.JSON),
+    sa.column('created_at', sa.DateTime),
+    sa.column('updated_at', sa.TIMESTAMP),
+)
+
+
+def make_content_hash(report):
+    # same as backends.db.make_content_hash
+    body = json.dumps(report, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf8")).hexdigest()
+
+
+def upgrade() -> None:
+    op.create_table('templates_content',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('template_config', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.PrimaryKeyConstraint('content_hash')
+    )
+    op.add_column(
+        'templates_version',
+        sa.Column('content_hash', sa.String(length=64), nullable=True),
+    )
+
+    # move version bodies into templates_content, one row per body.
+    # hash is sha256 of canonical json, made in python, so versions are
+    # read in key order batches and written back by executemany
+    conn = op.get_bind()
+    version_key = sa.tuple_(
+        templates_version.c.tid,
+        templates_version.c.project,
+        templates_version.c.version_id,
+    )
+    set_content_hash = (
+        templates_version.update()
+        .where(
+            templates_version.c.tid == sa.bindparam('b_tid'),
+            templates_version.c.project == sa.bindparam('b_project'),
+            templates_version.c.version_id == sa.bindparam('b_version_id'),
+        )
+        .values(content_hash=sa.bindparam('b_content_hash'))
+    )
+    hashes = set()
+    last = None
+    while True:
+        query = (
+            sa.select(
+                templates_version.c.tid,
+                templates_version.c.project,
+                templates_version.c.version_id,
+                templates_version.c.template_config,
+            )
+            .order_by(
+                templates_version.c.tid,
+                templates_version.c.project,
+                templates_version.c.version_id,
+            )
+            .limit(BATCH_SIZE)
+        )
+        if last:
+            query = query.where(version_key > sa.tuple_(*last))
+
+        rows = conn.execute(query).fetchall()
+        if not rows:
+            break
+
+        now = datetime.now()
+        contents = []
+        versions = []
+        for tid, project, version_id, report in rows:
+            content_hash = make_content_hash(report or {})
+            if content_hash not in hashes:
+                hashes.add(content_hash)
+                contents.append(dict(
+                    content_hash=content_hash,
+                    template_config=report or {},
+                    created_at=now,
+                    updated_at=now,
+                ))
+
+            versions.append(dict(
+                b_tid=tid,
+                b_project=project,
+                b_version_id=version_id,
+                b_content_hash=content_hash,
+            ))
+
+        if contents:
+            conn.execute(templates_content.insert(), contents)
+        conn.execute(set_content_hash, versions)
+        last = tuple(rows[-1][:3])
+
+    with op.batch_alter_table('templates_version') as batch_op:
+        batch_op.alter_column(
+            'content_hash', existing_type=sa.String(length=64), nullable=False
+        )
+        batch_op.drop_column('template_config')
+        batch_op.create_index(
+            'ix_templates_version_content_hash', ['content_hash'], unique=False
+        )
+        batch_op.create_foreign_key(
+            'fk_templates_version_content_hash',
+            'templates_content',
+            ['content_hash'],
+            ['content_hash'],
+        )
+
+    with op.batch_alter_table('templates') as batch_op:
+        batch_op.drop_column('template_config')
+
+
+def downgrade() -> None:
+    op.add_column(
+        'templates', sa.Column('template_config', sa.JSON(), nullable=True)
+    )
+    op.add_column(
+        'templates_version', sa.Column('template_config', sa.JSON(), nullable=True)
+    )
+
+    conn = op.get_bind()
+    contents = sa.select(templates_content.c.template_config).where(
+        templates_content.c.content_hash == templates_version.c.content_hash,
+    ).scalar_subquery()
+    conn.execute(templates_version.update().values(template_config=contents))
+
+    versions = sa.select(templates_version.c.template_config).where(
+        templates_version.c.tid == templates.c.tid,
+        templates_version.c.project == templates.c.project,
+        templates_version.c.version_id == templates.c.version_id,
+    ).scalar_subquery()
+    conn.execute(templates.update().values(template_config=versions))
+
+    with op.batch_alter_table('templates_version') as batch_op:
+        batch_op.drop_constraint(
+            'fk_templates_version_content_hash', type_='foreignkey'
+        )
+        batch_op.drop_index('ix_templates_version_content_hash')
+        batch_op.drop_column('content_hash')
+        batch_op.alter_column(
+            'template_config', existing_type=sa.JSON(), nullable=False
+        )
+
+    with op.batch_alter_table('templates') as batch_op:
+        batch_op.alter_column(
+            'template_config', existing_type=sa.JSON(), nullable=False
+        )
+
+    op.drop_table('templates_content')
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""content encoding
+
+Revision ID: c4e8a1f6d209
+Revises: b7c3d9e2f415
+Create Date: 2026-10-18 18:12:47.551093
+
+"""
+import gzip
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a1f6d209'
+down_revision = 'b7c3d9e2f415'
+branch_labels = None
+depends_on = None
+
+templates_content = sa.table(
+    'templates_content',
+    sa.column('content_hash', sa.String),
+    sa.column('content_encoding', sa.String),
+    sa.column('template_config', sa.JSON),
+    sa.column('template_body', sa.LargeBinary),
+)
+
+
+def upgrade() -> None:
+    # existing bodies keep plain json, new bodies saved compressed
+    with op.batch_alter_table('templates_content') as batch_op:
+        batch_op.add_column(sa.Column('content_encoding', sa.String(length=20), nullable=False, server_default=''))
+        batch_op.add_column(sa.Column('template_body', sa.LargeBinary(length=2**32 - 1), nullable=True))
+        batch_op.alter_column('template_config', existing_type=sa.JSON(), nullable=True)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(templates_content.c.content_hash, templates_content.c.template_body)
+        .where(templates_content.c.content_encoding == 'gzip')
+    ).fetchall()
+    for content_hash, template_body in rows:
+        report = json.loads(gzip.decompress(template_body).decode('utf8'))
+        conn.execute(
+            templates_content.update()
+            .where(templates_content.c.content_hash == content_hash)
+            .values(template_config=report)
+        )
+
+    with op.batch_alter_table('templates_content') as batch_op:
+        batch_op.alter_column('template_config', existing_type=sa.JSON(), nullable=False)
+        batch_op.drop_column('template_body')
+        batch_op.drop_column('content_encoding')
@@ -7,11 +7,17 @@
 @desc: model define
 """
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy import JSON
 from sqlalchemy import TIMESTAMP
 from sqlalchemy import DateTime
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import LargeBinary
 from sqlalchemy import String
+from sqlalchemy import Text
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped
@@ -32,27 +38,62 @@ class Base(AsyncAttrs, DeclarativeBase):
     updated_at: Mapped[datetime] = mapped_column("updated_at", TIMESTAMP, default=local_now, nullable=False, onupdate=local_now)  # type: ignore
 
 
+class TemplatesContent(Base):
+    """Templates Content Table, version bodies deduplicated by hash."""
+
+    __tablename__ = "templates_content"
+
+    content_hash: Mapped[str] = mapped_column(String(64), default=str, nullable=False, primary_key=True)  # type: ignore
+    # empty means body saved in template_config, otherwise compressed in template_body
+    content_encoding: Mapped[str] = mapped_column(String(20), default=str, nullable=False)  # type: ignore
+    template_config: Mapped[Optional[dict]] = mapped_column(JSON(none_as_null=True), nullable=True)  # type: ignore
+    template_body: Mapped[Optional[bytes]] = mapped_column(LargeBinary(2**32 - 1), nullable=True)  # type: ignore
+
+
 class TemplatesVersion(Base):
     """Templates Table."""
 
     __tablename__ = "templates_version"
+    __table_args__ = (
+        # versions page seek by (created_at, version_id)
+        Index("ix_templates_version_project_tid_created_at", "project", "tid", "created_at", "version_id"),
+    )
 
     tid: Mapped[str] = mapped_column(String(50), default=str, nullable=False, primary_key=True)  # type: ignore
     version_id: Mapped[str] = mapped_column(String(50), default=str, nullable=False, primary_key=True)  # type: ignore
     project: Mapped[str] = mapped_column(String(30), default=str, nullable=False, primary_key=True)  # type: ignore
     template_name: Mapped[str] = mapped_column(String(30), default=str, nullable=False)  # type: ignore
     template_type: Mapped[str] = mapped_column(String(30), default=str, nullable=False)  # type: ignore
-    template_config: Mapped[dict] = mapped_column(JSON, default=dict, nullable=False)  # type: ignore
+    content_hash: Mapped[str] = mapped_column(String(64), ForeignKey("templates_content.content_hash"), nullable=False, index=True)  # type: ignore
 
 
 class Templates(Base):
-    """Templates Table."""
+    """Templates Table, version_id point to the current version."""
 
     __tablename__ = "templates"
+    __table_args__ = (
+        # templates page seek by (created_at, tid)
+        Index("ix_templates_project_created_at", "project", "created_at", "tid"),
+        Index("ix_templates_project_type_name", "project", "template_type", "template_name", "created_at"),
+    )
 
     tid: Mapped[str] = mapped_column(String(50), default=str, nullable=False, primary_key=True)  # type: ignore
     project: Mapped[str] = mapped_column(String(30), default=str, nullable=False, primary_key=True)  # type: ignore
     version_id: Mapped[str] = mapped_column(String(50), default=str, nullable=False)  # type: ignore
     template_name: Mapped[str] = mapped_column(String(30), default=str, nullable=False)  # type: ignore
     template_type: Mapped[str] = mapped_column(String(30), default=str, nullable=False)  # type: ignore
-    template_config: Mapped[dict] = mapped_column(JSON, default=dict, nullable=False)  # type: ignore
+
+
+class RenderJobs(Base):
+    """Render Jobs Table."""
+
+    __tablename__ = "render_jobs"
+
+    job_id: Mapped[str] = mapped_column(String(50), default=str, nullable=False, primary_key=True)  # type: ignore
+    project: Mapped[str] = mapped_column(String(30), default=str, nullable=False, primary_key=True)  # type: ignore
+    tid: Mapped[str] = mapped_column(String(50), default=str, nullable=False)  # type: ignore
+    version_id: Mapped[str] = mapped_column(String(50), default=str, nullable=False)  # type: ignore
+    status: Mapped[str] = mapped_column(String(20), default=str, nullable=False)  # type: ignore
+    progress: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # type: ignore
+    download_key: Mapped[str] = mapped_column(Text, default=str, nullable=False)  # type: ignore
+    error: Mapped[str] = mapped_column(Text, default=str, nullable=False)  # type: ignore
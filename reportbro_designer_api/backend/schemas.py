@@ -8,6 +8,8 @@
 """
 
 from datetime import datetime
+from typing import List
+from typing import Optional
 
 from pydantic import Field
 
@@ -39,3 +41,12 @@ class TemplateConfigInfo(TemplateInfo):
     """TemplateConfigInfo."""
 
     report: dict = Field(default_factory=dict, title="Templage config")
+
+
+class TemplatePage(BaseModel):
+    """TemplatePage."""
+
+    items: List[TemplateInfo] = Field(default_factory=list, title="Templates")
+    next_cursor: Optional[str] = Field(
+        None, title="Cursor of next page, None when no more"
+    )
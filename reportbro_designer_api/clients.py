@@ -6,8 +6,12 @@
 
 @desc: clients
 """
+import asyncio
+import importlib
 import json
 from functools import lru_cache
+from typing import List
+from typing import Optional
 from urllib.parse import parse_qs
 from urllib.parse import urlparse
 
@@ -21,14 +25,27 @@ from sqlalchemy.orm.session import sessionmaker
 from .backend import BackendBase
 from .backend import DBBackend
 from .backend import S3Backend
+from .backend import TemplateCache
+from .jobs import DBJobStore
+from .jobs import JobMange
+from .jobs import JobStoreBase
+from .jobs import MemoryJobStore
+from .jobs import S3JobStore
 from .settings import settings
 from .storage import LocalStorage
 from .storage import S3Storage
 from .storage import StorageMange
+from .utils.http_client import HttpClient
+from .utils.logger import LOGGER
+from .utils.render import RenderDispatcher
+from .utils.render import RenderExecutorMode
 from .utils.report import ReportFontsLoader
+from .utils.report import warmup_report
 from .utils.s3_client import S3Client
 
-FONTS_LOADER = ReportFontsLoader(settings.FONTS_PATH)
+FONTS_LOADER = ReportFontsLoader(
+    settings.FONTS_PATH, settings.FONTS_CACHE_PATH, settings.FONTS_SUBSET_CACHE_SIZE
+)
 
 
 def load_default_template():
@@ -59,6 +76,7 @@ def create_s3_client(db_url) -> S3Client:
 
     query_params = parse_qs(url_.query)
     region_name = query_params.get("region_name", ["us-west-1"])[0]
+    max_pool_connections = int(query_params.get("max_pool_connections", [50])[0])
 
     return S3Client(
         aws_access_key_id=url_.username or "minioadmin",
@@ -66,9 +84,48 @@ def create_s3_client(db_url) -> S3Client:
         endpoint_url=endpoint_url,
         region_name=region_name or "us-west-1",
         bucket=url_.path[1:] or "reportbro",
+        max_pool_connections=max_pool_connections,
     )
 
 
+def is_s3_url(db_url: str) -> bool:
+    """Is s3 url."""
+    return db_url.startswith("s3://") or db_url.startswith("ss3://")
+
+
+@lru_cache()
+def get_s3_client(db_url: str) -> S3Client:
+    """Get s3 client shared by backend, storage and job store of the url."""
+    return create_s3_client(db_url)
+
+
+def get_s3_clients() -> List[S3Client]:
+    """Get s3 clients of configured urls."""
+    db_urls = [settings.DB_URL, settings.STORAGE_URL, settings.JOB_STORE_URL]
+    return [get_s3_client(i) for i in dict.fromkeys(db_urls) if is_s3_url(i)]
+
+
+async def open_s3_clients():
+    """Open long-lived s3 clients, call on startup."""
+    for s3cli in get_s3_clients():
+        await s3cli.open()
+
+
+async def bootstrap_s3_clients():
+    """Bootstrap buckets, failed bucket is bootstrapped on first use."""
+    for s3cli in get_s3_clients():
+        try:
+            await asyncio.wait_for(s3cli.bootstrap(), settings.S3_BOOTSTRAP_TIMEOUT)
+        except Exception as ex:  # pylint: disable=broad-except
+            LOGGER.warning("bootstrap bucket failed[%s][%s]", s3cli.bucket_name, ex)
+
+
+async def close_s3_clients():
+    """Close long-lived s3 clients, call on shutdown."""
+    for s3cli in get_s3_clients():
+        await s3cli.close()
+
+
 def __create_db_engine(db_url: str, is_async=True):
     """Create Datebase engin."""
     if is_async:
@@ -86,7 +143,7 @@ def __create_db_engine(db_url: str, is_async=True):
     print_sql = bool(query_params.get("print_sql", [False])[0])
     db_url = db_url.split("?")[0]
 
-    if settings.DB_URL.startswith("sqlite"):
+    if db_url.startswith("sqlite"):
         engine = create_engine_(
             db_url,
             echo=print_sql,
@@ -149,6 +206,16 @@ def create_db_asyncsessionmaker(db_url: str) -> async_sessionmaker:
     )
 
 
+def create_template_cache() -> Optional[TemplateCache]:
+    """Create template cache."""
+    if settings.TEMPLATE_CACHE_SIZE <= 0:
+        return None
+    return TemplateCache(
+        settings.TEMPLATE_CACHE_SIZE,
+        version_ttl=settings.TEMPLATE_VERSION_CACHE_TTL,
+    )
+
+
 def create_db_backend(db_url: str) -> DBBackend:
     """Create Datebase client."""
     asyncsessionmaker = create_db_asyncsessionmaker(db_url)
@@ -156,16 +223,21 @@ def create_db_backend(db_url: str) -> DBBackend:
     return DBBackend(
         asyncsessionmaker,
         default_template=defdata,
+        template_cache=create_template_cache(),
+        content_encoding=settings.TEMPLATE_CONTENT_ENCODING,
     )
 
 
 def create_s3_backend(db_url: str) -> S3Backend:
     """Get s3 client."""
     defdata = load_default_template()
-    s3cli = create_s3_client(db_url)
+    s3cli = get_s3_client(db_url)
     return S3Backend(
         s3cli,
         default_template=defdata,
+        template_cache=create_template_cache(),
+        head_concurrency=settings.S3_HEAD_CONCURRENCY,
+        content_encoding=settings.TEMPLATE_CONTENT_ENCODING,
     )
 
 
@@ -184,12 +256,16 @@ def create_local_storage(db_url):
     url_ = urlparse(db_url)
     query_params = parse_qs(url_.query)
     storage_local_ttl = int(query_params.get("storage_local_ttl", [5])[0])
-    return LocalStorage(url_.path or "./data", storage_local_ttl)
+    return LocalStorage(
+        url_.path or "./data",
+        storage_local_ttl,
+        sweep_interval=settings.STORAGE_SWEEP_INTERVAL,
+    )
 
 
 def create_s3_storage(db_url: str):
     """Create S3 storage."""
-    s3cli = create_s3_client(db_url)
+    s3cli = get_s3_client(db_url)
     return S3Storage(s3cli)
 
 
@@ -216,3 +292,64 @@ def create_s3_storage_manage():
 def get_storage_mange():
     """Get S3 storage manage."""
     return create_s3_storage_manage()
+
+
+def init_render_worker():
+    """Render worker initializer, preload reportbro stack and fonts."""
+    importlib.import_module("reportbro_designer_api.endpoints.reportbro_api")
+    warmup_report(FONTS_LOADER)
+
+
+def create_render_dispatcher() -> RenderDispatcher:
+    """Create render dispatcher."""
+    mode = settings.RENDER_EXECUTOR
+    if not mode:
+        mode = (
+            RenderExecutorMode.PROCESS.value
+            if settings.PROCESS_POOL_SIZE > 0
+            else RenderExecutorMode.THREAD.value
+        )
+
+    return RenderDispatcher(
+        mode,
+        pool_size=settings.RENDER_POOL_SIZE or settings.PROCESS_POOL_SIZE,
+        queue_size=settings.RENDER_QUEUE_SIZE,
+        timeout=settings.RENDER_TIMEOUT,
+        initializer=init_render_worker if settings.RENDER_WARMUP else None,
+        max_tasks_per_child=settings.RENDER_MAX_TASKS_PER_CHILD,
+        max_memory=settings.RENDER_MAX_MEMORY,
+    )
+
+
+@lru_cache()
+def get_render_dispatcher() -> RenderDispatcher:
+    """Get render dispatcher."""
+    return create_render_dispatcher()
+
+
+@lru_cache()
+def get_http_client() -> HttpClient:
+    """Get shared http client."""
+    return HttpClient(
+        timeout=settings.DOWNLOAD_TIMEOUT,
+        pool_size=settings.DOWNLOAD_POOL_SIZE,
+        concurrency=settings.DOWNLOAD_CONCURRENCY,
+    )
+
+
+def create_job_store(db_url: str) -> JobStoreBase:
+    """Create job store."""
+    if db_url.startswith("memory://"):
+        return MemoryJobStore(job_ttl=settings.JOB_TTL)
+    elif db_url.startswith("s3://") or db_url.startswith("ss3://"):
+        return S3JobStore(get_s3_client(db_url), job_ttl=settings.JOB_TTL)
+    else:
+        return DBJobStore(
+            create_db_asyncsessionmaker(db_url), job_ttl=settings.JOB_TTL
+        )
+
+
+@lru_cache()
+def get_job_mange() -> JobMange:
+    """Get job manage."""
+    return JobMange(create_job_store(settings.JOB_STORE_URL))
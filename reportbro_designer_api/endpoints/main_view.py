@@ -6,8 +6,17 @@
 
 @desc: main_page_view
 """
+import asyncio
+
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from fastapi.responses import RedirectResponse
+from starlette.status import HTTP_200_OK
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+
+from ..clients import get_s3_clients
+from ..settings import settings
+from ..utils.model import ErrorResponse
 
 router = APIRouter()
 
@@ -16,3 +25,35 @@ router = APIRouter()
 async def main_index_page():
     """Web main page."""
     return RedirectResponse("/ui")
+
+
+@router.get("/health", name="Health check", response_model=ErrorResponse)
+async def health_check():
+    """Service is alive."""
+    return ErrorResponse(code=HTTP_200_OK, error="ok")
+
+
+@router.get("/health/ready", name="Readiness check", response_model=ErrorResponse)
+async def readiness_check():
+    """Service is ready when s3 buckets are bootstrapped.
+
+    Bucket not ready is bootstrapped again, so the pod become ready once
+    the storage is reachable.
+    """
+    not_ready = []
+    for s3cli in get_s3_clients():
+        try:
+            await asyncio.wait_for(s3cli.bootstrap(), settings.S3_BOOTSTRAP_TIMEOUT)
+        except Exception:  # pylint: disable=broad-except
+            not_ready.append(s3cli.bucket_name)
+
+    if not_ready:
+        return JSONResponse(
+            ErrorResponse(
+                code=HTTP_503_SERVICE_UNAVAILABLE,
+                error=f"s3 bucket not ready[{','.join(not_ready)}]",
+            ).dict(),
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    return ErrorResponse(code=HTTP_200_OK, error="ok")
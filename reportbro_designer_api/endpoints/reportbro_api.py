@@ -8,25 +8,32 @@
 """
 
 import asyncio
+import hashlib
 import json
 import os
 import traceback
-from concurrent.futures import ProcessPoolExecutor
+import zipfile
+from collections import deque
+from dataclasses import asdict
 from datetime import datetime
 from enum import Enum
-from functools import partial
-from io import BytesIO
+from tempfile import SpooledTemporaryFile
 from timeit import default_timer as timer
+from typing import IO
+from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Deque
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Tuple
 from typing import Union
 from urllib.parse import urlencode
 
-import aiohttp
-import filetype
-import PyPDF2
-from aiohttp import ClientTimeout
+import shortuuid
 from fastapi import APIRouter
 from fastapi import BackgroundTasks
 from fastapi import Depends
@@ -35,23 +42,55 @@ from fastapi import Path
 from fastapi import Query
 from fastapi import Request
 from fastapi.responses import PlainTextResponse
+from fastapi.responses import RedirectResponse
+from fastapi.responses import Response
 from fastapi.responses import StreamingResponse
 from reportbro import ReportBroError
+from starlette.concurrency import run_in_threadpool
 from starlette.status import HTTP_200_OK
+from starlette.status import HTTP_206_PARTIAL_CONTENT
+from starlette.status import HTTP_304_NOT_MODIFIED
+from starlette.status import HTTP_307_TEMPORARY_REDIRECT
 from starlette.status import HTTP_400_BAD_REQUEST
+from starlette.status import HTTP_404_NOT_FOUND
+from starlette.status import HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
 
 from ..backend.backends.base import BackendBase
+from ..backend.schemas import TemplateConfigInfo
 from ..clients import FONTS_LOADER
 from ..clients import StorageMange
+from ..clients import get_http_client
+from ..clients import get_job_mange
 from ..clients import get_meth_cli
+from ..clients import get_render_dispatcher
 from ..clients import get_storage_mange
+from ..errors import ClientParamsError
+from ..errors import ReportbroError
 from ..errors import TemplageNotFoundError
+from ..jobs import JobInfo
+from ..jobs import JobMange
+from ..jobs.mange import ProgressFunc
 from ..settings import settings
+from ..storage.storages.base import FileBuffer
+from ..utils.http_client import HttpClient
 from ..utils.logger import LOGGER
 from ..utils.model import ErrorResponse
+from ..utils.pdf import PdfFile
+from ..utils.pdf import PdfMergeFile
+from ..utils.pdf import spool_file
+from ..utils.pdf import spool_pdf
+from ..utils.render import RenderDispatcher
 from ..utils.report import ReportPdf
 from ..utils.report import fill_default
+from .reportbro_schema import BatchGenerateData
+from .reportbro_schema import BatchGenerateItem
+from .reportbro_schema import BatchGenerateResponse
+from .reportbro_schema import CacheStatsData
+from .reportbro_schema import CacheStatsResponse
+from .reportbro_schema import JobData
+from .reportbro_schema import JobResponse
 from .reportbro_schema import PdfData
+from .reportbro_schema import RequestBatchGenerateTemplate
 from .reportbro_schema import RequestCloneTemplate
 from .reportbro_schema import RequestCreateTemplate
 from .reportbro_schema import RequestGenerateDataTemplate
@@ -73,15 +112,13 @@ from .reportbro_schema import TemplateListResponse
 router = APIRouter()
 TAGS: List[Union[str, Enum]] = ["ReportBro Api"]
 GEN_TAGS: List[Union[str, Enum]] = ["ReportBro Generate Api"]
+MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
 # templates = Jinja2Templates(directory=settings.TEMPLATES_PATH)
 
 
-def is_pdf(data: bytes):
-    """is_pdf."""
-    rtype = filetype.guess(data)
-    return rtype and rtype.extension == "pdf"
-
-
 @router.get(
     "/templates/list",
     tags=TAGS,
@@ -90,13 +127,34 @@ def is_pdf(data: bytes):
 )
 async def main_index_page(
     request: Request,
+    limit: int = Query(
+        settings.PAGE_LIMIT, title="Page size", ge=1, le=settings.PAGE_LIMIT
+    ),
+    cursor: Optional[str] = Query(None, title="Cursor of page, from nextCursor"),
+    template_name: Optional[str] = Query(
+        None, title="Filter by template name", alias="templateName"
+    ),
+    template_type: Optional[str] = Query(
+        None, title="Filter by template type", alias="templateType"
+    ),
     client: BackendBase = Depends(get_meth_cli),
 ):
     """Get templates List."""
-    list_ = await client.get_templates_list(limit=settings.PAGE_LIMIT)
+    try:
+        page = await client.get_templates_page(
+            template_name=template_name,
+            template_type=template_type,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ClientParamsError as ex:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(ex)) from ex
+
+    list_ = page.items
     return TemplateListResponse(
         code=HTTP_200_OK,
         error="ok",
+        next_cursor=page.next_cursor,
         data=[
             TemplateListData(
                 **{
@@ -120,13 +178,23 @@ async def main_index_page(
 async def get_versions(
     request: Request,
     tid: str = Path(title="Template id"),
+    limit: int = Query(
+        settings.PAGE_LIMIT, title="Page size", ge=1, le=settings.PAGE_LIMIT
+    ),
+    cursor: Optional[str] = Query(None, title="Cursor of page, from nextCursor"),
     client: BackendBase = Depends(get_meth_cli),
 ):
     """Get templates List."""
-    list_ = await client.get_templates_version_list(tid)
+    try:
+        page = await client.get_templates_version_page(tid, limit=limit, cursor=cursor)
+    except ClientParamsError as ex:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(ex)) from ex
+
+    list_ = page.items
     return TemplateListResponse(
         code=HTTP_200_OK,
         error="ok",
+        next_cursor=page.next_cursor,
         data=[
             TemplateListData(
                 **{
@@ -349,6 +417,27 @@ async def delete_templates(
     return ErrorResponse(code=HTTP_200_OK, error="ok")
 
 
+@router.get(
+    "/cache/stats",
+    tags=TAGS,
+    name="Get cache stats",
+    response_model=CacheStatsResponse,
+)
+async def get_cache_stats(
+    client: BackendBase = Depends(get_meth_cli),
+):
+    """Get cache stats."""
+    stats = []
+    if client.template_cache is not None:
+        stats.extend(client.template_cache.stats_list)
+
+    return CacheStatsResponse(
+        code=HTTP_200_OK,
+        error="ok",
+        data=[CacheStatsData(**asdict(i)) for i in stats],
+    )
+
+
 # ----------------------------------------------
 #        PDF REPORT Generate
 # ----------------------------------------------
@@ -402,7 +491,7 @@ def gen_file_from_report(
         else:
             report_file = report.generate_xlsx()
             filename = "report-" + str(now) + ".xlsx"
-            assert isinstance(report_file, bytearray)
+            assert isinstance(report_file, (bytes, bytearray))
             return filename, bytes(report_file)
     except ReportBroError as ex:
         # in case an error occurs during report report generate
@@ -418,30 +507,287 @@ def gen_file_from_report(
         LOGGER.info("pdf generated in %.3f seconds", (end - start))
 
 
-async def read_file_in_s3(output_format, key, client: StorageMange):
-    """Read file in s3."""
+def gen_file_from_template(
+    output_format, template, data, disabled_fill
+) -> Tuple[str, bytes]:
+    """Batch item Generate, template is the json shared by batch items.
+
+    Each item loads its own definition, rendering changes the definition.
+    """
+    return gen_file_from_report(
+        output_format, json.loads(template), data, False, disabled_fill
+    )
+
+
+def make_render_hash(
+    tid: str, version_id: str, output_format: str, data: dict, disabled_fill: bool
+) -> str:
+    """Hash render inputs, data is canonicalized by sorted keys."""
+    body = json.dumps(
+        [tid, version_id, output_format, data, disabled_fill],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(body.encode("utf8")).hexdigest()
+
+
+def make_render_filename(
+    templage: TemplateConfigInfo, output_format: str, data: dict, disabled_fill: bool
+) -> str:
+    """Make render cache filename, empty when render cache disabled."""
+    if settings.RENDER_CACHE_TTL <= 0 or output_format not in MEDIA_TYPES:
+        return ""
+
+    render_hash = make_render_hash(
+        templage.tid, templage.version_id, output_format, data, disabled_fill
+    )
+    return f"report-{render_hash}.{output_format}"
+
+
+async def render_file_cached(
+    render: RenderDispatcher,
+    storage: StorageMange,
+    templage: TemplateConfigInfo,
+    output_format: str,
+    data: dict,
+    disabled_fill: bool,
+) -> str:
+    """Render template and put file, return download key.
+
+    With RENDER_CACHE_TTL, the file is stored by the hash of render inputs,
+    an identical render return the stored file while it is younger than ttl.
+    """
+    filename = make_render_filename(templage, output_format, data, disabled_fill)
+    if filename:
+        download_key = await storage.get_file_cached(
+            filename, settings.RENDER_CACHE_TTL
+        )
+        if download_key:
+            return download_key
+
+    report_filename, report_file = await render.run(
+        gen_file_from_report,
+        output_format,
+        templage.report,
+        data,
+        False,
+        disabled_fill,
+    )
+    assert report_file
+    return await storage.put_file(filename or report_filename, report_file)
+
+
+async def make_presigned_url(
+    storage: StorageMange, download_key: str
+) -> Optional[str]:
+    """Make presigned url of file, None when disabled or storage not support it."""
+    if not settings.PRESIGNED_URL_ENABLED:
+        return None
+
+    return await storage.get_presigned_url(
+        download_key, settings.PRESIGNED_URL_EXPIRES
+    )
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single bytes range to (start, end), None means whole file.
+
+    Invalid or multiple ranges are ignored, unsatisfiable range raise 416.
+    """
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return None
+
+    start_str, _, end_str = range_header[6:].strip().partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            # suffix range, last N bytes, zero length is not satisfiable
+            suffix = int(end_str)
+            start = max(size - suffix, 0) if suffix > 0 else size
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start < 0 or (end < start and start < size):
+        return None
+
+    if start >= size:
+        raise HTTPException(
+            status_code=HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+    return start, min(end, size - 1)
+
+
+def is_etag_match(if_none_match: str, etag: str) -> bool:
+    """Weak compare etag with If-None-Match header."""
+    if if_none_match.strip() == "*":
+        return True
+
+    def strip_weak(tag: str) -> str:
+        return tag[2:] if tag.startswith("W/") else tag
+
+    etag = strip_weak(etag)
+    return any(strip_weak(i.strip()) == etag for i in if_none_match.split(","))
+
+
+async def prefetch_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Read first chunk before the response starts.
+
+    A file removed after stat raise its error here, not in a started response.
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+
+    async def iter_chunks():
+        if first:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return iter_chunks()
+
+
+async def stream_file_response(
+    storage: StorageMange,
+    key: str,
+    media_type: str,
+    request: Optional[Request] = None,
+    disposition: str = "inline",
+) -> Response:
+    """Stream stored file in chunks.
+
+    With request, If-None-Match is answered by 304, and a single bytes Range
+    is answered by 206.
+    """
+    filename, fstat = await storage.stat_file(key)
+    headers = {
+        "Content-Disposition": f'{disposition}; filename="{filename}"',
+        "Accept-Ranges": "bytes",
+    }
+    if fstat.etag:
+        headers["ETag"] = fstat.etag
+
+    if_none_match = request.headers.get("if-none-match") if request else None
+    if if_none_match and fstat.etag and is_etag_match(if_none_match, fstat.etag):
+        return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+
+    file_range = None
+    if request is not None:
+        file_range = parse_range(request.headers.get("range", ""), fstat.size)
+
+    if file_range is None:
+        headers["Content-Length"] = str(fstat.size)
+        return StreamingResponse(
+            await prefetch_chunks(storage.iter_file(key)),
+            media_type=media_type,
+            headers=headers,
+        )
+
+    start, end = file_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{fstat.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        await prefetch_chunks(storage.iter_file(key, start, end)),
+        status_code=HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+async def read_file_in_s3(
+    output_format,
+    key,
+    client: StorageMange,
+    redirect: bool = False,
+    request: Optional[Request] = None,
+):
+    """Read file in s3.
+
+    With redirect, response 307 to a presigned url, when presigned url
+    disabled or storage not support it, fall back to proxy the file.
+    """
     if output_format not in ("pdf", "xlsx"):
         raise HTTPException(
             status_code=HTTP_400_BAD_REQUEST,
             detail="outputFormat parameter missing or invalid",
         )
 
-    filename, report_file = await client.get_file(key)
+    if redirect:
+        presigned_url = await make_presigned_url(client, key)
+        if presigned_url:
+            return RedirectResponse(
+                presigned_url, status_code=HTTP_307_TEMPORARY_REDIRECT
+            )
 
-    if output_format == "pdf":
-        response = StreamingResponse(
-            BytesIO(report_file),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f'inline; filename="{filename}"'},
-        )
-    else:
-        response = StreamingResponse(
-            BytesIO(report_file),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f'inline; filename="{filename}"'},
+    return await stream_file_response(
+        client, key, MEDIA_TYPES[output_format], request
+    )
+
+
+async def write_behind_file(
+    storage: StorageMange, filename: str, report_file: FileBuffer
+):
+    """Put file to storage after response, file object is closed when done."""
+    if isinstance(report_file, bytes):
+        await storage.put_file(filename, report_file)
+        return
+
+    try:
+        report_file.seek(0)
+        await storage.put_file(filename, report_file)
+    finally:
+        report_file.close()
+
+
+def iter_file_buffer(fss: IO[bytes], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Read file object in chunks."""
+    fss.seek(0)
+    while True:
+        chunk = fss.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def make_inline_response(
+    output_format: str,
+    filename: str,
+    report_file: FileBuffer,
+    background_tasks: BackgroundTasks,
+    storage: Optional[StorageMange] = None,
+) -> Response:
+    """Return rendered file in response.
+
+    When storage given, the file is written to storage after the response
+    is sent, and its download key is returned in X-Download-Key header.
+    File object is closed after the response.
+    """
+    headers = {"Content-Disposition": f'inline; filename="{filename}"'}
+    if storage is not None:
+        headers["X-Download-Key"] = storage.make_file_download_key(filename)
+        background_tasks.add_task(write_behind_file, storage, filename, report_file)
+    elif not isinstance(report_file, bytes):
+        background_tasks.add_task(report_file.close)
+
+    if isinstance(report_file, bytes):
+        return Response(
+            report_file, media_type=MEDIA_TYPES[output_format], headers=headers
         )
 
-    return response
+    return StreamingResponse(
+        iter_file_buffer(report_file),
+        media_type=MEDIA_TYPES[output_format],
+        headers=headers,
+    )
 
 
 @router.put(
@@ -455,14 +801,37 @@ async def review_templates_gen(
     disabled_fill: bool = Query(
         default=False, title="Disable fill empty fields for input data"
     ),
+    delivery: str = Query(
+        "key",
+        title="Delivery(key|inline), inline return file in response",
+        pattern=r"^(key|inline)$",
+    ),
+    store: bool = Query(
+        default=False, title="Write inline file to storage after response"
+    ),
     storage: StorageMange = Depends(get_storage_mange),
+    render: RenderDispatcher = Depends(get_render_dispatcher),
 ):
     """Review Templates Generate."""
-    filename, report_file = gen_file_from_report(
-        req.output_format, req.report, req.data, req.is_test_data, disabled_fill
+    filename, report_file = await render.run(
+        gen_file_from_report,
+        req.output_format,
+        req.report,
+        req.data,
+        req.is_test_data,
+        disabled_fill,
     )
     assert report_file
-    key = await storage.put_file(filename, report_file, background_tasks)
+    if delivery == "inline":
+        return make_inline_response(
+            req.output_format,
+            filename,
+            report_file,
+            background_tasks,
+            storage if store else None,
+        )
+
+    key = await storage.put_file(filename, report_file)
     return PlainTextResponse(key)
 
 
@@ -472,14 +841,18 @@ async def review_templates_gen(
     name="Get generate preview file",
 )
 async def review_templates(
+    request: Request,
     output_format: str = Query(
         "pdf", title="Output Format(pdf|xlsx)", pattern=r"^(pdf|xlsx)$"
     ),
     key: str = Query(title="File Key", min_length=16),
+    redirect: bool = Query(
+        default=False, title="Redirect to presigned url, when storage support it"
+    ),
     storage: StorageMange = Depends(get_storage_mange),
 ):
     """Review Templates."""
-    r = await read_file_in_s3(output_format, key, storage)
+    r = await read_file_in_s3(output_format, key, storage, redirect, request)
     return r
 
 
@@ -496,14 +869,37 @@ async def review_templates_gen_download(
     disabled_fill: bool = Query(
         default=False, title="Disable fill empty fields for input data"
     ),
+    delivery: str = Query(
+        "key",
+        title="Delivery(key|inline), inline return file in response",
+        pattern=r"^(key|inline)$",
+    ),
+    store: bool = Query(
+        default=False, title="Write inline file to storage after response"
+    ),
     storage: StorageMange = Depends(get_storage_mange),
+    render: RenderDispatcher = Depends(get_render_dispatcher),
 ):
     """Review Templates Generate."""
-    filename, report_file = gen_file_from_report(
-        req.output_format, req.report, req.data, req.is_test_data, disabled_fill
+    filename, report_file = await render.run(
+        gen_file_from_report,
+        req.output_format,
+        req.report,
+        req.data,
+        req.is_test_data,
+        disabled_fill,
     )
     assert report_file
-    download_key = await storage.put_file(filename, report_file, background_tasks)
+    if delivery == "inline":
+        return make_inline_response(
+            req.output_format,
+            filename,
+            report_file,
+            background_tasks,
+            storage if store else None,
+        )
+
+    download_key = await storage.put_file(filename, report_file)
     return TemplateDownLoadResponse(
         code=HTTP_200_OK,
         error="ok",
@@ -518,6 +914,7 @@ async def review_templates_gen_download(
                     "key": download_key,
                 }
             ),
+            presigned_url=await make_presigned_url(storage, download_key),
         ),
     )
 
@@ -527,73 +924,150 @@ async def review_templates_gen_download(
 # ----------------------------------------------
 
 
-def generate_pdf_mutil(
+async def generate_pdf_mutil(
+    render: RenderDispatcher,
     output_format: str,
     disabled_fill: bool,
     req: Union[
         PdfData,
         RequestGenerateReviewTemplate,
     ],
-):
+) -> PdfData:
     """Review Templates Generate."""
+    if isinstance(req, PdfData):
+        return req
+
+    if not isinstance(req, RequestGenerateReviewTemplate):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="templates is invaild",
+        )
+
+    filename, report_file = await render.run(
+        gen_file_from_report,
+        output_format,
+        req.report,
+        req.data,
+        False,
+        disabled_fill,
+    )
+    return PdfData(filename=filename, report_file=report_file)
+
+
+async def generate_pdf_spooled(
+    render: RenderDispatcher,
+    output_format: str,
+    disabled_fill: bool,
+    req: Union[
+        PdfFile,
+        RequestGenerateReviewTemplate,
+    ],
+) -> PdfFile:
+    """Generate pdf and spool it to a temp file as soon as it completes."""
+    if isinstance(req, PdfFile):
+        return req
+
+    data = await generate_pdf_mutil(render, output_format, disabled_fill, req)
+    return PdfFile(
+        filename=data.filename,
+        report_file=spool_file(data.report_file, settings.SPOOL_MAX_SIZE),
+    )
+
+
+async def iter_file_chunks(path: str, chunk_size: int = 64 * 1024):
+    """Read local file in chunks, each read run in thread."""
+    fss = await run_in_threadpool(open, path, "rb")
     try:
-        if isinstance(req, PdfData):
-            return req
+        while True:
+            chunk = await run_in_threadpool(fss.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fss.close()
 
-        elif isinstance(req, RequestGenerateReviewTemplate):
-            filename, report_file = gen_file_from_report(
-                output_format,
-                req.report,
-                req.data,
-                False,
-                disabled_fill,
-            )
-            return PdfData(filename=filename, report_file=report_file)
 
-        else:
+async def download_pdf(http: HttpClient, pdf_url: str) -> PdfFile:
+    """Download PDF to a spooled temp file."""
+    filename = os.path.basename(pdf_url)
+    if pdf_url.startswith("file://"):
+        report_file = await spool_pdf(
+            iter_file_chunks(pdf_url[7:]),
+            settings.DOWNLOAD_MAX_SIZE,
+            settings.SPOOL_MAX_SIZE,
+        )
+        return PdfFile(filename=filename, report_file=report_file)
+
+    async with http.get(pdf_url) as resp:
+        assert resp.status == 200
+        if (
+            settings.DOWNLOAD_MAX_SIZE > 0
+            and resp.content_length
+            and resp.content_length > settings.DOWNLOAD_MAX_SIZE
+        ):
             raise HTTPException(
                 status_code=HTTP_400_BAD_REQUEST,
-                detail="templates is invaild",
+                detail=f"pdf_url is too large, over {settings.DOWNLOAD_MAX_SIZE} bytes",
             )
-    except HTTPException as ex:
-        return ex.detail
 
-    except Exception as ex:
-        # return Exception
-        return str(ex)
+        report_file = await spool_pdf(
+            resp.content.iter_chunked(64 * 1024),
+            settings.DOWNLOAD_MAX_SIZE,
+            settings.SPOOL_MAX_SIZE,
+        )
+        return PdfFile(filename=filename, report_file=report_file)
 
 
-async def download_pdf(pdf_url):
-    """Download PDF."""
-    if pdf_url.startswith("file://"):
-        with open(pdf_url[7:], "rb") as fss:
-            data = fss.read()
-        filename, report_file = os.path.basename(pdf_url), data
-    else:
-        timeout = ClientTimeout(total=settings.DOWNLOAD_TIMEOUT)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(pdf_url) as resp:
-                assert resp.status == 200
-                data = await resp.read()
-                filename, report_file = os.path.basename(pdf_url), data
-
-    if not is_pdf(report_file):
-        raise HTTPException(
-            status_code=HTTP_400_BAD_REQUEST,
-            detail="pdf_url is not pdf file",
-        )
+async def download_template(http: HttpClient, pdf_url: str):
+    """Download Template."""
+    async with http.get(pdf_url) as resp:
+        assert resp.status == 200
+        data = await resp.json()
+        return data
 
-    return PdfData(filename=filename, report_file=report_file)
 
+def close_pdf_files(items: Iterable[Any]):
+    """Close pdf files in items."""
+    for i in items:
+        if isinstance(i, PdfFile):
+            i.close()
 
-async def download_template(pdf_url):
-    """Download Template."""
-    timeout = ClientTimeout(total=settings.DOWNLOAD_TIMEOUT)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        async with session.get(pdf_url) as resp:
-            assert resp.status == 200
-            data = await resp.json()
-            return data
+
+async def resolve_template(
+    http: HttpClient,
+    client: BackendBase,
+    req: Union[
+        RequestGenerateUrlTemplate,
+        RequestGenerateTUrlTemplate,
+        RequestGenerateDataTemplate,
+        RequestGenerateReviewTemplate,
+    ],
+) -> Union[PdfFile, RequestGenerateReviewTemplate]:
+    """Resolve request template to pdf file or report definition."""
+    if isinstance(req, RequestGenerateUrlTemplate):
+        return await download_pdf(http, req.pdf_url)
+
+    if isinstance(req, RequestGenerateTUrlTemplate):
+        templage = await download_template(http, req.report_url)
+        if not templage:
+            raise TemplageNotFoundError("template not found")
+
+        return RequestGenerateReviewTemplate(report=templage, data=req.data)
+
+    if isinstance(req, RequestGenerateDataTemplate):
+        templage = await client.get_template_cached(req.tid, req.version_id)
+        if not templage:
+            raise TemplageNotFoundError("template not found")
+
+        return RequestGenerateReviewTemplate(report=templage.report, data=req.data)
+
+    if isinstance(req, RequestGenerateReviewTemplate):
+        return req
+
+    raise HTTPException(
+        status_code=HTTP_400_BAD_REQUEST,
+        detail="templates is invaild",
+    )
 
 
 @router.put(
@@ -610,7 +1084,17 @@ async def generate_templates_multi_gen(
         default=False, title="Disable fill empty fields for input data"
     ),
     client: BackendBase = Depends(get_meth_cli),
+    delivery: str = Query(
+        "key",
+        title="Delivery(key|inline), inline return file in response",
+        pattern=r"^(key|inline)$",
+    ),
+    store: bool = Query(
+        default=False, title="Write inline file to storage after response"
+    ),
     storage: StorageMange = Depends(get_storage_mange),
+    render: RenderDispatcher = Depends(get_render_dispatcher),
+    http: HttpClient = Depends(get_http_client),
 ):
     """Review Templates Generate."""
     if not req.templates:
@@ -619,74 +1103,60 @@ async def generate_templates_multi_gen(
             detail="templates is empty",
         )
 
-    templates = []
-
-    # check request templates
-    for i in req.templates:
-        if isinstance(i, RequestGenerateUrlTemplate):
-            report_data = await download_pdf(i.pdf_url)
-            templates.append(report_data)
-
-        elif isinstance(i, RequestGenerateTUrlTemplate):
-            templage = await download_template(i.report_url)
-            if not templage:
-                raise TemplageNotFoundError("template not found")
-
-            templates.append(
-                RequestGenerateReviewTemplate(report=templage, data=i.data)
-            )
-
-        elif isinstance(i, RequestGenerateDataTemplate):
-            templage = await client.get_template(i.tid, i.version_id)
-            if not templage:
-                raise TemplageNotFoundError("template not found")
-
-            templates.append(
-                RequestGenerateReviewTemplate(report=templage.report, data=i.data)
-            )
-
-        elif isinstance(i, RequestGenerateReviewTemplate):
-            templates.append(i)
+    # resolve request templates concurrently, in request order
+    tasks = [
+        asyncio.ensure_future(resolve_template(http, client, i))
+        for i in req.templates
+    ]
+    try:
+        templates = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        close_pdf_files(
+            task.result()
+            for task in tasks
+            if task.done() and not task.cancelled() and task.exception() is None
+        )
+        raise
 
-        else:
-            raise HTTPException(
-                status_code=HTTP_400_BAD_REQUEST,
-                detail="templates is invaild",
-            )
     filename = ""
-    merge_file = PyPDF2.PdfFileMerger()
-    generate_pdf_mutil_ = partial(generate_pdf_mutil, req.output_format, disabled_fill)
-    pools: ProcessPoolExecutor = request.app.state.executor
-    if pools:
-        loop = asyncio.get_event_loop()
-        futures = [
-            loop.run_in_executor(pools, generate_pdf_mutil_, i) for i in templates
-        ]
-        results = await asyncio.gather(*futures)
-        for data in results:
-            if isinstance(data, str):
-                raise HTTPException(
-                    status_code=HTTP_400_BAD_REQUEST,
-                    detail=data,
+    tasks = [
+        asyncio.ensure_future(
+            generate_pdf_spooled(render, req.output_format, disabled_fill, i)
+        )
+        for i in templates
+    ]
+    try:
+        with PdfMergeFile(settings.SPOOL_MAX_SIZE) as merge_file:
+            # append in request order, while later renders keep running
+            for task in tasks:
+                pdf_file = await task
+                filename = pdf_file.filename
+                merge_file.append(pdf_file.report_file)
+
+            output = merge_file.write()
+            if delivery == "inline":
+                return make_inline_response(
+                    "pdf",
+                    filename,
+                    output,
+                    background_tasks,
+                    storage if store else None,
                 )
 
-            filename = data.filename
-            merge_file.append(
-                PyPDF2.PdfFileReader(stream=BytesIO(initial_bytes=data.report_file))
-            )
-    else:
-        for template in templates:
-            filename = data.filename
-            data = generate_pdf_mutil_(template)
-            merge_file.append(
-                PyPDF2.PdfFileReader(stream=BytesIO(initial_bytes=data.report_file))
-            )
-
-    rrr = BytesIO()
-    merge_file.write(rrr)
-    rrr.seek(0)
+            with output:
+                download_key = await storage.put_file(filename, output)
+    finally:
+        for task in tasks:
+            task.cancel()
+        close_pdf_files(
+            task.result()
+            for task in tasks
+            if task.done() and not task.cancelled() and task.exception() is None
+        )
+        close_pdf_files(templates)
 
-    download_key = await storage.put_file(filename, rrr.read(), background_tasks)
     return TemplateDownLoadResponse(
         code=HTTP_200_OK,
         error="ok",
@@ -701,6 +1171,7 @@ async def generate_templates_multi_gen(
                     "key": download_key,
                 }
             ),
+            presigned_url=await make_presigned_url(storage, download_key),
         ),
     )
 
@@ -711,11 +1182,15 @@ async def generate_templates_multi_gen(
     name="Get generate file from multiple template",
 )
 async def generate_templates_multi(
+    request: Request,
     key: str = Query(title="File Key", min_length=16),
+    redirect: bool = Query(
+        default=False, title="Redirect to presigned url, when storage support it"
+    ),
     storage: StorageMange = Depends(get_storage_mange),
 ):
     """Review Templates."""
-    r = await read_file_in_s3("pdf", key, storage)
+    r = await read_file_in_s3("pdf", key, storage, redirect, request)
     return r
 
 
@@ -741,19 +1216,53 @@ async def generate_templates_gen(
     disabled_fill: bool = Query(
         default=False, title="Disable fill empty fields for input data"
     ),
+    delivery: str = Query(
+        "key",
+        title="Delivery(key|inline), inline return file in response",
+        pattern=r"^(key|inline)$",
+    ),
+    store: bool = Query(
+        default=False, title="Write inline file to storage after response"
+    ),
     client: BackendBase = Depends(get_meth_cli),
     storage: StorageMange = Depends(get_storage_mange),
+    render: RenderDispatcher = Depends(get_render_dispatcher),
 ):
     """Review Templates Generate."""
-    templage = await client.get_template(tid, version_id)
+    templage = await client.get_template_cached(tid, version_id)
     if not templage:
         raise TemplageNotFoundError("template not found")
 
-    filename, report_file = gen_file_from_report(
-        req.output_format, templage.report, req.data, False, disabled_fill
+    if delivery == "inline":
+        # hash data before render, fill_default change data in thread mode
+        cache_filename = make_render_filename(
+            templage, req.output_format, req.data, disabled_fill
+        )
+        filename, report_file = await render.run(
+            gen_file_from_report,
+            req.output_format,
+            templage.report,
+            req.data,
+            False,
+            disabled_fill,
+        )
+        # write behind to render cache filename, reused by later renders
+        return make_inline_response(
+            req.output_format,
+            (cache_filename or filename) if store else filename,
+            report_file,
+            background_tasks,
+            storage if store else None,
+        )
+
+    download_key = await render_file_cached(
+        render,
+        storage,
+        templage,
+        req.output_format,
+        req.data,
+        disabled_fill,
     )
-    assert report_file
-    download_key = await storage.put_file(filename, report_file, background_tasks)
     return TemplateDownLoadResponse(
         code=HTTP_200_OK,
         error="ok",
@@ -766,22 +1275,370 @@ async def generate_templates_gen(
                     "key": download_key,
                 }
             ),
+            presigned_url=await make_presigned_url(storage, download_key),
         ),
     )
 
 
+def make_job_data(request: Request, job: JobInfo) -> JobData:
+    """Make job response data."""
+    data = JobData(**job.model_dump())
+    if job.download_key:
+        data.download_url = (
+            str(request.url_for("Get generate file", tid=job.tid))
+            + "?"
+            + urlencode({"key": job.download_key})
+        )
+    return data
+
+
+@router.put(
+    "/templates/{tid}/generate/jobs",
+    tags=GEN_TAGS,
+    name="Create generate job",
+    response_model=JobResponse,
+)
+async def generate_templates_job(
+    request: Request,
+    req: RequestGenerateTemplate,
+    tid: str = Path(title="Template id"),
+    version_id: Optional[str] = Query(
+        None, title="Template version id", alias="versionId"
+    ),
+    disabled_fill: bool = Query(
+        default=False, title="Disable fill empty fields for input data"
+    ),
+    client: BackendBase = Depends(get_meth_cli),
+    storage: StorageMange = Depends(get_storage_mange),
+    render: RenderDispatcher = Depends(get_render_dispatcher),
+    jobs: JobMange = Depends(get_job_mange),
+):
+    """Generate file in background job, poll the job for download key."""
+    templage = await client.get_template_cached(tid, version_id)
+    if not templage:
+        raise TemplageNotFoundError("template not found")
+
+    async def run(progress: ProgressFunc) -> str:
+        await progress(10)
+        return await render_file_cached(
+            render, storage, templage, req.output_format, req.data, disabled_fill
+        )
+
+    job = await jobs.create_job(tid, templage.version_id)
+    jobs.submit(job, run)
+    return JobResponse(code=HTTP_200_OK, error="ok", data=make_job_data(request, job))
+
+
+@router.get(
+    "/templates/{tid}/generate/jobs/{job_id}",
+    tags=GEN_TAGS,
+    name="Get generate job",
+    response_model=JobResponse,
+)
+async def get_generate_templates_job(
+    request: Request,
+    tid: str = Path(title="Template id"),
+    job_id: str = Path(title="Job id"),
+    jobs: JobMange = Depends(get_job_mange),
+):
+    """Get generate job status."""
+    job = await jobs.get_job(job_id)
+    if not job or job.tid != tid:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="job not found")
+
+    return JobResponse(code=HTTP_200_OK, error="ok", data=make_job_data(request, job))
+
+
 @router.get(
     "/templates/{tid}/generate",
     tags=GEN_TAGS,
     name="Get generate file",
 )
 async def generate_templates(
+    request: Request,
     output_format: str = Query(
         "pdf", title="Output Format(pdf|xlsx)", pattern=r"^(pdf|xlsx)$"
     ),
     key: str = Query(title="File Key", min_length=16),
+    redirect: bool = Query(
+        default=False, title="Redirect to presigned url, when storage support it"
+    ),
     storage: StorageMange = Depends(get_storage_mange),
 ):
     """Review Templates."""
-    r = await read_file_in_s3(output_format, key, storage)
+    r = await read_file_in_s3(output_format, key, storage, redirect, request)
     return r
+
+
+# ----------------------------------------------
+#        PDF REPORT Batch Generate
+# ----------------------------------------------
+
+BatchResult = Tuple[BatchGenerateItem, Optional[Tuple[str, bytes]]]
+
+
+def make_batch_filename(filename: str, batch_id: str, index: int) -> str:
+    """Make unique filename for batch item."""
+    name, ext = os.path.splitext(filename)
+    return f"{name}-{batch_id}-{index}{ext}"
+
+
+async def iter_batch_datas(datas: List[dict]) -> AsyncIterator[dict]:
+    """Iter batch data list."""
+    for data in datas:
+        yield data
+
+
+async def iter_batch_ndjson(request: Request) -> AsyncIterator[dict]:
+    """Iter batch data from ndjson body, lines are read as body streamed in."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield parse_ndjson_line(line)
+
+    if buffer.strip():
+        yield parse_ndjson_line(buffer)
+
+
+def parse_ndjson_line(line: bytes) -> dict:
+    """Parse ndjson line."""
+    try:
+        data = json.loads(line)
+    except ValueError as ex:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"ndjson line invaild[{ex}]",
+        ) from ex
+
+    if not isinstance(data, dict):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="ndjson line must be a json object",
+        )
+    return data
+
+
+async def render_batch(
+    render: RenderDispatcher,
+    output_format: str,
+    report: dict,
+    datas: AsyncIterator[dict],
+    disabled_fill: bool,
+    put_file: Optional[Callable[[str, bytes], Awaitable[str]]] = None,
+) -> AsyncIterator[BatchResult]:
+    """Render batch items in order, with bounded renders in flight.
+
+    Items are uploaded by put_file when given, otherwise the rendered file
+    is yielded with the item. A failed item is reported in item error.
+    """
+    concurrency = settings.BATCH_CONCURRENCY or render.pool_size
+    batch_id = shortuuid.uuid()[:8]
+    # serialized once, items send the text instead of a copy of the definition
+    template = json.dumps(report)
+
+    async def render_item(index: int, data: dict) -> BatchResult:
+        item = BatchGenerateItem(index=index)
+        try:
+            filename, report_file = await render.run(
+                gen_file_from_template,
+                output_format,
+                template,
+                data,
+                disabled_fill,
+            )
+            filename = make_batch_filename(filename, batch_id, index)
+            if put_file is None:
+                return item, (filename, report_file)
+
+            item.download_key = await put_file(filename, report_file)
+        except HTTPException as ex:
+            item.error = str(ex.detail)
+        except ReportbroError as ex:
+            item.error = str(ex)
+        return item, None
+
+    pending: Deque["asyncio.Future[BatchResult]"] = deque()
+    try:
+        index = 0
+        async for data in datas:
+            if index >= settings.BATCH_MAX_ITEMS:
+                raise HTTPException(
+                    status_code=HTTP_400_BAD_REQUEST,
+                    detail=f"batch items over limit[{settings.BATCH_MAX_ITEMS}]",
+                )
+
+            if len(pending) >= concurrency:
+                yield await pending.popleft()
+
+            pending.append(asyncio.ensure_future(render_item(index, data)))
+            index += 1
+
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def generate_batch(
+    request: Request,
+    tid: str,
+    version_id: Optional[str],
+    output_format: str,
+    datas: AsyncIterator[dict],
+    disabled_fill: bool,
+    output_zip: bool,
+    client: BackendBase,
+    storage: StorageMange,
+    render: RenderDispatcher,
+) -> BatchGenerateResponse:
+    """Generate batch files from one template."""
+    templage = await client.get_template_cached(tid, version_id)
+    if not templage:
+        raise TemplageNotFoundError("template not found")
+
+    async def put_file(filename: str, report_file: bytes) -> str:
+        return await storage.put_file(filename, report_file)
+
+    result = BatchGenerateData()
+    if not output_zip:
+        async for item, _ in render_batch(
+            render, output_format, templage.report, datas, disabled_fill, put_file
+        ):
+            if item.download_key:
+                item.download_url = (
+                    str(request.url_for("Get generate file", tid=tid))
+                    + "?"
+                    + urlencode({"output_format": output_format, "key": item.download_key})
+                )
+            result.items.append(item)
+
+        return BatchGenerateResponse(code=HTTP_200_OK, error="ok", data=result)
+
+    with SpooledTemporaryFile(max_size=settings.SPOOL_MAX_SIZE) as output:
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as zip_file:
+            async for item, report in render_batch(
+                render, output_format, templage.report, datas, disabled_fill
+            ):
+                result.items.append(item)
+                if report is not None:
+                    zip_file.writestr(report[0], report[1])
+
+        if not any(not i.error for i in result.items):
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail=result.items[0].error if result.items else "datas is empty",
+            )
+
+        output.seek(0)
+        filename = "report-" + datetime.now().strftime("%Y%m%d%H%M%S") + ".zip"
+        result.download_key = await storage.put_file(
+            make_batch_filename(filename, shortuuid.uuid()[:8], 0), output
+        )
+
+    result.download_url = (
+        str(request.url_for("Get batch generate zip file", tid=tid))
+        + "?"
+        + urlencode({"key": result.download_key})
+    )
+    return BatchGenerateResponse(code=HTTP_200_OK, error="ok", data=result)
+
+
+@router.put(
+    "/templates/{tid}/generate/batch",
+    tags=GEN_TAGS,
+    name="Batch generate files from template",
+    response_model=BatchGenerateResponse,
+)
+async def generate_templates_batch(
+    request: Request,
+    req: RequestBatchGenerateTemplate,
+    tid: str = Path(title="Template id"),
+    version_id: Optional[str] = Query(
+        None, title="Template version id", alias="versionId"
+    ),
+    disabled_fill: bool = Query(
+        default=False, title="Disable fill empty fields for input data"
+    ),
+    output_zip: bool = Query(
+        default=False, title="Output one zip file", alias="outputZip"
+    ),
+    client: BackendBase = Depends(get_meth_cli),
+    storage: StorageMange = Depends(get_storage_mange),
+    render: RenderDispatcher = Depends(get_render_dispatcher),
+):
+    """Generate one file for each data, the template is loaded once."""
+    return await generate_batch(
+        request,
+        tid,
+        version_id,
+        req.output_format,
+        iter_batch_datas(req.datas),
+        disabled_fill,
+        output_zip,
+        client,
+        storage,
+        render,
+    )
+
+
+@router.put(
+    "/templates/{tid}/generate/batch/ndjson",
+    tags=GEN_TAGS,
+    name="Batch generate files from template by ndjson",
+    response_model=BatchGenerateResponse,
+)
+async def generate_templates_batch_ndjson(
+    request: Request,
+    tid: str = Path(title="Template id"),
+    version_id: Optional[str] = Query(
+        None, title="Template version id", alias="versionId"
+    ),
+    output_format: str = Query(
+        "pdf",
+        title="Output Format(pdf|xlsx)",
+        pattern=r"^(pdf|xlsx)$",
+        alias="outputFormat",
+    ),
+    disabled_fill: bool = Query(
+        default=False, title="Disable fill empty fields for input data"
+    ),
+    output_zip: bool = Query(
+        default=False, title="Output one zip file", alias="outputZip"
+    ),
+    client: BackendBase = Depends(get_meth_cli),
+    storage: StorageMange = Depends(get_storage_mange),
+    render: RenderDispatcher = Depends(get_render_dispatcher),
+):
+    """Generate one file for each ndjson line, renders start as lines arrive."""
+    return await generate_batch(
+        request,
+        tid,
+        version_id,
+        output_format,
+        iter_batch_ndjson(request),
+        disabled_fill,
+        output_zip,
+        client,
+        storage,
+        render,
+    )
+
+
+@router.get(
+    "/templates/{tid}/generate/batch",
+    tags=GEN_TAGS,
+    name="Get batch generate zip file",
+)
+async def generate_templates_batch_zip(
+    request: Request,
+    key: str = Query(title="File Key", min_length=16),
+    storage: StorageMange = Depends(get_storage_mange),
+):
+    """Get batch generate zip file."""
+    return await stream_file_response(
+        storage, key, "application/zip", request, disposition="attachment"
+    )
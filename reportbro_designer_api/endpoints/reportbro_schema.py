@@ -14,6 +14,7 @@ from typing import Union
 from pydantic import Field
 
 from reportbro_designer_api.backend import schemas as ss
+from reportbro_designer_api.jobs import JobInfo
 from reportbro_designer_api.utils.model import BaseModel
 from reportbro_designer_api.utils.model import DataResponse
 from reportbro_designer_api.utils.model import ListResponse
@@ -36,6 +37,44 @@ class TemplateDownLoadData(BaseModel):
 
     download_key: str = Field(title="Pdf download key")
     download_url: str = Field(title="Pdf download url")
+    presigned_url: Optional[str] = Field(
+        None, title="Short-lived url to download from storage directly"
+    )
+
+
+class BatchGenerateItem(BaseModel):
+    """BatchGenerateItem."""
+
+    index: int = Field(title="Index of data in request")
+    download_key: str = Field("", title="Pdf download key, empty in zip output")
+    download_url: str = Field("", title="Pdf download url, empty in zip output")
+    error: str = Field("", title="Error message, set when render failed")
+
+
+class BatchGenerateData(BaseModel):
+    """BatchGenerateData."""
+
+    items: List[BatchGenerateItem] = Field(default_factory=list, title="Items")
+    download_key: str = Field("", title="Zip download key, set in zip output")
+    download_url: str = Field("", title="Zip download url, set in zip output")
+
+
+class JobData(JobInfo):
+    """JobData."""
+
+    download_url: str = Field("", title="Pdf download url, set when job success")
+
+
+class CacheStatsData(BaseModel):
+    """CacheStatsData."""
+
+    name: str = Field(title="Cache name")
+    hits: int = Field(title="Cache hits")
+    misses: int = Field(title="Cache misses")
+    evictions: int = Field(title="Cache evictions")
+    items: int = Field(title="Cache items")
+    size: int = Field(title="Cache size in bytes")
+    max_size: int = Field(title="Cache max size in bytes")
 
 
 class RequestCreateTemplate(ss.BaseTemplate):
@@ -92,6 +131,15 @@ class PdfData(BaseModel):
     report_file: bytes = Field(default_factory=dict, title="Pdf Data")
 
 
+class RequestBatchGenerateTemplate(BaseModel):
+    """RequestBatchGenerateTemplate."""
+
+    output_format: str = Field(
+        "pdf", title="Output Format(pdf|xlsx)", pattern=r"^(pdf|xlsx)$"
+    )
+    datas: List[dict] = Field(default_factory=list, title="Source Data list")
+
+
 class RequestMultiGenerateTemplate(BaseModel):
     """RequestMultiGenerateTemplate."""
 
@@ -125,6 +173,10 @@ class RequestCloneTemplate(BaseModel):
 class TemplateListResponse(ListResponse[TemplateListData]):
     """TemplateListResponse."""
 
+    next_cursor: Optional[str] = Field(
+        None, title="Cursor of next page, None when no more"
+    )
+
 
 class TemplateDescResponse(DataResponse[TemplateDescData]):
     """TemplateDescResponse."""
@@ -136,3 +188,15 @@ class TemplateDataResponse(DataResponse[TemplateListData]):
 
 class TemplateDownLoadResponse(DataResponse[TemplateDownLoadData]):
     """TemplateDownLoadResponse."""
+
+
+class BatchGenerateResponse(DataResponse[BatchGenerateData]):
+    """BatchGenerateResponse."""
+
+
+class JobResponse(DataResponse[JobData]):
+    """JobResponse."""
+
+
+class CacheStatsResponse(ListResponse[CacheStatsData]):
+    """CacheStatsResponse."""
@@ -38,3 +38,25 @@ class S3ClientError(ReportbroError):
 
 class ClientParamsError(ReportbroError):
     """ClientParamsError."""
+
+
+class RenderError(ReportbroError):
+    """RenderError, raised in render worker and picklable across processes."""
+
+    def __init__(self, status_code: int, detail: str):
+        """__init__."""
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+    def __str__(self):
+        """__str__."""
+        return str(self.detail)
+
+
+class RenderQueueFullError(ReportbroError):
+    """RenderQueueFullError."""
+
+
+class RenderTimeoutError(ReportbroError):
+    """RenderTimeoutError."""
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 15:28:04.
+
+@author: ppolxda
+
+@desc: Render jobs
+"""
+from .mange import JobMange
+from .schemas import JobInfo
+from .schemas import JobStatus
+from .stores.base import JobStoreBase
+from .stores.db import DBJobStore
+from .stores.memory import MemoryJobStore
+from .stores.s3 import S3JobStore
+
+__all__ = [
+    "JobInfo",
+    "JobStatus",
+    "JobStoreBase",
+    "DBJobStore",
+    "MemoryJobStore",
+    "S3JobStore",
+    "JobMange",
+]
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 15:48:33.
+
+@author: ppolxda
+
+@desc: Job manage
+"""
+import asyncio
+from datetime import datetime
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Optional
+from typing import Set
+from uuid import uuid1
+
+from fastapi import HTTPException
+
+from ..utils.logger import LOGGER
+from .schemas import JobInfo
+from .schemas import JobStatus
+from .stores.base import JobStoreBase
+
+ProgressFunc = Callable[[int], Awaitable[None]]
+JobFunc = Callable[[ProgressFunc], Awaitable[str]]
+
+
+class JobMange(object):
+    """Run jobs in background tasks, and keep job state in job store.
+
+    A job function get a progress callback and return the download_key.
+    """
+
+    def __init__(self, store: JobStoreBase):
+        """__init__."""
+        self.store = store
+        self.tasks: Set["asyncio.Task[Any]"] = set()
+
+    @staticmethod
+    def gen_job_id() -> str:
+        """Generate job id."""
+        return str(uuid1())
+
+    async def update_job(self, job: JobInfo, **kwargs):
+        """Update job fields and save."""
+        for key, val in kwargs.items():
+            setattr(job, key, val)
+
+        job.updated_at = datetime.now()
+        await self.store.put_job(job)
+
+    async def create_job(self, tid: str = "", version_id: str = "") -> JobInfo:
+        """Create pending job."""
+        job = JobInfo(job_id=self.gen_job_id(), tid=tid, version_id=version_id)
+        await self.store.put_job(job)
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[JobInfo]:
+        """Get job."""
+        return await self.store.get_job(job_id)
+
+    async def run_job(self, job: JobInfo, func: JobFunc):
+        """Run job, save job state when finished."""
+
+        async def progress(value: int):
+            await self.update_job(job, progress=value)
+
+        try:
+            await self.update_job(job, status=JobStatus.RUNNING)
+            download_key = await func(progress)
+        except asyncio.CancelledError:
+            await self.update_job(
+                job, status=JobStatus.FAILED, error="job cancelled, service shutdown"
+            )
+            raise
+        except HTTPException as ex:
+            await self.update_job(job, status=JobStatus.FAILED, error=str(ex.detail))
+        except Exception as ex:  # pylint: disable=broad-except
+            LOGGER.exception("job failed[%s]", job.job_id)
+            await self.update_job(job, status=JobStatus.FAILED, error=str(ex))
+        else:
+            await self.update_job(
+                job,
+                status=JobStatus.SUCCESS,
+                progress=100,
+                download_key=download_key,
+            )
+
+    def submit(self, job: JobInfo, func: JobFunc) -> "asyncio.Task[Any]":
+        """Run job in background."""
+        task = asyncio.ensure_future(self.run_job(job, func))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def shutdown(self):
+        """Cancel running jobs."""
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
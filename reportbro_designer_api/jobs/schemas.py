@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 15:30:12.
+
+@author: ppolxda
+
+@desc: Job schemas
+"""
+from datetime import datetime
+from enum import Enum
+
+from pydantic import Field
+
+from reportbro_designer_api.utils.model import BaseModel
+
+
+class JobStatus(str, Enum):
+    """JobStatus."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCESS = "success"
+    FAILED = "failed"
+
+
+class JobInfo(BaseModel):
+    """JobInfo."""
+
+    job_id: str = Field(title="Job id")
+    tid: str = Field("", title="Template id")
+    version_id: str = Field("", title="Template version id")
+    status: JobStatus = Field(JobStatus.PENDING, title="Job status")
+    progress: int = Field(0, title="Job progress(0-100)")
+    download_key: str = Field("", title="Pdf download key, set when job success")
+    error: str = Field("", title="Error message, set when job failed")
+    created_at: datetime = Field(default_factory=datetime.now, title="create at")
+    updated_at: datetime = Field(default_factory=datetime.now, title="update at")
+
+    @property
+    def is_done(self) -> bool:
+        """Job is finished."""
+        return self.status in (JobStatus.SUCCESS, JobStatus.FAILED)
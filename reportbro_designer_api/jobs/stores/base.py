@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 15:34:40.
+
+@author: ppolxda
+
+@desc: Job Store
+"""
+from abc import ABC
+from abc import abstractmethod
+from typing import Optional
+
+from ..schemas import JobInfo
+
+
+class JobStoreBase(ABC):
+    """JobStoreBase.
+
+    Jobs are kept at least `job_ttl` seconds after last update.
+    """
+
+    project_name: str = "default"
+    job_ttl: int = 24 * 60 * 60
+
+    @abstractmethod
+    async def clean_all(self):
+        """Clean jobs, This api only use for test."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def put_job(self, job: JobInfo, project: Optional[str] = None):
+        """Create or update job."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_job(
+        self, job_id: str, project: Optional[str] = None
+    ) -> Optional[JobInfo]:
+        """Get job."""
+        raise NotImplementedError
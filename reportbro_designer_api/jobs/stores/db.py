@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 15:38:27.
+
+@author: ppolxda
+
+@desc: Database Job Store
+"""
+from datetime import datetime
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ...backend import models as mm
+from ...backend.backends.db import provide_db
+from ...backend.backends.db import session_begin
+from ..schemas import JobInfo
+from .base import JobStoreBase
+
+
+class DBJobStore(JobStoreBase):
+    """DBJobStore, jobs are saved in render_jobs table."""
+
+    def __init__(
+        self,
+        async_session: async_sessionmaker[AsyncSession],
+        project: str = "default",
+        job_ttl: int = 24 * 60 * 60,
+    ):
+        """__init__."""
+        self.project_name = project
+        self.job_ttl = job_ttl
+        self.async_session = async_session
+        self.session_begin = session_begin(self.async_session)
+
+    @provide_db
+    async def clean_all(self, session: Optional[AsyncSession] = None):
+        """Clean jobs, This api only use for test."""
+        assert session
+        await session.execute(delete(mm.RenderJobs))
+
+    @provide_db
+    async def put_job(
+        self,
+        job: JobInfo,
+        project: Optional[str] = None,
+        session: Optional[AsyncSession] = None,
+    ):
+        """Create or update job, expired jobs are removed on create."""
+        assert session
+        project = self.project_name if not project else project
+        query = (
+            select(mm.RenderJobs)
+            .where(
+                mm.RenderJobs.job_id == job.job_id,
+                mm.RenderJobs.project == project,
+            )
+            .limit(1)
+        )
+        results = await session.execute(query)
+        obj = results.scalars().first()
+        if obj is None:
+            obj = mm.RenderJobs(job_id=job.job_id, project=project)
+            session.add(obj)
+            await session.execute(
+                delete(mm.RenderJobs).where(
+                    mm.RenderJobs.project == project,
+                    mm.RenderJobs.updated_at
+                    < datetime.now() - timedelta(seconds=self.job_ttl),
+                )
+            )
+
+        obj.tid = job.tid
+        obj.version_id = job.version_id
+        obj.status = job.status.value
+        obj.progress = job.progress
+        obj.download_key = job.download_key
+        obj.error = job.error
+        obj.created_at = job.created_at
+        obj.updated_at = job.updated_at
+
+    @provide_db
+    async def get_job(
+        self,
+        job_id: str,
+        project: Optional[str] = None,
+        session: Optional[AsyncSession] = None,
+    ) -> Optional[JobInfo]:
+        """Get job."""
+        assert session
+        project = self.project_name if not project else project
+        query = (
+            select(mm.RenderJobs)
+            .where(
+                mm.RenderJobs.job_id == job_id,
+                mm.RenderJobs.project == project,
+            )
+            .limit(1)
+        )
+        results = await session.execute(query)
+        obj = results.scalars().first()
+        if obj is None:
+            return None
+        return JobInfo.model_validate(obj)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 15:36:02.
+
+@author: ppolxda
+
+@desc: Memory Job Store
+"""
+from collections import OrderedDict
+from datetime import datetime
+from datetime import timedelta
+from typing import Optional
+from typing import Tuple
+
+from ..schemas import JobInfo
+from .base import JobStoreBase
+
+
+class MemoryJobStore(JobStoreBase):
+    """MemoryJobStore, jobs are only visible in this process."""
+
+    def __init__(self, project: str = "default", job_ttl: int = 24 * 60 * 60):
+        """__init__."""
+        self.project_name = project
+        self.job_ttl = job_ttl
+        self.jobs: "OrderedDict[Tuple[str, str], JobInfo]" = OrderedDict()
+
+    def make_key(self, job_id: str, project: Optional[str] = None):
+        """Make job key."""
+        return (project or self.project_name, job_id)
+
+    def remove_expired(self):
+        """Remove expired jobs, jobs are ordered by updated_at."""
+        expired_at = datetime.now() - timedelta(seconds=self.job_ttl)
+        while self.jobs:
+            key, job = next(iter(self.jobs.items()))
+            if job.updated_at >= expired_at:
+                break
+            self.jobs.pop(key)
+
+    async def clean_all(self):
+        """Clean jobs, This api only use for test."""
+        self.jobs.clear()
+
+    async def put_job(self, job: JobInfo, project: Optional[str] = None):
+        """Create or update job."""
+        key = self.make_key(job.job_id, project)
+        self.jobs.pop(key, None)
+        self.jobs[key] = job.model_copy()
+        self.remove_expired()
+
+    async def get_job(
+        self, job_id: str, project: Optional[str] = None
+    ) -> Optional[JobInfo]:
+        """Get job."""
+        job = self.jobs.get(self.make_key(job_id, project))
+        if job is None:
+            return None
+        return job.model_copy()
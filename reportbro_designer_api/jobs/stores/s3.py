@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 15:40:51.
+
+@author: ppolxda
+
+@desc: S3 Job Store
+"""
+from typing import Optional
+
+from reportbro_designer_api.utils.s3_client import S3Client
+from reportbro_designer_api.utils.s3_client import hook_create_bucket_when_not_exist
+from reportbro_designer_api.utils.s3_client import hook_object_not_exist
+
+from ...errors import StorageError
+from ..schemas import JobInfo
+from .base import JobStoreBase
+
+
+class S3JobStore(JobStoreBase):
+    """S3JobStore, jobs are saved as json objects under jobs prefix.
+
+    Job objects are expired by the bucket lifecycle rule, not by job_ttl.
+    """
+
+    def __init__(
+        self,
+        s3cli: S3Client,
+        project: str = "default",
+        job_ttl: int = 24 * 60 * 60,
+    ):
+        """__init__."""
+        self._s3cli = s3cli
+        self.project_name = project
+        self.job_ttl = job_ttl
+
+    def make_job_key(self, job_id: str, project: Optional[str] = None):
+        """Make job key."""
+        if not project:
+            project = self.project_name
+
+        return "/".join([self._s3cli.JOBS_PREFIX, project, job_id + ".json"])
+
+    async def clean_all(self):
+        """Clean jobs, This api only use for test."""
+        await self._s3cli.clear_bucket()
+
+    @hook_create_bucket_when_not_exist()
+    async def put_job(self, job: JobInfo, project: Optional[str] = None):
+        """Create or update job."""
+        async with self._s3cli.s3cli() as client:
+            res = await client.put_object(
+                Bucket=self._s3cli.bucket_name,
+                Key=self.make_job_key(job.job_id, project),
+                Body=job.model_dump_json().encode("utf8"),
+                ContentType="application/json",
+            )
+            if res.get("ResponseMetadata", {}).get("HTTPStatusCode", "") != 200:
+                raise StorageError(f"Save job error[{res}]")
+
+    @hook_create_bucket_when_not_exist()
+    @hook_object_not_exist()
+    async def get_job(
+        self, job_id: str, project: Optional[str] = None
+    ) -> Optional[JobInfo]:
+        """Get job."""
+        async with self._s3cli.s3cli() as client:
+            res = await client.get_object(
+                Bucket=self._s3cli.bucket_name,
+                Key=self.make_job_key(job_id, project),
+            )
+            data = await res["Body"].read()
+            return JobInfo.model_validate_json(data)
@@ -9,7 +9,6 @@
 import os
 import re
 import traceback
-from concurrent.futures.process import ProcessPoolExecutor
 from contextlib import asynccontextmanager
 
 from botocore.exceptions import ClientError
@@ -26,6 +25,13 @@ from starlette.status import HTTP_404_NOT_FOUND
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
 
+from .clients import bootstrap_s3_clients
+from .clients import close_s3_clients
+from .clients import get_http_client
+from .clients import get_job_mange
+from .clients import get_render_dispatcher
+from .clients import get_storage_cli
+from .clients import open_s3_clients
 from .errors import ReportbroError
 from .router import router
 from .settings import settings
@@ -88,18 +94,25 @@ def get_app() -> FastAPI:
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         print_var()
-        app.state.executor = (
-            ProcessPoolExecutor(settings.PROCESS_POOL_SIZE)
-            if settings.PROCESS_POOL_SIZE > 0
-            else None
-        )
+        await open_s3_clients()
+        await bootstrap_s3_clients()
+        await get_storage_cli().start()
+        render = get_render_dispatcher()
+        LOGGER.info("render executor[%s][%s]", render.mode.value, render.pool_size)
+        await render.warmup()
 
         yield
 
         LOGGER.info("service shutdown")
 
-        if app.state.executor:
-            app.state.executor.shutdown()
+        await get_job_mange().shutdown()
+        get_job_mange.cache_clear()
+        await get_storage_cli().shutdown()
+        render.shutdown()
+        get_render_dispatcher.cache_clear()
+        await get_http_client().close()
+        get_http_client.cache_clear()
+        await close_s3_clients()
 
     rapp = FastAPI(
         title="Reportbro designer server",
@@ -8,12 +8,14 @@
 """
 import base64
 import os
+import time
+from typing import AsyncIterator
 from typing import Optional
 from typing import Tuple
 
-from fastapi import BackgroundTasks
-
 from ..errors import StorageError
+from .storages.base import FileBuffer
+from .storages.base import FileStat
 from .storages.base import StorageBase
 
 DowmloadKey = str
@@ -49,25 +51,86 @@ class StorageMange(object):
     async def put_file(
         self,
         filename: str,
-        file_buffer: bytes,
-        background_tasks: Optional[BackgroundTasks] = None,
+        file_buffer: FileBuffer,
         project: Optional[str] = None,
     ) -> DowmloadKey:
         """Put file."""
         project = project if project else self.project_name
         s3_key = self.make_s3_key(filename, project)
-        await self.storage.put_file(s3_key, file_buffer, background_tasks)
+        await self.storage.put_file(s3_key, file_buffer)
+        return self.make_download_key(s3_key)
+
+    def make_file_download_key(
+        self, filename: str, project: Optional[str] = None
+    ) -> DowmloadKey:
+        """Make download key of a file, before it is put."""
+        project = project if project else self.project_name
+        return self.make_download_key(self.make_s3_key(filename, project))
+
+    @staticmethod
+    def make_download_key(s3_key: str) -> DowmloadKey:
+        """Make download key."""
         return "key:" + base64.b64encode(s3_key.encode("utf8")).decode("utf8")
 
-    async def get_file(self, download_key: DowmloadKey) -> Tuple[FileName, bytes]:
-        """Get file."""
+    async def get_file_cached(
+        self, filename: str, ttl: int, project: Optional[str] = None
+    ) -> Optional[DowmloadKey]:
+        """Get download key of a stored file, when it is younger than ttl seconds.
+
+        The ttl is capped by half the storage ttl, so a file returned just
+        before expired is not removed before the download key is used.
+        """
+        if self.storage.storage_ttl > 0:
+            ttl = min(ttl, self.storage.storage_ttl / 2)
+
+        project = project if project else self.project_name
+        s3_key = self.make_s3_key(filename, project)
+        fstat = await self.storage.stat_file(s3_key)
+        if not fstat or time.time() - fstat.mtime >= ttl:
+            return None
+
+        return self.make_download_key(s3_key)
+
+    @staticmethod
+    def parse_download_key(download_key: DowmloadKey) -> str:
+        """Parse download key to s3 key."""
         if download_key.startswith("key:"):
             # raise StorageError(f"download_key invaild[{download_key}]")
             download_key = download_key[4:]
 
-        s3_key = base64.b64decode(download_key.encode("utf8")).decode("utf8")
+        return base64.b64decode(download_key.encode("utf8")).decode("utf8")
+
+    async def get_presigned_url(
+        self, download_key: DowmloadKey, expires_in: int
+    ) -> Optional[str]:
+        """Get presigned url of file, None when storage not support it."""
+        if not self.storage.presigned:
+            return None
+
+        s3_key = self.parse_download_key(download_key)
+        return await self.storage.generate_presigned_url(s3_key, expires_in)
+
+    async def get_file(self, download_key: DowmloadKey) -> Tuple[FileName, bytes]:
+        """Get file."""
+        s3_key = self.parse_download_key(download_key)
         r = await self.storage.get_file(s3_key)
         if not r:
             raise StorageError(f"download_key not exist[{download_key}]")
 
         return os.path.basename(s3_key), r
+
+    async def stat_file(self, download_key: DowmloadKey) -> Tuple[FileName, FileStat]:
+        """Get file info."""
+        s3_key = self.parse_download_key(download_key)
+        fstat = await self.storage.stat_file(s3_key)
+        if not fstat:
+            raise StorageError(f"download_key not exist[{download_key}]")
+
+        return os.path.basename(s3_key), fstat
+
+    def iter_file(
+        self, download_key: DowmloadKey, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Read file in chunks, from start to end(inclusive)."""
+        s3_key = self.parse_download_key(download_key)
+        return self.storage.iter_file(s3_key, start, end)
@@ -8,17 +8,37 @@
 """
 from abc import ABC
 from abc import abstractmethod
+from dataclasses import dataclass
+from typing import IO
+from typing import AsyncIterator
 from typing import Optional
+from typing import Union
 from urllib.parse import urlparse
 
-from fastapi import BackgroundTasks
-
 from ...errors import StorageError
 
+FileBuffer = Union[bytes, IO[bytes]]
+
+
+@dataclass
+class FileStat(object):
+    """Stored file info."""
+
+    size: int
+    # last modified unix timestamp
+    mtime: float
+    # quoted entity tag
+    etag: str = ""
+
 
 class StorageBase(ABC):
     """StorageBase."""
 
+    # seconds a stored file is kept, 0 means kept by storage lifecycle
+    storage_ttl: int = 0
+    # storage serve files by presigned url
+    presigned: bool = False
+
     @staticmethod
     def s3parse(s3_key: str):
         """s3parse."""
@@ -29,6 +49,12 @@ class StorageBase(ABC):
             raise StorageError(f"s3_key invaild[{s3_key}]")
         return s3_parse
 
+    async def start(self):
+        """Start storage background tasks."""
+
+    async def shutdown(self):
+        """Stop storage background tasks."""
+
     @abstractmethod
     def bucket(self):
         """Bucket name."""
@@ -40,17 +66,45 @@ class StorageBase(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    async def generate_presigned_url(self, s3_key: str) -> str:
+    async def generate_presigned_url(self, s3_key: str, expires_in: int = 3600) -> str:
         """Generate presigned url file, This api only use for test."""
 
+    @staticmethod
+    def read_head(file_buffer: FileBuffer, size: int = 261) -> bytes:
+        """Read file head for filetype guess, file position is kept."""
+        if isinstance(file_buffer, bytes):
+            return file_buffer[:size]
+
+        pos = file_buffer.tell()
+        head = file_buffer.read(size)
+        file_buffer.seek(pos)
+        return head
+
     @abstractmethod
-    async def put_file(
-        self, s3_key: str, file_buffer: bytes, background_tasks: Optional[BackgroundTasks] = None
-    ):
-        """Put file."""
+    async def put_file(self, s3_key: str, file_buffer: FileBuffer):
+        """Put file, file_buffer is bytes or a file object."""
         raise NotImplementedError
 
     @abstractmethod
     async def get_file(self, s3_key: str) -> Optional[bytes]:
         """Get file."""
         raise NotImplementedError
+
+    @abstractmethod
+    async def stat_file(self, s3_key: str) -> Optional[FileStat]:
+        """Get file info, None when file not exist."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_file(
+        self,
+        s3_key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 64 * 1024,
+    ) -> AsyncIterator[bytes]:
+        """Read file in chunks, from start to end(inclusive, None means file end).
+
+        Raise StorageError when file not exist.
+        """
+        raise NotImplementedError
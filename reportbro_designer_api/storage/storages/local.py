@@ -7,35 +7,46 @@
 @desc: S3 Storage
 """
 import asyncio
+import heapq
 import os
 import shutil
+import time
+from contextlib import suppress
 from pathlib import Path
+from typing import Any
+from typing import AsyncIterator
+from typing import List
 from typing import Optional
+from typing import Tuple
+from uuid import uuid4
 
-from fastapi import BackgroundTasks
+from starlette.concurrency import run_in_threadpool
 
-# from reportbro_designer_api.errors import StorageError
+from reportbro_designer_api.errors import StorageError
 from reportbro_designer_api.utils.logger import LOGGER
 
+from .base import FileBuffer
+from .base import FileStat
 from .base import StorageBase
 
-
-async def remove_files(storage_ttl: int, fs_path: Path):
-    """RemoveFiles."""
-    LOGGER.info("waiting remove file in %s", fs_path)
-    await asyncio.sleep(storage_ttl)
-    LOGGER.info("remove file in %s", fs_path)
-    if fs_path.exists():
-        os.remove(fs_path)
+# (expire at, file path)
+Expire = Tuple[float, str]
 
 
 class LocalStorage(StorageBase):
-    """S3Storage."""
+    """Local Storage.
+
+    Stored files expire `storage_ttl` seconds after written, a sweeper task
+    pop expired files from a heap ordered by expire time and remove them
+    in batches. Files left by a previous process are indexed on start.
+    """
 
     def __init__(
         self,
         storage_path: Optional[str] = None,
         storage_ttl: int = 30 * 60,
+        sweep_interval: int = 60,
+        sweep_batch: int = 1000,
     ) -> None:
         """Init Local."""
         if not storage_path:
@@ -44,16 +55,98 @@ class LocalStorage(StorageBase):
 
         self.storage_ttl = storage_ttl
         self.storage_path = Path(storage_path)
-        self.thread = None
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self.expires: List[Expire] = []
+        self.sweeper: Optional["asyncio.Task[Any]"] = None
         # if not self.storage_path.is_dir():
         #     raise StorageError("storage_path is not dir")
 
         os.makedirs(storage_path, exist_ok=True)
 
-    def auto_remove_file(self, fs_path: Path, background_tasks: BackgroundTasks):
-        """Auto remove file."""
-        LOGGER.info("add file in %s", fs_path)
-        background_tasks.add_task(remove_files, self.storage_ttl, fs_path)
+    def track_file(self, fpath: Path, mtime: float):
+        """Track file to remove when expired."""
+        if self.storage_ttl > 0:
+            heapq.heappush(self.expires, (mtime + self.storage_ttl, str(fpath)))
+
+    def scan_files(self) -> List[Expire]:
+        """Scan stored files, run in thread."""
+        expires = []
+        for root, _, files in os.walk(self.storage_path):
+            for name in files:
+                fpath = os.path.join(root, name)
+                try:
+                    mtime = os.stat(fpath).st_mtime
+                except FileNotFoundError:
+                    continue
+                expires.append((mtime + self.storage_ttl, fpath))
+        return expires
+
+    def remove_expired(self, fpaths: List[str], now: float) -> int:
+        """Remove expired files, run in thread.
+
+        A file written again is tracked by the new write, so it is skipped.
+        """
+        removed = 0
+        for fpath in fpaths:
+            try:
+                if os.stat(fpath).st_mtime + self.storage_ttl > now:
+                    continue
+
+                os.remove(fpath)
+                removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Remove expired files, return removed count."""
+        if now is None:
+            now = time.time()
+
+        removed = 0
+        while self.expires and self.expires[0][0] <= now:
+            fpaths: List[str] = []
+            while (
+                self.expires
+                and self.expires[0][0] <= now
+                and len(fpaths) < self.sweep_batch
+            ):
+                fpaths.append(heapq.heappop(self.expires)[1])
+
+            removed += await run_in_threadpool(self.remove_expired, fpaths, now)
+
+        if removed:
+            LOGGER.info("remove %s expired files in %s", removed, self.storage_path)
+        return removed
+
+    async def run_sweeper(self):
+        """Sweep expired files periodically."""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("sweep local storage failed[%s]", self.storage_path)
+
+    async def start(self):
+        """Index stored files and start sweeper."""
+        if self.storage_ttl <= 0 or self.sweeper is not None:
+            return
+
+        for expire in await run_in_threadpool(self.scan_files):
+            heapq.heappush(self.expires, expire)
+
+        self.sweeper = asyncio.ensure_future(self.run_sweeper())
+
+    async def shutdown(self):
+        """Stop sweeper."""
+        if self.sweeper is None:
+            return
+
+        self.sweeper.cancel()
+        await asyncio.gather(self.sweeper, return_exceptions=True)
+        self.sweeper = None
 
     def bucket(self):
         """Bucket name."""
@@ -62,32 +155,98 @@ class LocalStorage(StorageBase):
     async def clean_all(self):
         """Clean database, This api only use for test."""
         shutil.rmtree(self.storage_path)
+        self.expires = []
 
-    async def generate_presigned_url(self, s3_key: str) -> str:
+    async def generate_presigned_url(self, s3_key: str, expires_in: int = 3600) -> str:
         """Generate presigned url file, This api only use for test."""
         return s3_key
 
-    async def put_file(
-        self, s3_key: str, file_buffer: bytes, background_tasks: Optional[BackgroundTasks] = None
-    ):
-        """Put file."""
+    def make_path(self, s3_key: str) -> Path:
+        """Make file path of key."""
         s3_obj = self.s3parse(s3_key)
-        fpath = self.storage_path.joinpath(s3_obj.path[1:])
-
-        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        return self.storage_path.joinpath(s3_obj.path[1:])
+
+    @staticmethod
+    def write_file(fpath: Path, file_buffer: FileBuffer):
+        """Write to a temp file and rename, readers never see a partial file."""
+        os.makedirs(fpath.parent, exist_ok=True)
+        tmp_path = fpath.with_name(f".{fpath.name}.{uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "xb") as fs:
+                if isinstance(file_buffer, bytes):
+                    fs.write(file_buffer)
+                else:
+                    shutil.copyfileobj(file_buffer, fs)
+
+            os.replace(tmp_path, fpath)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def read_file(fpath: Path) -> Optional[bytes]:
+        """Read file, None when file not exist."""
+        try:
+            with open(fpath, "rb") as fs:
+                return fs.read()
+        except FileNotFoundError:
+            return None
 
-        with open(fpath, "wb") as fs:
-            fs.write(file_buffer)
+    @staticmethod
+    def stat_path(fpath: Path) -> Optional[os.stat_result]:
+        """Stat file, None when file not exist."""
+        try:
+            return fpath.stat()
+        except FileNotFoundError:
+            return None
 
-        self.auto_remove_file(fpath, background_tasks)
+    async def put_file(self, s3_key: str, file_buffer: FileBuffer):
+        """Put file, disk io run in thread."""
+        fpath = self.make_path(s3_key)
+        await run_in_threadpool(self.write_file, fpath, file_buffer)
+        self.track_file(fpath, time.time())
 
     async def get_file(self, s3_key: str) -> Optional[bytes]:
         """Get file."""
-        s3_obj = self.s3parse(s3_key)
-        fpath = self.storage_path.joinpath(s3_obj.path[1:])
+        return await run_in_threadpool(self.read_file, self.make_path(s3_key))
 
-        if not fpath.exists():
+    async def stat_file(self, s3_key: str) -> Optional[FileStat]:
+        """Get file info."""
+        fstat = await run_in_threadpool(self.stat_path, self.make_path(s3_key))
+        if fstat is None:
             return None
 
-        with open(fpath, "rb") as fs:
-            return fs.read()
+        return FileStat(
+            size=fstat.st_size,
+            mtime=fstat.st_mtime,
+            etag=f'"{fstat.st_mtime_ns:x}-{fstat.st_size:x}"',
+        )
+
+    async def iter_file(
+        self,
+        s3_key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 64 * 1024,
+    ) -> AsyncIterator[bytes]:
+        """Read file in chunks, each read run in thread."""
+        try:
+            fs = await run_in_threadpool(open, self.make_path(s3_key), "rb")
+        except FileNotFoundError as ex:
+            raise StorageError(f"file not exist[{s3_key}]") from ex
+
+        try:
+            await run_in_threadpool(fs.seek, start)
+            remain = None if end is None else end - start + 1
+            while remain is None or remain > 0:
+                size = chunk_size if remain is None else min(chunk_size, remain)
+                chunk = await run_in_threadpool(fs.read, size)
+                if not chunk:
+                    break
+
+                if remain is not None:
+                    remain -= len(chunk)
+                yield chunk
+        finally:
+            fs.close()
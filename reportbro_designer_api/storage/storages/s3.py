@@ -7,9 +7,10 @@
 @desc: S3 Storage
 """
 from io import BytesIO
+from typing import Any
+from typing import AsyncIterator
 from typing import Optional
 
-from fastapi import BackgroundTasks
 from filetype import guess
 
 from reportbro_designer_api.utils.s3_client import S3Client
@@ -17,12 +18,16 @@ from reportbro_designer_api.utils.s3_client import hook_create_bucket_when_not_e
 from reportbro_designer_api.utils.s3_client import hook_object_not_exist
 
 from ...errors import StorageError
+from .base import FileBuffer
+from .base import FileStat
 from .base import StorageBase
 
 
 class S3Storage(StorageBase):
     """S3Storage."""
 
+    presigned = True
+
     def __init__(self, s3cli: S3Client):
         """init."""
         self._s3cli = s3cli
@@ -36,8 +41,8 @@ class S3Storage(StorageBase):
         await self._s3cli.clear_bucket()
 
     @hook_create_bucket_when_not_exist()
-    async def generate_presigned_url(self, s3_key: str) -> str:
-        """Put file."""
+    async def generate_presigned_url(self, s3_key: str, expires_in: int = 3600) -> str:
+        """Generate presigned url of file."""
         s3_obj = self.s3parse(s3_key)
 
         assert s3_obj.hostname
@@ -45,23 +50,30 @@ class S3Storage(StorageBase):
             download_url = await client.generate_presigned_url(
                 ClientMethod="get_object",
                 Params={"Bucket": s3_obj.hostname, "Key": s3_obj.path},
-                ExpiresIn=3600,
+                ExpiresIn=expires_in,
             )
             return download_url
 
     @hook_create_bucket_when_not_exist()
-    async def put_file(
-        self, s3_key: str, file_buffer: bytes, background_tasks: Optional[BackgroundTasks] = None
-    ):
-        """Put file."""
+    async def put_file(self, s3_key: str, file_buffer: FileBuffer):
+        """Put file, file object is uploaded by multipart upload."""
         s3_obj = self.s3parse(s3_key)
-        content = guess(file_buffer)
+        content = guess(self.read_head(file_buffer))
         if not content:
             raise StorageError("filetype support")
 
         content = content.mime
         assert s3_obj.hostname
         async with self._s3cli.s3cli() as client:
+            if not isinstance(file_buffer, bytes):
+                await client.upload_fileobj(
+                    file_buffer,
+                    s3_obj.hostname,
+                    s3_obj.path,
+                    ExtraArgs={"ContentType": content},
+                )
+                return
+
             res = await client.put_object(
                 Bucket=s3_obj.hostname,
                 Key=s3_obj.path,
@@ -81,3 +93,47 @@ class S3Storage(StorageBase):
             res = await client.get_object(Bucket=s3_obj.hostname, Key=s3_obj.path)
             data = await res["Body"].read()
             return data
+
+    @hook_create_bucket_when_not_exist()
+    @hook_object_not_exist()
+    async def stat_file(self, s3_key: str) -> Optional[FileStat]:
+        """Get file info."""
+        s3_obj = self.s3parse(s3_key)
+        assert s3_obj.hostname
+        async with self._s3cli.s3cli() as client:
+            res = await client.head_object(Bucket=s3_obj.hostname, Key=s3_obj.path)
+            return FileStat(
+                size=res["ContentLength"],
+                mtime=res["LastModified"].timestamp(),
+                etag=res.get("ETag", ""),
+            )
+
+    @hook_create_bucket_when_not_exist()
+    @hook_object_not_exist()
+    async def get_object(self, client: Any, s3_key: str, **kwargs) -> Optional[dict]:
+        """Get object by client, None when not exist."""
+        s3_obj = self.s3parse(s3_key)
+        assert s3_obj.hostname
+        return await client.get_object(
+            Bucket=s3_obj.hostname, Key=s3_obj.path, **kwargs
+        )
+
+    async def iter_file(
+        self,
+        s3_key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 64 * 1024,
+    ) -> AsyncIterator[bytes]:
+        """Read file in chunks from streaming body, with a ranged get."""
+        kwargs = {}
+        if start > 0 or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end}"
+
+        async with self._s3cli.s3cli() as client:
+            res = await self.get_object(client, s3_key, **kwargs)
+            if res is None:
+                raise StorageError(f"file not exist[{s3_key}]")
+
+            async for chunk in res["Body"].iter_chunks(chunk_size):
+                yield chunk
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 13:05:10.
+
+@author: ppolxda
+
+@desc: LRU cache bounded by bytes
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from typing import Generic
+from typing import Hashable
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+VT = TypeVar("VT")
+
+
+@dataclass
+class CacheStats(object):
+    """CacheStats."""
+
+    name: str = ""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    items: int = 0
+    size: int = 0
+    max_size: int = 0
+
+
+class LRUCache(Generic[VT]):
+    """LRU cache, evict least recently used items when size over max_size bytes.
+
+    Items expire after `ttl` seconds when ttl > 0.
+    """
+
+    def __init__(self, max_size: int, name: str = "", ttl: float = 0):
+        """__init__."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.data: "OrderedDict[Hashable, Tuple[VT, int, float]]" = OrderedDict()
+        self.stats = CacheStats(name=name, max_size=max_size)
+
+    def __len__(self):
+        """__len__."""
+        return len(self.data)
+
+    def __contains__(self, key: Hashable):
+        """__contains__."""
+        return key in self.data
+
+    def get(self, key: Hashable) -> Optional[VT]:
+        """Get item and mark it recently used."""
+        item = self.data.get(key)
+        if item is not None and self.ttl > 0 and item[2] <= monotonic():
+            self.pop(key)
+            item = None
+
+        if item is None:
+            self.stats.misses += 1
+            return None
+
+        self.data.move_to_end(key)
+        self.stats.hits += 1
+        return item[0]
+
+    def set(self, key: Hashable, value: VT, size: int):
+        """Set item, item bigger than max_size is not cached."""
+        self.pop(key)
+        if size > self.max_size:
+            return
+
+        self.data[key] = (value, size, monotonic() + self.ttl)
+        self.stats.size += size
+        while self.stats.size > self.max_size:
+            _, (_, evict_size, _) = self.data.popitem(last=False)
+            self.stats.size -= evict_size
+            self.stats.evictions += 1
+
+        self.stats.items = len(self.data)
+
+    def pop(self, key: Hashable) -> Optional[VT]:
+        """Remove item."""
+        item = self.data.pop(key, None)
+        if item is None:
+            return None
+
+        self.stats.size -= item[1]
+        self.stats.items = len(self.data)
+        return item[0]
+
+    def clear(self):
+        """Remove all items."""
+        self.data.clear()
+        self.stats.size = 0
+        self.stats.items = 0
@@ -0,0 +1,653 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 19:05:12.
+
+@author: ppolxda
+
+@desc: Font registry
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+from contextlib import suppress
+from dataclasses import dataclass
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from uuid import uuid4
+
+from fontTools import subset as ftsubset
+from fontTools import ttLib
+from fpdf.enums import FontDescriptorFlags
+from fpdf.enums import TextEmphasis
+from fpdf.fonts import CORE_FONTS
+from fpdf.fonts import PDFFontDescriptor
+from fpdf.fonts import SubsetMap
+from fpdf.fonts import TTFFont
+from fpdf.output import CIDSystemInfo
+from fpdf.output import OutputProducer
+from fpdf.output import PDFFont
+from fpdf.output import _tt_font_widths
+from fpdf.syntax import Name
+from fpdf.syntax import PDFArray
+from fpdf.syntax import PDFContentStream
+
+from .cache import LRUCache
+from .logger import LOGGER
+
+# font file key, resolved path and (mtime_ns, size) of the file
+FontKey = Tuple[str, int, int]
+
+# metrics cache file: head, json meta, then chars, widths, glyph ids and
+# glyph name indexes as 4 bytes arrays, bump version when layout changed
+FONT_CACHE_MAGIC = b"RBFONTM\x00"
+FONT_CACHE_VERSION = 1
+FONT_CACHE_HEAD = struct.Struct("<8sII")
+FONT_CACHE_ITEM = 4
+
+
+class FontTable(Mapping):
+    """Read-only unicode char -> value map over packed arrays.
+
+    Chars are sorted, a lookup is a binary search, so a table mapped
+    from a cache file is never copied into dicts.
+    """
+
+    def __init__(
+        self,
+        chars: Sequence[int],
+        values: Sequence[int],
+        default: Optional[int] = None,
+        names: Optional[List[str]] = None,
+    ):
+        """__init__."""
+        self.chars = chars
+        self.values = values
+        self.default = default
+        self.names = names
+
+    def index(self, char) -> int:
+        """Index of char, -1 when not found."""
+        if not isinstance(char, int):
+            return -1
+
+        idx = bisect_left(self.chars, char)
+        if idx < len(self.chars) and self.chars[idx] == char:
+            return idx
+        return -1
+
+    def value(self, idx: int):
+        """Value at index."""
+        if self.names is not None:
+            return self.names[self.values[idx]]
+        return self.values[idx]
+
+    def __getitem__(self, char):
+        """Get value, default value when set and char not found."""
+        idx = self.index(char)
+        if idx >= 0:
+            return self.value(idx)
+        if self.default is not None:
+            return self.default
+        raise KeyError(char)
+
+    def get(self, char, default=None):
+        """Get value, never use table default."""
+        idx = self.index(char)
+        if idx >= 0:
+            return self.value(idx)
+        return default
+
+    def __contains__(self, char) -> bool:
+        """__contains__."""
+        return self.index(char) >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        """__iter__."""
+        return iter(self.chars)
+
+    def __len__(self) -> int:
+        """__len__."""
+        return len(self.chars)
+
+
+@dataclass
+class FontMetrics(object):
+    """Metrics fpdf derive from a font file, shared by every document."""
+
+    name: str
+    scale: float
+    up: int
+    ut: int
+    default_width: int
+    # PDFFontDescriptor fields, a descriptor is mutated on output
+    desc: Dict[str, Any]
+    # unicode char -> char width
+    cw: FontTable
+    # unicode char -> glyph name
+    cmap: FontTable
+    # unicode char -> glyph id
+    glyph_ids: FontTable
+
+
+def open_ttfont(font_file_path) -> ttLib.TTFont:
+    """Open font file same as fpdf TTFFont."""
+    return ttLib.TTFont(font_file_path, recalcTimestamp=False, fontNumber=0, lazy=True)
+
+
+def pack_font_metrics(font_file_path) -> bytes:
+    """Parse font file same as fpdf TTFFont.__init__, pack to cache layout."""
+    ttfont = open_ttfont(font_file_path)
+    try:
+        scale = 1000 / ttfont["head"].unitsPerEm
+        default_width = round(scale * ttfont["hmtx"].metrics[".notdef"][0])
+
+        try:
+            cap_height = ttfont["OS/2"].sCapHeight
+        except AttributeError:
+            cap_height = ttfont["hhea"].ascent
+
+        flags = FontDescriptorFlags.SYMBOLIC
+        if ttfont["post"].isFixedPitch:
+            flags |= FontDescriptorFlags.FIXED_PITCH
+        if ttfont["post"].italicAngle != 0:
+            flags |= FontDescriptorFlags.ITALIC
+        if ttfont["OS/2"].usWeightClass >= 600:
+            flags |= FontDescriptorFlags.FORCE_BOLD
+
+        head = ttfont["head"]
+        desc = {
+            "ascent": round(ttfont["hhea"].ascent * scale),
+            "descent": round(ttfont["hhea"].descent * scale),
+            "cap_height": round(cap_height * scale),
+            "flags": flags.value,
+            "font_b_box": (
+                f"[{head.xMin * scale:.0f} {head.yMin * scale:.0f}"
+                f" {head.xMax * scale:.0f} {head.yMax * scale:.0f}]"
+            ),
+            "italic_angle": int(ttfont["post"].italicAngle),
+            "stem_v": round(50 + int(pow((ttfont["OS/2"].usWeightClass / 65), 2))),
+            "missing_width": default_width,
+        }
+
+        cmap = ttfont.getBestCmap()
+        hmtx = ttfont["hmtx"].metrics
+        chars = array("I")
+        widths = array("i")
+        glyph_ids = array("I")
+        name_idx = array("I")
+        names: Dict[str, int] = {}
+        for char in sorted(cmap):
+            glyph = cmap[char]
+            width = hmtx[glyph][0]
+            if width == 65535:
+                width = 0
+
+            chars.append(char)
+            widths.append(round(scale * width + 0.001))  # ROUND_HALF_UP
+            glyph_ids.append(ttfont.getGlyphID(glyph))
+            name_idx.append(names.setdefault(glyph, len(names)))
+
+        meta = {
+            "byteorder": sys.byteorder,
+            "name": re.sub("[ ()]", "", ttfont["name"].getBestFullName()),
+            "scale": scale,
+            "up": round(ttfont["post"].underlinePosition * scale),
+            "ut": round(ttfont["post"].underlineThickness * scale),
+            "default_width": default_width,
+            "desc": desc,
+            "size": len(chars),
+            "names": list(names),
+        }
+    finally:
+        ttfont.close()
+
+    meta_data = json.dumps(meta, ensure_ascii=False).encode("utf8")
+    meta_data += b" " * (-len(meta_data) % FONT_CACHE_ITEM)
+    return b"".join(
+        [
+            FONT_CACHE_HEAD.pack(FONT_CACHE_MAGIC, FONT_CACHE_VERSION, len(meta_data)),
+            meta_data,
+            chars.tobytes(),
+            widths.tobytes(),
+            glyph_ids.tobytes(),
+            name_idx.tobytes(),
+        ]
+    )
+
+
+def load_font_metrics(buffer) -> FontMetrics:
+    """Load packed metrics, arrays are views of the buffer."""
+    view = memoryview(buffer)
+    if len(view) < FONT_CACHE_HEAD.size:
+        raise ValueError("font cache too short")
+
+    magic, version, meta_size = FONT_CACHE_HEAD.unpack_from(view)
+    if magic != FONT_CACHE_MAGIC or version != FONT_CACHE_VERSION:
+        raise ValueError("font cache version not match")
+
+    offset = FONT_CACHE_HEAD.size + meta_size
+    meta = json.loads(bytes(view[FONT_CACHE_HEAD.size : offset]).decode("utf8"))
+    if meta["byteorder"] != sys.byteorder:
+        raise ValueError("font cache byteorder not match")
+
+    size = meta["size"] * FONT_CACHE_ITEM
+    if len(view) != offset + size * 4:
+        raise ValueError("font cache size not match")
+
+    def _array(idx: int, fmt: str) -> memoryview:
+        return view[offset + idx * size : offset + (idx + 1) * size].cast(fmt)
+
+    chars = _array(0, "I")
+    desc = dict(meta["desc"], flags=FontDescriptorFlags(meta["desc"]["flags"]))
+    return FontMetrics(
+        name=meta["name"],
+        scale=meta["scale"],
+        up=meta["up"],
+        ut=meta["ut"],
+        default_width=meta["default_width"],
+        desc=desc,
+        cw=FontTable(chars, _array(1, "i"), default=meta["default_width"]),
+        cmap=FontTable(chars, _array(3, "I"), names=meta["names"]),
+        glyph_ids=FontTable(chars, _array(2, "I")),
+    )
+
+
+@dataclass
+class FontSubset(object):
+    """Embedded font subset, shared by documents use the same glyphs."""
+
+    # compressed font stream
+    stream: bytes
+    # uncompressed font stream size
+    size: int
+    # glyph name -> glyph id in subset
+    glyph_ids: Dict[str, int]
+
+
+class SubsetFontStream(PDFContentStream):
+    """PDFFontStream of a compressed subset."""
+
+    def __init__(self, subset: FontSubset):
+        """__init__."""
+        super().__init__(contents=subset.stream)
+        self.filter = Name("FlateDecode")
+        self.length1 = subset.size
+
+
+def make_font_subset(ttfont: ttLib.TTFont, glyph_names: List[str]) -> FontSubset:
+    """Subset font same as fpdf output, the font is modified."""
+    # notdef_outline=True means that keeps the white box for the .notdef glyph
+    # recommended_glyphs=True means that adds the .notdef, .null, CR, and space glyphs
+    options = ftsubset.Options(notdef_outline=True, recommended_glyphs=True)
+    options.drop_tables += ["FFTM", "GDEF", "GPOS", "GSUB", "MATH", "hdmx", "meta"]
+    subsetter = ftsubset.Subsetter(options)
+    subsetter.populate(glyphs=glyph_names)
+    subsetter.subset(ttfont)
+
+    output = BytesIO()
+    ttfont.save(output)
+    stream = output.getvalue()
+    return FontSubset(
+        stream=zlib.compress(stream, level=PDFContentStream._COMPRESSION_LEVEL),
+        size=len(stream),
+        glyph_ids={i: ttfont.getGlyphID(i) for i in set(glyph_names)},
+    )
+
+
+def hash_file(fpath: str) -> str:
+    """Sha256 of file content."""
+    sha = hashlib.sha256()
+    with open(fpath, "rb") as fss:
+        for chunk in iter(partial(fss.read, 1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def map_file(fpath: str) -> mmap.mmap:
+    """Map file read-only."""
+    with open(fpath, "rb") as fss:
+        return mmap.mmap(fss.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_file(fpath: str, data: bytes):
+    """Write to a temp file and rename, readers never see a partial file."""
+    os.makedirs(os.path.dirname(fpath), exist_ok=True)
+    tmp_path = f"{fpath}.{uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "xb") as fss:
+            fss.write(data)
+
+        os.replace(tmp_path, fpath)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+class CachedTTFFont(TTFFont):
+    """TTFFont build from cached metrics.
+
+    Document state(subset, descriptor, font index) is fresh for each
+    document, the font file is only opened when output need a subset.
+    """
+
+    __slots__ = ("_ttfont", "font_key")
+
+    def __init__(
+        self,
+        fpdf,
+        font_file_path,
+        fontkey,
+        style,
+        metrics: FontMetrics,
+        font_key: FontKey,
+    ):
+        """__init__."""
+        # pylint: disable=super-init-not-called
+        self.i = len(fpdf.fonts) + 1
+        self.type = "TTF"
+        self.ttffile = font_file_path
+        self.fontkey = fontkey
+        self.font_key = font_key
+        self._ttfont: Optional[ttLib.TTFont] = None
+
+        self.scale = metrics.scale
+        self.desc = PDFFontDescriptor(**metrics.desc)
+        self.cw = metrics.cw
+        self.cmap = metrics.cmap
+        self.glyph_ids = metrics.glyph_ids
+        self.missing_glyphs = []
+
+        sbarr = "\x00 \r\n"
+        if fpdf.str_alias_nb_pages:
+            sbarr += "0123456789"
+            sbarr += fpdf.str_alias_nb_pages
+
+        self.name = metrics.name
+        self.up = metrics.up
+        self.ut = metrics.ut
+        self.emphasis = TextEmphasis.coerce(style)
+        self.subset = SubsetMap(self, [ord(char) for char in sbarr])
+        self.qm_char_code = self.subset.pick(ord("?"))
+
+    @property
+    def ttfont(self) -> ttLib.TTFont:
+        """Font file, opened on first use."""
+        if self._ttfont is None:
+            self._ttfont = open_ttfont(self.ttffile)
+        return self._ttfont
+
+    def close(self):
+        """Close font file."""
+        if self._ttfont is not None:
+            self._ttfont.close()
+            self._ttfont = None
+        self.hbfont = None
+
+
+class FontRegistry(object):
+    """Parse each font file once per process.
+
+    Metrics are keyed by file path, mtime and size, so a replaced font
+    file is parsed again. With a cache path, metrics are saved by font
+    file hash and mapped read-only, workers share one copy in page cache.
+    """
+
+    def __init__(self, cache_path: str = "", subset_cache_size: int = 0):
+        """__init__."""
+        self.cache_path = cache_path
+        self.metrics: Dict[FontKey, FontMetrics] = {}
+        self.lock = threading.Lock()
+        self.subsets: Optional[LRUCache[FontSubset]] = None
+        if subset_cache_size > 0:
+            self.subsets = LRUCache(subset_cache_size, name="font_subset")
+
+    def cache_file(self, font_file_path: str) -> str:
+        """Metrics cache file of font file."""
+        return os.path.join(
+            self.cache_path,
+            f"{hash_file(font_file_path)}.v{FONT_CACHE_VERSION}.metrics",
+        )
+
+    def load(self, font_file_path: str) -> FontMetrics:
+        """Load metrics from cache file, parse font file when cache missed."""
+        if not self.cache_path:
+            return load_font_metrics(pack_font_metrics(font_file_path))
+
+        cache_file = self.cache_file(font_file_path)
+        try:
+            return load_font_metrics(map_file(cache_file))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as ex:
+            LOGGER.warning("font cache invalid[%s][%s]", cache_file, ex)
+
+        LOGGER.debug("parse font file[%s]", font_file_path)
+        data = pack_font_metrics(font_file_path)
+        try:
+            write_file(cache_file, data)
+            return load_font_metrics(map_file(cache_file))
+        except OSError as ex:
+            LOGGER.warning("font cache write failed[%s][%s]", cache_file, ex)
+            return load_font_metrics(data)
+
+    @staticmethod
+    def font_key(font_file_path) -> FontKey:
+        """Make font key."""
+        path = os.path.realpath(font_file_path)
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, font_file_path) -> FontMetrics:
+        """Get font metrics, parse font file on first use."""
+        return self.get_metrics(self.font_key(font_file_path))
+
+    def get_metrics(self, key: FontKey) -> FontMetrics:
+        """Get font metrics by font key."""
+        metrics = self.metrics.get(key)
+        if metrics is not None:
+            return metrics
+
+        with self.lock:
+            metrics = self.metrics.get(key)
+            if metrics is None:
+                metrics = self.load(key[0])
+                self.metrics[key] = metrics
+            return metrics
+
+    def add_font(self, pdf_doc, family=None, style="", fname=None):
+        """Replace FPDF.add_font, add a font from cached metrics."""
+        if not fname:
+            raise ValueError('"fname" parameter is required')
+
+        font_file_path = Path(fname)
+        if not font_file_path.exists():
+            raise FileNotFoundError(f"TTF Font file not found: {fname}")
+
+        style = "".join(sorted(style.upper()))
+        if family is None:
+            family = font_file_path.stem
+
+        fontkey = f"{family.lower()}{style}"
+        if fontkey in pdf_doc.fonts or fontkey in CORE_FONTS:
+            return
+
+        key = self.font_key(font_file_path)
+        pdf_doc.fonts[fontkey] = CachedTTFFont(
+            pdf_doc, font_file_path, fontkey, style, self.get_metrics(key), key
+        )
+
+    def get_subset(self, font: CachedTTFFont, glyph_names: List[str]) -> FontSubset:
+        """Get subset of font, reuse a subset of the same glyph set."""
+        if self.subsets is None:
+            return make_font_subset(font.ttfont, glyph_names)
+
+        glyphs = "\n".join(sorted(set(glyph_names))).encode("utf8")
+        key = (font.font_key, hashlib.sha256(glyphs).hexdigest())
+        with self.lock:
+            subset = self.subsets.get(key)
+        if subset is not None:
+            return subset
+
+        subset = make_font_subset(font.ttfont, glyph_names)
+        with self.lock:
+            self.subsets.set(key, subset, len(subset.stream))
+        return subset
+
+
+class FontOutputProducer(OutputProducer):
+    """OutputProducer, embed font subsets from the registry subset cache."""
+
+    def __init__(self, fpdf, registry: FontRegistry):
+        """__init__."""
+        super().__init__(fpdf)
+        self.registry = registry
+
+    def get_subset(self, font, glyph_names: List[str]) -> FontSubset:
+        """Get font subset."""
+        if isinstance(font, CachedTTFFont):
+            return self.registry.get_subset(font, glyph_names)
+        return make_font_subset(font.ttfont, glyph_names)
+
+    def _add_fonts(self):
+        """Same as fpdf 2.7.7 OutputProducer._add_fonts, except subset step."""
+        font_objs_per_index = {}
+        for font in sorted(self.fpdf.fonts.values(), key=lambda font: font.i):
+            # Standard font
+            if font.type == "core":
+                encoding = (
+                    "WinAnsiEncoding"
+                    if font.name not in ("Symbol", "ZapfDingbats")
+                    else None
+                )
+                core_font_obj = PDFFont(
+                    subtype="Type1", base_font=font.name, encoding=encoding
+                )
+                self._add_pdf_obj(core_font_obj, "fonts")
+                font_objs_per_index[font.i] = core_font_obj
+            elif font.type == "TTF":
+                fontname = f"MPDFAA+{font.name}"
+
+                # 1. get all glyphs in PDF
+                glyph_names = font.subset.get_all_glyph_names()
+
+                if len(font.missing_glyphs) > 0:
+                    LOGGER.warning(
+                        "Font %s is missing the following glyphs: %s",
+                        fontname,
+                        ", ".join(chr(x) for x in font.missing_glyphs),
+                    )
+
+                # 2. make a subset, or reuse a subset of the same glyphs
+                subset = self.get_subset(font, glyph_names)
+
+                # 3. make codeToGlyph, Character_ID -> Glyph_ID in subset
+                code_to_glyph = {
+                    char_id: subset.glyph_ids[glyph.glyph_name]
+                    for glyph, char_id in font.subset.items()
+                }
+
+                composite_font_obj = PDFFont(
+                    subtype="Type0", base_font=fontname, encoding="Identity-H"
+                )
+                self._add_pdf_obj(composite_font_obj, "fonts")
+                font_objs_per_index[font.i] = composite_font_obj
+
+                cid_font_obj = PDFFont(
+                    subtype="CIDFontType2",
+                    base_font=fontname,
+                    d_w=font.desc.missing_width,
+                    w=_tt_font_widths(font),
+                )
+                self._add_pdf_obj(cid_font_obj, "fonts")
+                composite_font_obj.descendant_fonts = PDFArray([cid_font_obj])
+
+                # bfChar, unicode of each used 16-bit code
+                bf_char = []
+
+                def format_code(unicode):
+                    if unicode > 0xFFFF:
+                        # Calculate surrogate pair
+                        code_high = 0xD800 | (unicode - 0x10000) >> 10
+                        code_low = 0xDC00 | (unicode & 0x3FF)
+                        return f"{code_high:04X}{code_low:04X}"
+                    return f"{unicode:04X}"
+
+                for glyph, code_mapped in font.subset.items():
+                    if len(glyph.unicode) == 0:
+                        continue
+                    bf_char.append(
+                        f"<{code_mapped:04X}> "
+                        f'<{"".join(format_code(code) for code in glyph.unicode)}>\n'
+                    )
+
+                to_unicode_obj = PDFContentStream(
+                    "/CIDInit /ProcSet findresource begin\n"
+                    "12 dict begin\n"
+                    "begincmap\n"
+                    "/CIDSystemInfo\n"
+                    "<</Registry (Adobe)\n"
+                    "/Ordering (UCS)\n"
+                    "/Supplement 0\n"
+                    ">> def\n"
+                    "/CMapName /Adobe-Identity-UCS def\n"
+                    "/CMapType 2 def\n"
+                    "1 begincodespacerange\n"
+                    "<0000> <FFFF>\n"
+                    "endcodespacerange\n"
+                    f"{len(bf_char)} beginbfchar\n"
+                    f"{''.join(bf_char)}"
+                    "endbfchar\n"
+                    "endcmap\n"
+                    "CMapName currentdict /CMap defineresource pop\n"
+                    "end\n"
+                    "end"
+                )
+                self._add_pdf_obj(to_unicode_obj, "fonts")
+                composite_font_obj.to_unicode = to_unicode_obj
+
+                cid_system_info_obj = CIDSystemInfo()
+                self._add_pdf_obj(cid_system_info_obj, "fonts")
+                cid_font_obj.c_i_d_system_info = cid_system_info_obj
+
+                font_descriptor_obj = font.desc
+                font_descriptor_obj.font_name = Name(fontname)
+                self._add_pdf_obj(font_descriptor_obj, "fonts")
+                cid_font_obj.font_descriptor = font_descriptor_obj
+
+                # Embed CIDToGIDMap
+                cid_to_gid_map = ["\x00"] * 256 * 256 * 2
+                for ccc, glyph in code_to_glyph.items():
+                    cid_to_gid_map[ccc * 2] = chr(glyph >> 8)
+                    cid_to_gid_map[ccc * 2 + 1] = chr(glyph & 0xFF)
+
+                cid_to_gid_map_obj = PDFContentStream(
+                    contents="".join(cid_to_gid_map).encode("latin1"), compress=True
+                )
+                self._add_pdf_obj(cid_to_gid_map_obj, "fonts")
+                cid_font_obj.c_i_d_to_g_i_d_map = cid_to_gid_map_obj
+
+                font_file_cs_obj = SubsetFontStream(subset)
+                self._add_pdf_obj(font_file_cs_obj, "fonts")
+                font_descriptor_obj.font_file2 = font_file_cs_obj
+
+                font.close()
+
+        return font_objs_per_index
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 14:52:18.
+
+@author: ppolxda
+
+@desc: Shared http client
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from typing import Optional
+
+import aiohttp
+from aiohttp import ClientTimeout
+from aiohttp import TCPConnector
+
+
+class HttpClient(object):
+    """Shared aiohttp session with pooled connections.
+
+    `pool_size` bound the open connections, `concurrency` bound requests
+    in flight, requests over it wait for a free slot.
+    The session is created lazily on the running loop, and recreated
+    when the loop changed.
+    """
+
+    def __init__(
+        self, timeout: float = 180, pool_size: int = 100, concurrency: int = 0
+    ):
+        """__init__."""
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def session(self) -> aiohttp.ClientSession:
+        """Get session of the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._loop = loop
+            self._session = aiohttp.ClientSession(
+                timeout=ClientTimeout(total=self.timeout),
+                connector=TCPConnector(limit=self.pool_size),
+            )
+            self._semaphore = (
+                asyncio.Semaphore(self.concurrency) if self.concurrency > 0 else None
+            )
+        return self._session
+
+    @asynccontextmanager
+    async def get(self, url: str) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Send GET request, bounded by concurrency."""
+        session = self.session()
+        if self._semaphore is None:
+            async with session.get(url) as resp:
+                yield resp
+            return
+
+        async with self._semaphore:
+            async with session.get(url) as resp:
+                yield resp
+
+    async def close(self):
+        """Close session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+        self._session = None
+        self._semaphore = None
+        self._loop = None
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 14:20:37.
+
+@author: ppolxda
+
+@desc: Pdf merge
+"""
+from dataclasses import dataclass
+from tempfile import SpooledTemporaryFile
+from typing import IO
+from typing import AsyncIterator
+from typing import List
+
+import filetype
+import PyPDF2
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+# bytes filetype need to guess file type
+HEAD_SIZE = 261
+
+
+@dataclass
+class PdfFile(object):
+    """Pdf document in a file handle."""
+
+    filename: str
+    report_file: IO[bytes]
+
+    def close(self):
+        """Close file."""
+        self.report_file.close()
+
+
+def spool_file(data: bytes, max_size: int) -> IO[bytes]:
+    """Write data to a spooled temp file, rollover to disk over max_size."""
+    fss = SpooledTemporaryFile(max_size=max_size)
+    fss.write(data)
+    fss.seek(0)
+    return fss
+
+
+async def spool_pdf(
+    chunks: AsyncIterator[bytes], max_size: int, spool_size: int
+) -> IO[bytes]:
+    """Stream pdf chunks to a spooled temp file.
+
+    The pdf magic is checked on the file head, and the download is
+    rejected as soon as it grows over max_size bytes(0 means unlimited).
+    """
+    fss = SpooledTemporaryFile(max_size=spool_size)
+    try:
+        head = b""
+        size = 0
+        async for chunk in chunks:
+            size += len(chunk)
+            if max_size > 0 and size > max_size:
+                raise HTTPException(
+                    status_code=HTTP_400_BAD_REQUEST,
+                    detail=f"pdf_url is too large, over {max_size} bytes",
+                )
+
+            if len(head) < HEAD_SIZE:
+                head += chunk[: HEAD_SIZE - len(head)]
+                if len(head) >= HEAD_SIZE:
+                    check_pdf_head(head)
+
+            fss.write(chunk)
+
+        if len(head) < HEAD_SIZE:
+            check_pdf_head(head)
+    except BaseException:
+        fss.close()
+        raise
+
+    fss.seek(0)
+    return fss
+
+
+def check_pdf_head(head: bytes):
+    """Check file head is pdf."""
+    rtype = filetype.guess(head)
+    if not rtype or rtype.extension != "pdf":
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="pdf_url is not pdf file",
+        )
+
+
+class PdfMergeFile(object):
+    """Merge pdf documents into a spooled temp file.
+
+    Documents are appended in order as file handles, PyPDF2 only parse the
+    page tree on append and read page contents back when the output is written,
+    so no document is held in memory as a whole.
+    """
+
+    def __init__(self, max_size: int):
+        """__init__."""
+        self.max_size = max_size
+        self.merger = PyPDF2.PdfMerger()
+        self.inputs: List[IO[bytes]] = []
+
+    def __enter__(self):
+        """__enter__."""
+        return self
+
+    def __exit__(self, *args):
+        """__exit__."""
+        self.close()
+
+    def append(self, fss: IO[bytes]):
+        """Append document, the handle is closed with the merge file."""
+        self.inputs.append(fss)
+        self.merger.append(fss)
+
+    def write(self) -> IO[bytes]:
+        """Write merged document to a spooled temp file."""
+        output = SpooledTemporaryFile(max_size=self.max_size)
+        try:
+            self.merger.write(output)
+        except BaseException:
+            output.close()
+            raise
+
+        output.seek(0)
+        return output
+
+    def close(self):
+        """Close merger and inputs."""
+        self.merger.close()
+        for fss in self.inputs:
+            fss.close()
+        self.inputs = []
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 10:12:31.
+
+@author: ppolxda
+
+@desc: Render dispatcher
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from functools import partial
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+from fastapi import HTTPException
+
+from ..errors import RenderError
+from ..errors import RenderQueueFullError
+from ..errors import RenderTimeoutError
+from .logger import LOGGER
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - windows
+    resource = None  # type: ignore
+
+RT = TypeVar("RT")
+
+
+class RenderExecutorMode(str, Enum):
+    """RenderExecutorMode."""
+
+    PROCESS = "process"
+    THREAD = "thread"
+    INLINE = "inline"
+
+
+def get_peak_memory() -> int:
+    """Get peak memory(MB) of current process."""
+    if resource is None:
+        return 0
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return maxrss // 1024 // 1024
+    return maxrss // 1024
+
+
+def get_current_memory() -> int:
+    """Get current memory(MB) of current process.
+
+    The peak memory is inherited from the forked parent, so current rss
+    is used when /proc is available.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as fss:
+            pages = int(fss.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return get_peak_memory()
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024 // 1024
+
+
+def run_render_task(func: Callable[..., RT], *args) -> RT:
+    """Run render task in worker.
+
+    HTTPException can not be pickled back from a child process,
+    so it is converted to RenderError here.
+    """
+    try:
+        return func(*args)
+    except HTTPException as ex:
+        raise RenderError(ex.status_code, str(ex.detail)) from None
+
+
+def run_render_task_in_process(
+    func: Callable[..., RT], *args
+) -> Tuple[RT, int, int]:
+    """Run render task in process worker, return result, worker pid and memory."""
+    return run_render_task(func, *args), os.getpid(), get_current_memory()
+
+
+class RenderDispatcher(object):
+    """Dispatch report renders to process pool, thread pool or inline.
+
+    Renders are bounded by `pool_size + queue_size` in flight,
+    requests over the bound are rejected instead of parked on the event loop.
+
+    In process mode the pool is replaced by a fresh one after a worker
+    served `max_tasks_per_child` renders, or when a worker memory is over
+    `max_memory` MB. The old pool finishes running renders and exits.
+    Warmup tasks are not counted as renders.
+    """
+
+    def __init__(
+        self,
+        mode: str = RenderExecutorMode.THREAD.value,
+        pool_size: int = 0,
+        queue_size: int = 0,
+        timeout: float = 0,
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple[Any, ...] = (),
+        max_tasks_per_child: int = 0,
+        max_memory: int = 0,
+    ):
+        """__init__."""
+        self.mode = RenderExecutorMode(mode)
+        self.pool_size = pool_size if pool_size > 0 else (os.cpu_count() or 1)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.initializer = initializer
+        self.initargs = initargs
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_memory = max_memory
+        self.pending = 0
+        self.tasks = 0
+        self.child_tasks: Dict[int, int] = {}
+        self.recycled = 0
+        self.executor = self.create_executor()
+        self.warmup_task: Optional[asyncio.Task] = None
+
+    def create_executor(self) -> Optional[Executor]:
+        """Create executor."""
+        if self.mode == RenderExecutorMode.PROCESS:
+            return ProcessPoolExecutor(
+                self.pool_size, initializer=self.initializer, initargs=self.initargs
+            )
+
+        if self.mode == RenderExecutorMode.THREAD:
+            return ThreadPoolExecutor(self.pool_size, thread_name_prefix="render")
+
+        return None
+
+    @property
+    def max_pending(self) -> int:
+        """Max renders in flight, 0 means unbounded."""
+        if self.queue_size <= 0:
+            return 0
+        return self.pool_size + self.queue_size
+
+    async def warmup(self):
+        """Start workers and run initializer before first request.
+
+        Submitted to executor directly, not counted for recycle.
+        """
+        executor = self.executor
+        if executor is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        if self.mode == RenderExecutorMode.PROCESS:
+            # workers are spawned on submit, one task for each worker
+            await asyncio.gather(
+                *[
+                    loop.run_in_executor(executor, os.getpid)
+                    for _ in range(self.pool_size)
+                ]
+            )
+        elif self.initializer is not None:
+            # threads share the process, initialize once
+            await loop.run_in_executor(
+                executor, partial(self.initializer, *self.initargs)
+            )
+
+    def recycle(self):
+        """Replace process pool with a fresh one."""
+        old, self.executor = self.executor, self.create_executor()
+        self.tasks = 0
+        self.child_tasks = {}
+        self.recycled += 1
+        if old is not None:
+            old.shutdown(wait=False)
+
+        LOGGER.info("render pool recycled[%s]", self.recycled)
+        self.warmup_task = asyncio.ensure_future(self.warmup())
+
+    def check_recycle(self, executor: Executor, pid: int, memory: int):
+        """Recycle process pool when a worker tasks or memory over limit."""
+        if executor is not self.executor:
+            # result from a pool already recycled
+            return
+
+        self.tasks += 1
+        self.child_tasks[pid] = self.child_tasks.get(pid, 0) + 1
+        if self.max_memory > 0 and memory > self.max_memory:
+            LOGGER.info("render worker memory over limit[%sMB]", memory)
+            self.recycle()
+        elif (
+            self.max_tasks_per_child > 0
+            and self.child_tasks[pid] >= self.max_tasks_per_child
+        ):
+            self.recycle()
+
+    async def _wait(self, future: "asyncio.Future[RT]") -> RT:
+        """Wait future with timeout."""
+        if self.timeout <= 0:
+            return await future
+
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError as ex:
+            # NOTE - a running task can not be interrupted,
+            # the worker is released when the task finished.
+            raise RenderTimeoutError(
+                f"render timeout after {self.timeout} seconds"
+            ) from ex
+
+    async def _run(self, func: Callable[..., RT], *args) -> RT:
+        """Run func in executor."""
+        executor = self.executor
+        if executor is None:
+            return run_render_task(func, *args)
+
+        loop = asyncio.get_running_loop()
+        if self.mode != RenderExecutorMode.PROCESS:
+            return await self._wait(
+                loop.run_in_executor(executor, partial(run_render_task, func, *args))
+            )
+
+        result, pid, memory = await self._wait(
+            loop.run_in_executor(
+                executor, partial(run_render_task_in_process, func, *args)
+            )
+        )
+        self.check_recycle(executor, pid, memory)
+        return result
+
+    async def run(self, func: Callable[..., RT], *args: Any) -> RT:
+        """Run render func, func and args must be picklable in process mode."""
+        if self.max_pending and self.pending >= self.max_pending:
+            LOGGER.warning("render queue full[%s]", self.pending)
+            raise RenderQueueFullError("render queue is full, try again later")
+
+        self.pending += 1
+        try:
+            return await self._run(func, *args)
+        except RenderError as ex:
+            raise HTTPException(status_code=ex.status_code, detail=ex.detail) from ex
+        finally:
+            self.pending -= 1
+
+    def shutdown(self, wait: bool = True):
+        """Shutdown executor."""
+        if self.warmup_task is not None:
+            self.warmup_task.cancel()
+            self.warmup_task = None
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
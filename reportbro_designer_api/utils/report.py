@@ -14,14 +14,21 @@ import re
 from collections import defaultdict
 from dataclasses import asdict
 from dataclasses import dataclass
+from functools import partial
 from itertools import chain
+from timeit import default_timer as timer
 from typing import List
+from typing import Optional
 
 import pkg_resources
 from reportbro import Report
 from reportbro.reportbro import FPDFRB
 from reportbro.reportbro import DocumentPDFRenderer
 
+from .fonts import FontOutputProducer
+from .fonts import FontRegistry
+from .logger import LOGGER
+
 FPDF_FONT_DIR = pkg_resources.resource_filename("fpdf", "font")
 
 FONT_TYPES = {
@@ -37,6 +44,45 @@ FONT_TYPES = {
     "n": "filename",
 }
 
+WARMUP_TEXT = "Aa 0123456789 汉字"
+WARMUP_TEXT_ELEMENT = {
+    "elementType": "text",
+    "containerId": "0_content",
+    "x": 0,
+    "y": 0,
+    "width": 200,
+    "height": 20,
+    "content": WARMUP_TEXT,
+    "eval": False,
+    "styleId": "",
+    "bold": False,
+    "italic": False,
+    "underline": False,
+    "horizontalAlignment": "left",
+    "verticalAlignment": "top",
+    "textColor": "#000000",
+    "backgroundColor": "",
+    "font": "helvetica",
+    "fontSize": 12,
+    "lineSpacing": 1,
+    "borderColor": "#000000",
+    "borderWidth": 1,
+    "borderAll": False,
+    "borderLeft": False,
+    "borderTop": False,
+    "borderRight": False,
+    "borderBottom": False,
+    "paddingLeft": 2,
+    "paddingTop": 2,
+    "paddingRight": 2,
+    "paddingBottom": 2,
+    "printIf": "",
+    "removeEmptyElement": False,
+    "alwaysPrintOnSamePage": True,
+    "pattern": "",
+    "cs_condition": "",
+}
+
 
 def fill_default(report_definition, data):
     """Input data padding default."""
@@ -107,7 +153,11 @@ class ReportFonts(object):
 
 
 class ReportFontsLoader(object):
-    """ReportFontsLoader."""
+    """ReportFontsLoader.
+
+    Font path is scanned on first use, font files are parsed once per
+    process by the font registry, and saved to cache path if set.
+    """
 
     LOAD_FMT_REGIX = re.compile(
         r"^(?:[0-9].*?-)*(.*?)(?:-[0-9]*?)*-"
@@ -115,12 +165,36 @@ class ReportFontsLoader(object):
         re.MULTILINE | re.IGNORECASE,
     )
 
-    def __init__(self, font_path: str):
+    def __init__(
+        self, font_path: str, cache_path: str = "", subset_cache_size: int = 0
+    ):
         """__init__."""
-        self.fonts_cls: List[ReportFonts] = []
-        self.fonts: List[dict] = []
         self.font_path = font_path
-        self.load()
+        self.registry = FontRegistry(cache_path, subset_cache_size)
+        self._fonts_cls: Optional[List[ReportFonts]] = None
+        self._fonts_jinja: List[dict] = []
+        self._fonts: List[dict] = []
+
+    @property
+    def fonts_cls(self) -> List[ReportFonts]:
+        """Fonts in path."""
+        if self._fonts_cls is None:
+            self.load()
+        return self._fonts_cls or []
+
+    @property
+    def fonts_jinja(self) -> List[dict]:
+        """Fonts for page view."""
+        if self._fonts_cls is None:
+            self.load()
+        return self._fonts_jinja
+
+    @property
+    def fonts(self) -> List[dict]:
+        """Fonts for reportbro additional_fonts."""
+        if self._fonts_cls is None:
+            self.load()
+        return self._fonts
 
     def load(self):
         """Load fonts in path."""
@@ -152,9 +226,9 @@ class ReportFontsLoader(object):
             if len(paths_map) > 1:
                 fonts.append(ReportFonts(**paths_map))
 
-        self.fonts_cls = fonts
-        self.fonts_jinja = [i.to_jinja2() for i in fonts]
-        self.fonts = [asdict(i) for i in fonts]
+        self._fonts_cls = fonts
+        self._fonts_jinja = [i.to_jinja2() for i in fonts]
+        self._fonts = [asdict(i) for i in fonts]
 
 
 class ReportPdf(object):
@@ -193,9 +267,80 @@ class ReportPdf(object):
             encode_error_handling="ignore",
             core_fonts_encoding="utf8",
         )
+        # fonts are added from parsed metrics, not parsed for each document,
+        # and font subsets of the same glyphs are reused
+        registry = self.font_loader.registry
+        renderer.pdf_doc.add_font = partial(registry.add_font, renderer.pdf_doc)
+        renderer.pdf_doc.output = partial(
+            renderer.pdf_doc.output,
+            output_producer_class=partial(FontOutputProducer, registry=registry),
+        )
         if title:
             renderer.pdf_doc.set_title(
                 "_".join([title, datetime.datetime.now().strftime("%Y%m%dT%H%M%S")])
             )
 
         return renderer.render()
+
+    def generate_xlsx(self, filename=""):
+        """generate_xlsx."""
+        return self.report.generate_xlsx(filename=filename)
+
+
+def make_warmup_definition(font_loader: ReportFontsLoader) -> dict:
+    """Make a tiny report definition, one text line for each font style."""
+    fonts = [("helvetica", False)]
+    for i in font_loader.fonts_cls:
+        fonts.append((i.value, False))
+        if i.bold_filename:
+            fonts.append((i.value, True))
+
+    elements = [
+        {
+            **WARMUP_TEXT_ELEMENT,
+            "id": idx + 1,
+            "y": idx * WARMUP_TEXT_ELEMENT["height"],
+            "font": font,
+            "bold": bold,
+        }
+        for idx, (font, bold) in enumerate(fonts)
+    ]
+    return {
+        "docElements": elements,
+        "parameters": [],
+        "styles": [],
+        "version": 1,
+        "documentProperties": {
+            "pageFormat": "A4",
+            "unit": "mm",
+            "orientation": "portrait",
+            "marginLeft": "0",
+            "marginTop": "0",
+            "marginRight": "0",
+            "marginBottom": "0",
+            "header": False,
+            "footer": False,
+            "patternLocale": "en",
+        },
+    }
+
+
+def warmup_report(font_loader: ReportFontsLoader) -> bool:
+    """Render a tiny report to load reportbro, fpdf and every font file.
+
+    Warmup never raise, a broken font only log a warning.
+    """
+    start = timer()
+    try:
+        report = ReportPdf(make_warmup_definition(font_loader), {}, font_loader)
+        if report.report.errors:
+            LOGGER.warning("render warmup report invalid[%s]", report.report.errors)
+            return False
+
+        report.generate_pdf()
+    except Exception as ex:
+        LOGGER.warning("render warmup failed[%s]", ex)
+        return False
+
+    LOGGER.info("render warmup in %.3f seconds", timer() - start)
+    return True
@@ -6,8 +6,10 @@
 
 @desc: s3 client
 """
-
+import asyncio
+from contextlib import AsyncExitStack
 from contextlib import asynccontextmanager
+from typing import Any
 from typing import Optional
 
 import aioboto3
@@ -18,15 +20,13 @@ from ..errors import S3ClientError
 
 
 def hook_create_bucket_when_not_exist():
-    """Create bucket when not exist."""
+    """Create bucket when not exist, no-op once the bucket is ready."""
 
     def wrapper(func):
         async def wrapper_call(self, *args, **kwargs):
-            if hasattr(self, "create_bucket_when_not_exist"):
-                await self.create_bucket_when_not_exist()
-
-            if hasattr(self, "_s3cli"):
-                await self._s3cli.create_bucket_when_not_exist()
+            s3cli = getattr(self, "_s3cli", self)
+            if not s3cli.ready:
+                await s3cli.bootstrap()
 
             return await func(self, *args, **kwargs)
 
@@ -52,10 +52,16 @@ def hook_object_not_exist():
 
 
 class S3Client(object):
-    """S3ClientBase."""
+    """S3ClientBase.
+
+    `open` create a long-lived client shared by `s3cli` on the running loop,
+    without it, or on another loop, `s3cli` create a client per call.
+    """
 
     TEMPLATES_PREFIX = "templates"
     REVIEW_PREFIX = "review"
+    JOBS_PREFIX = "jobs"
+    MANIFEST_PREFIX = "manifests"
 
     def __init__(
         self,
@@ -64,27 +70,64 @@ class S3Client(object):
         endpoint_url: Optional[str] = None,
         region_name: str = "us-east-1",
         bucket: str = "reportbro",
+        max_pool_connections: int = 10,
     ):
         """Init s3."""
         self.region_name = region_name
         self.endpoint_url = endpoint_url
         self.aws_access_key_id = aws_access_key_id
         self.aws_secret_access_key = aws_secret_access_key
-        self.config = AioConfig(signature_version="s3v4")
+        self.config = AioConfig(
+            signature_version="s3v4", max_pool_connections=max_pool_connections
+        )
         self.bucket_name = bucket
-
-    @asynccontextmanager
-    async def s3cli(self):
-        """创建客户端."""
+        self._client: Any = None
+        self._exit_stack: Optional[AsyncExitStack] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # bucket created, versioning and lifecycle enabled
+        self.ready = False
+        self._bootstrap_lock: Optional[asyncio.Lock] = None
+        self._bootstrap_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def create_client(self):
+        """Create client context."""
         session = aioboto3.Session()
-        async with session.client(
+        return session.client(
             "s3",
             region_name=self.region_name,
             endpoint_url=self.endpoint_url,
             aws_access_key_id=self.aws_access_key_id,
             aws_secret_access_key=self.aws_secret_access_key,
             config=self.config,
-        ) as s3cli:
+        )
+
+    async def open(self):
+        """Open shared client on running loop."""
+        if self._client is not None:
+            return
+
+        exit_stack = AsyncExitStack()
+        self._client = await exit_stack.enter_async_context(self.create_client())
+        self._exit_stack = exit_stack
+        self._loop = asyncio.get_running_loop()
+
+    async def close(self):
+        """Close shared client."""
+        exit_stack = self._exit_stack
+        self._client = None
+        self._exit_stack = None
+        self._loop = None
+        if exit_stack is not None:
+            await exit_stack.aclose()
+
+    @asynccontextmanager
+    async def s3cli(self):
+        """创建客户端."""
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            yield self._client
+            return
+
+        async with self.create_client() as s3cli:
             yield s3cli
 
     async def clear_bucket(self):
@@ -120,62 +163,90 @@ class S3Client(object):
                 )
             await client.delete_bucket(Bucket=self.bucket_name)
 
+        self.ready = False
+
     async def reset_bucket(self):
         """Delete bucket and Create bucket, Use for testing."""
         await self.clear_bucket()
         await self.create_bucket_when_not_exist()
 
-    async def create_bucket_when_not_exist(self):
-        """Create bucket when not exist."""
-        if getattr(self, "has_bucket", False):
+    def bootstrap_lock(self) -> asyncio.Lock:
+        """Get bootstrap lock of the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._bootstrap_lock is None or self._bootstrap_loop is not loop:
+            self._bootstrap_lock = asyncio.Lock()
+            self._bootstrap_loop = loop
+        return self._bootstrap_lock
+
+    async def bootstrap(self):
+        """Create bucket, enable versioning and lifecycle once.
+
+        Concurrent callers wait for the first one, later calls are no-op.
+        """
+        if self.ready:
             return
 
-        r = await self.__is_bucket_exist()
-        if r:
+        async with self.bootstrap_lock():
+            if self.ready:
+                return
+
+            r = await self.__is_bucket_exist()
+            if not r:
+                async with self.s3cli() as client:
+                    await client.create_bucket(Bucket=self.bucket_name, ACL="private")
+
             await self.__enable_bucket_versioning()
             await self.__enable_bucket_lifecycle()
-            setattr(self, "has_bucket", True)
-            return
-
-        async with self.s3cli() as client:
-            await client.create_bucket(Bucket=self.bucket_name, ACL="private")
+            self.ready = True
 
-        await self.__enable_bucket_versioning()
-        await self.__enable_bucket_lifecycle()
-        setattr(self, "has_bucket", True)
+    async def create_bucket_when_not_exist(self):
+        """Create bucket when not exist."""
+        await self.bootstrap()
+
+    def lifecycle_rules(self):
+        """Bucket lifecycle rules."""
+        return [
+            {
+                "ID": "ReviewFileTemplate",
+                "Status": "Enabled",
+                "Prefix": self.REVIEW_PREFIX + "/",
+                "NoncurrentVersionExpiration": {
+                    "NoncurrentDays": 1,
+                    "NewerNoncurrentVersions": 5,
+                },
+            },
+            {
+                "ID": "RenderJobs",
+                "Status": "Enabled",
+                "Prefix": self.JOBS_PREFIX + "/",
+                "Expiration": {"Days": 1},
+                "NoncurrentVersionExpiration": {"NoncurrentDays": 1},
+            },
+        ]
 
     async def __enable_bucket_lifecycle(self):
-        """Enable bucket Lifecycle."""
+        """Enable bucket Lifecycle.
+
+        Existing rules are kept, rules missing by ID are added,
+        so rules of a newer release reach buckets created before it.
+        """
         # TAG - https://docs.aws.amazon.com/AmazonS3/latest/API/API_PutBucketLifecycleConfiguration.html#API_PutBucketLifecycleConfiguration_Examples
-        res = await self.__is_bucket_lifecycle_exist()
-        if res:
+        rules = await self.__get_bucket_lifecycle_rules()
+        rule_ids = {i.get("ID") for i in rules}
+        missing = [i for i in self.lifecycle_rules() if i["ID"] not in rule_ids]
+        if not missing:
             return
 
         async with self.s3cli() as client:
             res = await client.put_bucket_lifecycle_configuration(
                 Bucket=self.bucket_name,
-                LifecycleConfiguration={
-                    "Rules": [
-                        {
-                            "ID": "ReviewFileTemplate",
-                            "Status": "Enabled",
-                            "Prefix": self.REVIEW_PREFIX + "/",
-                            "NoncurrentVersionExpiration": {
-                                "NoncurrentDays": 1,
-                                "NewerNoncurrentVersions": 5,
-                            },
-                        },
-                    ]
-                },
+                LifecycleConfiguration={"Rules": rules + missing},
             )
             if res and res.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) != 200:
                 raise S3ClientError(f"Enabled Lifecycle Error[{res}]")
 
     async def __enable_bucket_versioning(self):
         """Enable bucket versioning."""
-        if getattr(self, "has_bucket_versioning", False):
-            return
-
         async with self.s3cli() as client:
             status = await client.get_bucket_versioning(Bucket=self.bucket_name)
             if status.get("Status", "") != "Enabled":
@@ -192,26 +263,25 @@ class S3Client(object):
                 ):
                     raise S3ClientError(f"Enabled BucketVersioning Error[{res}]")
 
-            setattr(self, "has_bucket_versioning", True)
-
-    async def __is_bucket_lifecycle_exist(self, bucket_name=None):
-        """Is bucket exist."""
+    async def __get_bucket_lifecycle_rules(self, bucket_name=None):
+        """Get bucket lifecycle rules, empty when not configured."""
         if bucket_name is None:
             bucket_name = self.bucket_name
 
         async with self.s3cli() as client:
             try:
-                # await client.head_bucket(Bucket=bucket_name)
-                await client.get_bucket_lifecycle_configuration(Bucket=bucket_name)
+                res = await client.get_bucket_lifecycle_configuration(
+                    Bucket=bucket_name
+                )
             except ClientError as ex:
                 if ex.response.get("Error", {}).get("Code", "") in [
                     "404",
                     "NoSuchLifecycleConfiguration",
                 ]:
-                    return False
+                    return []
                 raise
             else:
-                return True
+                return res.get("Rules", [])
 
     async def __is_bucket_exist(self, bucket_name: Optional[str] = None):
         """Is bucket exist."""
@@ -6,11 +6,22 @@
 
 @desc: test s3 client api
 """
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from datetime import timedelta
+
 import pytest
+from botocore.client import ClientError
+from sqlalchemy import select
 
 from reportbro_designer_api.backend import BackendBase
 from reportbro_designer_api.backend import DBBackend
 from reportbro_designer_api.backend import S3Backend
+from reportbro_designer_api.backend import models as mm
+from reportbro_designer_api.clients import create_s3_client
+from reportbro_designer_api.errors import ClientParamsError
 
 # from reportbro_designer_api.backend.s3 import ClientError
 
@@ -127,3 +138,272 @@ async def test_mysql_api(mysql_cli: DBBackend):
 async def test_sqlite_api(sqlite_cli: DBBackend):
     """Test s3 reportbro api function."""
     await backend_test(sqlite_cli)
+
+
+class FakeS3Body(object):
+    """Fake s3 streaming body."""
+
+    def __init__(self, data: bytes):
+        """__init__."""
+        self.data = data
+
+    async def read(self):
+        """Read."""
+        return self.data
+
+
+class FakeS3(object):
+    """Fake s3 client, keep the current version only."""
+
+    def __init__(self):
+        """__init__."""
+        self.objects: dict = {}
+        self.heads = 0
+        self.version = 0
+
+    async def put_object(self, Bucket, Key, Body, Metadata=None, **kwargs):
+        """Put object."""
+        self.version += 1
+        data = Body.read()
+        self.objects[Key] = {
+            "Key": Key,
+            "Body": data,
+            "Metadata": Metadata or {},
+            "ETag": f'"{hash(data)}"',
+            "LastModified": datetime(2026, 1, 1) + timedelta(seconds=self.version),
+            "VersionId": str(self.version),
+            **{k: v for k, v in kwargs.items() if k == "ContentEncoding"},
+        }
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}, "VersionId": str(self.version)}
+
+    async def get_object(self, Bucket, Key, **kwargs):
+        """Get object."""
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {**self.objects[Key], "Body": FakeS3Body(self.objects[Key]["Body"])}
+
+    async def head_object(self, Bucket, Key, **kwargs):
+        """Head object, only heads of template metadata are counted."""
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        self.heads += 1
+        return self.objects[Key]
+
+    async def list_objects_v2(self, Bucket, Prefix, MaxKeys, StartAfter=""):
+        """List objects."""
+        contents = [
+            {k: v for k, v in i.items() if k in ("Key", "ETag", "LastModified")}
+            for key, i in sorted(self.objects.items())
+            if key.startswith(Prefix) and key > StartAfter
+        ]
+        return {
+            "Contents": contents[:MaxKeys],
+            "IsTruncated": len(contents) > MaxKeys,
+        }
+
+
+def create_fake_s3_client(fake: FakeS3):
+    """Create s3 client on fake s3."""
+    s3cli = create_s3_client("s3://minioadmin:minioadmin@127.0.0.1:9000/reportbro")
+    s3cli.ready = True
+
+    @asynccontextmanager
+    async def fake_s3cli():
+        yield fake
+
+    s3cli.s3cli = fake_s3cli
+    return s3cli
+
+
+async def test_s3_list_manifest():
+    """Test s3 listing head only stale templates."""
+    fake = FakeS3()
+    s3cli = create_fake_s3_client(fake)
+    backendcli = S3Backend(s3cli)
+    rrr_a = await backendcli.put_template("a", "b", {"aaa": ""})
+    rrr_b = await backendcli.put_template("b", "b", {"bbb": ""})
+
+    rrr = await backendcli.get_templates_list()
+    assert [i.tid for i in rrr] == sorted([rrr_a.tid, rrr_b.tid]) and fake.heads == 2
+
+    # fresh manifest, no head
+    rrr = await backendcli.get_templates_list()
+    assert len(rrr) == 2 and fake.heads == 2
+
+    # changed template is head again, cold client load manifest from s3
+    await backendcli.put_template("c", "b", {"aaa": ""}, tid=rrr_a.tid)
+    backendcli = S3Backend(s3cli)
+    rrr = await backendcli.get_templates_list(template_name="c")
+    assert [i.tid for i in rrr] == [rrr_a.tid] and fake.heads == 3
+
+
+async def test_s3_list_page():
+    """Test s3 listing pages by cursor, filtered across listing pages."""
+    backendcli = S3Backend(create_fake_s3_client(FakeS3()), query_max_limit=2)
+    tids = sorted(
+        [
+            (await backendcli.put_template("a", f"t{i % 2}", {"aaa": i})).tid
+            for i in range(7)
+        ]
+    )
+
+    page = await backendcli.get_templates_page(limit=3)
+    assert [i.tid for i in page.items] == tids[:3] and page.next_cursor
+    page = await backendcli.get_templates_page(limit=3, cursor=page.next_cursor)
+    assert [i.tid for i in page.items] == tids[3:6] and page.next_cursor
+    page = await backendcli.get_templates_page(limit=3, cursor=page.next_cursor)
+    assert [i.tid for i in page.items] == tids[6:] and not page.next_cursor
+
+    rrr = [i async for i in backendcli.iter_templates(template_type="t0", page_size=2)]
+    assert len(rrr) == 4 and all(i.template_type == "t0" for i in rrr)
+
+    rrr = await backendcli.get_templates_list(limit=2, offset=5)
+    assert [i.tid for i in rrr] == tids[5:]
+
+
+async def test_db_list_page(sqlite_cli: DBBackend):
+    """Test db listing pages by keyset cursor."""
+    backendcli = DBBackend(sqlite_cli.async_session)
+    await backendcli.clean_all()
+    try:
+        for i in range(5):
+            await backendcli.put_template("a", "b" if i % 2 else "c", {"aaa": i})
+
+        rrr = [i async for i in backendcli.iter_templates(page_size=2)]
+        assert len({i.tid for i in rrr}) == 5
+        assert rrr == await backendcli.get_templates_list(limit=5)
+
+        # rows inserted before the cursor not shift the next page
+        page = await backendcli.get_templates_page(limit=2)
+        await backendcli.put_template("a", "b", {"aaa": 6})
+        page = await backendcli.get_templates_page(limit=2, cursor=page.next_cursor)
+        assert [i.tid for i in page.items] == [i.tid for i in rrr[2:4]]
+
+        rrr = [i async for i in backendcli.iter_templates(template_type="b")]
+        assert len(rrr) == 3 and all(i.template_type == "b" for i in rrr)
+
+        tid = rrr[0].tid
+        for i in range(3):
+            await backendcli.put_template("a", "b", {"aaa": i}, tid=tid)
+
+        page = await backendcli.get_templates_version_page(tid, limit=3)
+        assert page.next_cursor and len(page.items) == 3
+        page_b = await backendcli.get_templates_version_page(
+            tid, limit=3, cursor=page.next_cursor
+        )
+        assert len(page_b.items) == 1 and page_b.next_cursor is None
+        versions = await backendcli.get_templates_version_list(tid, limit=4)
+        assert page.items + page_b.items == versions
+
+        with pytest.raises(ClientParamsError):
+            await backendcli.get_templates_page(cursor="error cursor")
+
+        with pytest.raises(ClientParamsError):
+            await backendcli.get_templates_page(
+                cursor=backendcli.encode_cursor({"offset": 1})
+            )
+    finally:
+        await backendcli.clean_all()
+
+
+async def test_db_template_content(sqlite_cli: DBBackend):
+    """Test db template bodies saved once by hash, and deleted with versions."""
+    backendcli = DBBackend(sqlite_cli.async_session)
+    await backendcli.clean_all()
+
+    async def count_contents():
+        async with backendcli.session_begin() as session:
+            results = await session.execute(select(mm.TemplatesContent.content_hash))
+            return len(results.all())
+
+    try:
+        rrr_a = await backendcli.put_template("a", "b", {"aaa": 1, "bbb": 2})
+        rrr_b = await backendcli.put_template("a", "b", {"bbb": 2, "aaa": 1})
+        rrr_c = await backendcli.put_template("a", "b", {"ccc": 3}, tid=rrr_a.tid)
+        assert await count_contents() == 2
+
+        data = await backendcli.get_template(rrr_a.tid)
+        assert data and data.version_id == rrr_c.version_id
+        assert data.report == {"ccc": 3}
+
+        data = await backendcli.get_template(rrr_a.tid, rrr_a.version_id)
+        assert data and data.report == {"aaa": 1, "bbb": 2}
+
+        # current version back to the last one
+        await backendcli.delete_template(rrr_a.tid, rrr_c.version_id)
+        assert await count_contents() == 1
+        data = await backendcli.get_template(rrr_a.tid)
+        assert data and data.version_id == rrr_a.version_id
+
+        # content still used by template b
+        await backendcli.delete_template(rrr_a.tid)
+        assert await count_contents() == 1
+
+        await backendcli.delete_template(rrr_b.tid)
+        assert await count_contents() == 0
+
+        # concurrent first saves of the same body, content saved once
+        rrr = await asyncio.gather(
+            *[backendcli.put_template("a", "b", {"ddd": 4}) for _ in range(4)]
+        )
+        assert len({i.tid for i in rrr}) == 4
+        assert await count_contents() == 1
+
+        # save and gc the same content concurrently
+        for i in rrr[:3]:
+            await backendcli.delete_template(i.tid)
+
+        _, rrr_e = await asyncio.gather(
+            backendcli.delete_template(rrr[3].tid),
+            backendcli.put_template("a", "b", {"ddd": 4}),
+        )
+        data = await backendcli.get_template(rrr_e.tid)
+        assert data and data.report == {"ddd": 4}
+        assert await count_contents() == 1
+    finally:
+        await backendcli.clean_all()
+
+
+async def test_db_template_content_encoding(sqlite_cli: DBBackend):
+    """Test db template bodies compressed, plain bodies still readable."""
+    asyncsessionmaker = sqlite_cli.async_session
+    backendcli = DBBackend(asyncsessionmaker, content_encoding="gzip")
+    plaincli = DBBackend(asyncsessionmaker)
+    await backendcli.clean_all()
+    try:
+        rrr_a = await backendcli.put_template("a", "b", {"aaa": "中文"})
+        rrr_b = await plaincli.put_template("a", "b", {"bbb": ""})
+
+        async with backendcli.session_begin() as session:
+            results = await session.execute(select(mm.TemplatesContent))
+            encodings = sorted(i.content_encoding for i in results.scalars())
+        assert encodings == ["", "gzip"]
+
+        data = await backendcli.get_template(rrr_b.tid)
+        assert data and data.report == {"bbb": ""}
+        data = await plaincli.get_template(rrr_a.tid)
+        assert data and data.report == {"aaa": "中文"}
+
+        with pytest.raises(ValueError):
+            DBBackend(asyncsessionmaker, content_encoding="br")
+    finally:
+        await backendcli.clean_all()
+
+
+async def test_s3_template_content_encoding():
+    """Test s3 template objects compressed, plain objects still readable."""
+    fake = FakeS3()
+    backendcli = S3Backend(create_fake_s3_client(fake), content_encoding="gzip")
+    rrr = await backendcli.put_template("a", "b", {"aaa": "中文"})
+    obj = fake.objects[backendcli.make_template_key(rrr.tid)]
+    assert obj["ContentEncoding"] == "gzip"
+    assert backendcli.decode_report(obj["Body"], "gzip") == {"aaa": "中文"}
+
+    data = await backendcli.get_template(rrr.tid)
+    assert data and data.report == {"aaa": "中文"}
+
+    # objects saved before compression
+    obj.pop("ContentEncoding")
+    obj["Body"] = json.dumps({"bbb": ""}, indent=2).encode()
+    data = await backendcli.get_template(rrr.tid)
+    assert data and data.report == {"bbb": ""}
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 13:40:12.
+
+@author: ppolxda
+
+@desc: test template cache
+"""
+from reportbro_designer_api.backend import DBBackend
+from reportbro_designer_api.backend import TemplateCache
+from reportbro_designer_api.utils.cache import LRUCache
+
+
+def test_lru_cache():
+    """Test lru cache evict by size."""
+    cache: LRUCache[str] = LRUCache(10, name="test")
+    cache.set("a", "a", 4)
+    cache.set("b", "b", 4)
+    assert cache.get("a") == "a"
+
+    # b is least recently used
+    cache.set("c", "c", 4)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.stats.evictions == 1 and cache.stats.size == 8
+
+    # bigger than max_size, not cached
+    cache.set("d", "d", 11)
+    assert "d" not in cache and len(cache) == 2
+
+    assert cache.get("b") is None
+    assert cache.stats.hits == 1 and cache.stats.misses == 1
+
+    assert cache.pop("a") == "a"
+    assert cache.stats.size == 4 and cache.stats.items == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.stats.size == 0
+
+
+async def test_backend_template_cache(sqlite_cli: DBBackend):
+    """Test backend template version cache."""
+    cache = TemplateCache(1024 * 1024)
+    backendcli = DBBackend(sqlite_cli.async_session, template_cache=cache)
+    await backendcli.clean_all()
+    try:
+        body = {"aaa": "bbb"}
+        rrr = await backendcli.put_template("a", "b", body)
+
+        data = await backendcli.get_template_cached(rrr.tid, rrr.version_id)
+        assert data and data.report == body
+        assert cache.stats.misses == 1 and cache.stats.items == 1
+
+        # cached template is a fresh copy
+        data.report["aaa"] = "ccc"
+        data = await backendcli.get_template_cached(rrr.tid, rrr.version_id)
+        assert data and data.report == body and data.version_id == rrr.version_id
+        assert cache.stats.hits == 1
+
+        # without version_id, always load current version
+        data = await backendcli.get_template_cached(rrr.tid)
+        assert data and data.report == body
+        assert cache.stats.hits == 1 and cache.stats.misses == 1
+
+        # not found is not cached
+        data = await backendcli.get_template_cached(rrr.tid, "error vid")
+        assert data is None and cache.stats.items == 1
+    finally:
+        await backendcli.clean_all()
+
+
+async def test_backend_template_version_cache(sqlite_cli: DBBackend):
+    """Test backend template current version cache."""
+    cache = TemplateCache(1024 * 1024, version_ttl=60)
+    backendcli = DBBackend(sqlite_cli.async_session, template_cache=cache)
+    await backendcli.clean_all()
+    try:
+        rrr_a = await backendcli.put_template("a", "b", {"aaa": ""})
+        data = await backendcli.get_template_cached(rrr_a.tid)
+        assert data and data.version_id == rrr_a.version_id
+        assert cache.versions and cache.versions.stats.items == 1
+
+        # current version resolved from cache
+        data = await backendcli.get_template_cached(rrr_a.tid)
+        assert data and data.version_id == rrr_a.version_id
+        assert cache.versions.stats.hits == 1 and cache.stats.hits == 1
+
+        # save invalidate current version
+        rrr_b = await backendcli.put_template("a", "b", {"bbb": ""}, tid=rrr_a.tid)
+        data = await backendcli.get_template_cached(rrr_a.tid)
+        assert data and data.version_id == rrr_b.version_id
+        assert data.report == {"bbb": ""}
+
+        # delete remove cached versions
+        await backendcli.delete_template(rrr_a.tid)
+        assert await backendcli.get_template_cached(rrr_a.tid) is None
+        assert (
+            await backendcli.get_template_cached(rrr_a.tid, rrr_a.version_id) is None
+        )
+    finally:
+        await backendcli.clean_all()
+
+
+def test_lru_cache_ttl(monkeypatch):
+    """Test lru cache expire items."""
+    now = [100.0]
+    monkeypatch.setattr("reportbro_designer_api.utils.cache.monotonic", lambda: now[0])
+    cache: LRUCache[str] = LRUCache(10, ttl=5)
+    cache.set("a", "a", 1)
+    now[0] += 4
+    assert cache.get("a") == "a"
+    now[0] += 1
+    assert cache.get("a") is None and len(cache) == 0
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 19:21:36.
+
+@author: ppolxda
+
+@desc: test font registry
+"""
+import datetime
+from functools import partial
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fpdf import FPDF
+
+from reportbro_designer_api.utils.fonts import FontOutputProducer
+from reportbro_designer_api.utils.fonts import FontRegistry
+from reportbro_designer_api.utils.fonts import load_font_metrics
+from reportbro_designer_api.utils.fonts import pack_font_metrics
+from reportbro_designer_api.utils.report import WARMUP_TEXT
+from reportbro_designer_api.utils.report import ReportFontsLoader
+from reportbro_designer_api.utils.report import warmup_report
+
+FONT_TEXT = WARMUP_TEXT + "?!Hello"
+
+
+def make_font(path: str, weight: int = 400):
+    """Build a tiny ttf, every char is a box."""
+    pen = TTGlyphPen(None)
+    pen.moveTo((50, 0))
+    pen.lineTo((50, 700))
+    pen.lineTo((450, 700))
+    pen.lineTo((450, 0))
+    pen.closePath()
+    box = pen.glyph()
+
+    chars = sorted(set(FONT_TEXT))
+    names = [".notdef"] + [f"uni{ord(i):04X}" for i in chars]
+    fbr = FontBuilder(1000, isTTF=True)
+    fbr.setupGlyphOrder(names)
+    fbr.setupCharacterMap({ord(i): f"uni{ord(i):04X}" for i in chars})
+    fbr.setupGlyf({i: box for i in names})
+    fbr.setupHorizontalMetrics({i: (500 + idx, 50) for idx, i in enumerate(names)})
+    fbr.setupHorizontalHeader(ascent=800, descent=-200)
+    fbr.setupNameTable({"familyName": "Test", "styleName": "Regular"})
+    fbr.setupOS2(usWeightClass=weight, sCapHeight=700)
+    fbr.setupPost()
+    fbr.save(path)
+
+
+def render_doc(font_path: str, registry=None) -> bytes:
+    """Render a pdf with fpdf, add font by registry if set."""
+    pdf = FPDF()
+    pdf.set_creation_date(datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+    if registry:
+        pdf.add_font = partial(registry.add_font, pdf)
+
+    pdf.add_font("test", style="", fname=font_path)
+    pdf.add_font("test", style="B", fname=font_path)
+    pdf.add_page()
+    pdf.set_font("test", size=12)
+    pdf.cell(text=FONT_TEXT)
+    pdf.set_font("test", "B", size=12)
+    pdf.cell(text="Hello")
+    if registry:
+        producer = partial(FontOutputProducer, registry=registry)
+        return bytes(pdf.output(output_producer_class=producer))
+    return bytes(pdf.output())
+
+
+def test_font_registry(tmp_path):
+    """Test font registry output same pdf as fpdf, and parse font once."""
+    font_path = str(tmp_path / "Test-regular.ttf")
+    make_font(font_path)
+
+    registry = FontRegistry()
+    expect = render_doc(font_path)
+    assert render_doc(font_path, registry) == expect
+    assert render_doc(font_path, registry) == expect
+    assert len(registry.metrics) == 1
+
+    # replaced font file is parsed again
+    make_font(font_path, 700)
+    render_doc(font_path, registry)
+    assert len(registry.metrics) == 2
+
+
+def test_font_metrics_pack(tmp_path):
+    """Test packed metrics same as fpdf parsed font."""
+    font_path = str(tmp_path / "Test-regular.ttf")
+    make_font(font_path)
+
+    pdf = FPDF()
+    pdf.add_font("test", fname=font_path)
+    font = pdf.fonts["test"]
+    metrics = load_font_metrics(pack_font_metrics(font_path))
+    assert metrics.name == font.name and metrics.scale == font.scale
+    assert (metrics.up, metrics.ut) == (font.up, font.ut)
+    assert dict(metrics.cw) == dict(font.cw)
+    assert dict(metrics.cmap) == dict(font.cmap)
+    assert dict(metrics.glyph_ids) == dict(font.glyph_ids)
+    assert metrics.cw[0x10FFFF] == font.desc.missing_width
+    assert metrics.cw.get(0x10FFFF) is None and 0x10FFFF not in metrics.cmap
+
+
+def test_font_metrics_cache(tmp_path):
+    """Test metrics cache file shared by registries."""
+    font_path = str(tmp_path / "Test-regular.ttf")
+    cache_path = tmp_path / "cache"
+    make_font(font_path)
+    expect = render_doc(font_path)
+
+    registry = FontRegistry(str(cache_path))
+    assert render_doc(font_path, registry) == expect
+    cache_files = list(cache_path.iterdir())
+    assert len(cache_files) == 1
+
+    # another worker map the cache file, never parse the font
+    registry = FontRegistry(str(cache_path))
+    mtime = cache_files[0].stat().st_mtime_ns
+    assert render_doc(font_path, registry) == expect
+    assert cache_files[0].stat().st_mtime_ns == mtime
+
+    # broken cache file is rebuilt
+    cache_files[0].write_bytes(b"broken")
+    registry = FontRegistry(str(cache_path))
+    assert render_doc(font_path, registry) == expect
+    assert load_font_metrics(cache_files[0].read_bytes()).name == "Test"
+
+
+def test_font_subset_cache(tmp_path):
+    """Test font subsets reused for the same glyphs."""
+    font_path = str(tmp_path / "Test-regular.ttf")
+    make_font(font_path)
+    expect = render_doc(font_path)
+
+    registry = FontRegistry(subset_cache_size=1024 * 1024)
+    assert render_doc(font_path, registry) == expect
+    assert registry.subsets.stats.items == 2
+    assert registry.subsets.stats.hits == 0
+
+    assert render_doc(font_path, registry) == expect
+    assert registry.subsets.stats.items == 2
+    assert registry.subsets.stats.hits == 2
+
+
+def test_fonts_loader_lazy(tmp_path):
+    """Test fonts loader scan path on first use."""
+    loader = ReportFontsLoader(str(tmp_path), subset_cache_size=1024 * 1024)
+    make_font(str(tmp_path / "Test-regular.ttf"))
+    make_font(str(tmp_path / "Test-bold.ttf"), 700)
+    assert [i["value"] for i in loader.fonts] == ["Test"]
+
+    assert warmup_report(loader)
+    assert warmup_report(loader)
+    assert len(loader.registry.metrics) == 2
+    assert loader.registry.subsets.stats.hits == 2
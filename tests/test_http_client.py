@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 15:10:26.
+
+@author: ppolxda
+
+@desc: test shared http client
+"""
+import asyncio
+
+from aiohttp import web
+
+from reportbro_designer_api.utils.http_client import HttpClient
+
+
+async def test_http_client():
+    """Test http client bounded concurrency and keep-alive."""
+    running = [0, 0]
+    peers = set()
+
+    async def handle(request: web.Request):
+        running[0] += 1
+        running[1] = max(running)
+        peers.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(0.05)
+        running[0] -= 1
+        return web.json_response({"path": request.path})
+
+    app = web.Application()
+    app.router.add_get("/{name}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    http = HttpClient(timeout=10, pool_size=10, concurrency=2)
+    try:
+
+        async def fetch(name):
+            async with http.get(f"http://127.0.0.1:{port}/{name}") as resp:
+                return (await resp.json())["path"]
+
+        names = [str(i) for i in range(6)]
+        rrr = await asyncio.gather(*[fetch(i) for i in names])
+        assert rrr == ["/" + i for i in names]
+        assert running[1] == 2
+        # connections are reused
+        assert len(peers) == 2
+    finally:
+        await http.close()
+        await runner.cleanup()
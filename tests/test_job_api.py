@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 16:05:48.
+
+@author: ppolxda
+
+@desc: test render jobs
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from reportbro_designer_api.backend import DBBackend
+from reportbro_designer_api.clients import create_job_store
+from reportbro_designer_api.jobs import JobInfo
+from reportbro_designer_api.jobs import JobMange
+from reportbro_designer_api.jobs import JobStatus
+from reportbro_designer_api.jobs import JobStoreBase
+from reportbro_designer_api.settings import settings
+
+
+async def job_store_test(store: JobStoreBase):
+    """Test job store api function."""
+    await store.clean_all()
+    try:
+        job = JobInfo(job_id="a", tid="b", version_id="c")
+        await store.put_job(job)
+        rrr = await store.get_job("a")
+        assert rrr and rrr.tid == "b" and rrr.status == JobStatus.PENDING
+
+        job.status = JobStatus.SUCCESS
+        job.download_key = "key:aaa"
+        await store.put_job(job)
+        rrr = await store.get_job("a")
+        assert rrr and rrr.status == JobStatus.SUCCESS and rrr.download_key == "key:aaa"
+
+        # project isolated
+        assert await store.get_job("a", project="other") is None
+        assert await store.get_job("error id") is None
+    finally:
+        await store.clean_all()
+
+
+async def test_memory_job_store():
+    """Test memory job store."""
+    await job_store_test(create_job_store("memory://"))
+
+
+async def test_sqlite_job_store(sqlite_cli: DBBackend):
+    """Test database job store."""
+    assert sqlite_cli
+    await job_store_test(create_job_store(settings.DB_URL))
+
+
+async def test_job_mange():
+    """Test job run and state."""
+    jobs = JobMange(create_job_store("memory://"))
+
+    async def success(progress):
+        await progress(50)
+        assert (await jobs.get_job(job.job_id)).progress == 50
+        return "key:aaa"
+
+    job = await jobs.create_job("a", "b")
+    await jobs.submit(job, success)
+    rrr = await jobs.get_job(job.job_id)
+    assert rrr and rrr.status == JobStatus.SUCCESS and rrr.progress == 100
+    assert rrr.download_key == "key:aaa" and rrr.is_done
+
+    async def failed(progress):
+        raise HTTPException(status_code=400, detail="bad input")
+
+    job = await jobs.create_job("a", "b")
+    await jobs.submit(job, failed)
+    rrr = await jobs.get_job(job.job_id)
+    assert rrr and rrr.status == JobStatus.FAILED and rrr.error == "bad input"
+
+    async def slow(progress):
+        await asyncio.sleep(10)
+        return ""
+
+    job = await jobs.create_job("a", "b")
+    task = jobs.submit(job, slow)
+    await asyncio.sleep(0)
+    await jobs.shutdown()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    rrr = await jobs.get_job(job.job_id)
+    assert rrr and rrr.status == JobStatus.FAILED and not jobs.tasks
@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 11:02:45.
+
+@author: ppolxda
+
+@desc: test render dispatcher
+"""
+import asyncio
+import json
+import os
+import time
+from copy import deepcopy
+
+import filetype
+import PyPDF2
+import pytest
+from fastapi import BackgroundTasks
+from fastapi import HTTPException
+from fastapi import Request
+
+from reportbro_designer_api.backend.schemas import TemplateConfigInfo
+from reportbro_designer_api.endpoints import reportbro_api
+from reportbro_designer_api.endpoints.reportbro_api import gen_file_from_report
+from reportbro_designer_api.endpoints.reportbro_api import gen_file_from_template
+from reportbro_designer_api.endpoints.reportbro_api import generate_templates_gen
+from reportbro_designer_api.endpoints.reportbro_api import iter_batch_datas
+from reportbro_designer_api.endpoints.reportbro_api import iter_file_chunks
+from reportbro_designer_api.endpoints.reportbro_api import make_inline_response
+from reportbro_designer_api.endpoints.reportbro_api import make_render_filename
+from reportbro_designer_api.endpoints.reportbro_api import make_render_hash
+from reportbro_designer_api.endpoints.reportbro_api import parse_range
+from reportbro_designer_api.endpoints.reportbro_api import read_file_in_s3
+from reportbro_designer_api.endpoints.reportbro_api import render_batch
+from reportbro_designer_api.endpoints.reportbro_api import render_file_cached
+from reportbro_designer_api.endpoints.reportbro_api import stream_file_response
+from reportbro_designer_api.endpoints.reportbro_schema import RequestGenerateTemplate
+from reportbro_designer_api.errors import RenderQueueFullError
+from reportbro_designer_api.errors import RenderTimeoutError
+from reportbro_designer_api.errors import StorageError
+from reportbro_designer_api.settings import settings
+from reportbro_designer_api.storage import LocalStorage
+from reportbro_designer_api.storage import StorageMange
+from reportbro_designer_api.utils.pdf import PdfMergeFile
+from reportbro_designer_api.utils.pdf import spool_file
+from reportbro_designer_api.utils.pdf import spool_pdf
+from reportbro_designer_api.utils.render import RenderDispatcher
+from reportbro_designer_api.utils.render import get_current_memory
+from reportbro_designer_api.utils.render import get_peak_memory
+from reportbro_designer_api.utils.report import ReportFontsLoader
+from reportbro_designer_api.utils.report import warmup_report
+
+FPATH = os.path.abspath(os.path.dirname(__file__))
+
+
+def load_template():
+    """Load test template and data."""
+    with open(FPATH + "/data/default_template.json", "r", encoding="utf8") as fss:
+        report = json.loads(fss.read())
+
+    with open(FPATH + "/data/default_template_data.json", "r", encoding="utf8") as fss:
+        data = json.loads(fss.read())
+
+    return report, data
+
+
+def sleep_task(seconds: float):
+    """Sleep task."""
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+async def test_render_dispatcher(mode):
+    """Test render in every executor mode."""
+    render = RenderDispatcher(mode, pool_size=2)
+    report, data = load_template()
+    try:
+        filename, report_file = await render.run(
+            gen_file_from_report, "pdf", report, data, False, False
+        )
+        assert filename.endswith(".pdf")
+        assert filetype.guess(report_file).extension == "pdf"
+
+        # HTTPException raised in worker keep the status code
+        with pytest.raises(HTTPException) as ex:
+            await render.run(gen_file_from_report, "doc", report, data, False, False)
+        assert ex.value.status_code == 400
+    finally:
+        render.shutdown()
+
+
+async def test_render_dispatcher_bounded():
+    """Test render queue bound and timeout."""
+    render = RenderDispatcher("thread", pool_size=1, queue_size=1, timeout=0)
+    try:
+        tasks = [asyncio.create_task(render.run(sleep_task, 0.3)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(RenderQueueFullError):
+            await render.run(sleep_task, 0)
+
+        assert await asyncio.gather(*tasks) == [0.3, 0.3]
+        assert render.pending == 0
+    finally:
+        render.shutdown()
+
+    render = RenderDispatcher("thread", pool_size=1, timeout=0.1)
+    try:
+        with pytest.raises(RenderTimeoutError):
+            await render.run(sleep_task, 0.3)
+    finally:
+        render.shutdown()
+
+
+async def test_render_dispatcher_recycle():
+    """Test process pool recycle after max tasks."""
+    render = RenderDispatcher(
+        "process", pool_size=1, initializer=os.getpid, max_tasks_per_child=3
+    )
+    try:
+        await render.warmup()
+        executor = render.executor
+        pid = await render.run(os.getpid)
+        assert render.executor is executor and render.tasks == 1
+
+        assert await render.run(os.getpid) == pid
+        assert await render.run(os.getpid) == pid
+        assert render.executor is not executor and render.recycled == 1
+        assert await render.run(os.getpid) != pid
+    finally:
+        render.shutdown()
+
+
+async def test_render_dispatcher_recycle_idle():
+    """Test warmup of a recycled pool not counted, idle pool not recycled."""
+    render = RenderDispatcher(
+        "process", pool_size=2, initializer=os.getpid, max_tasks_per_child=1
+    )
+    try:
+        await render.warmup()
+        assert render.recycled == 0 and render.tasks == 0
+
+        await render.run(os.getpid)
+        assert render.recycled == 1
+        await asyncio.sleep(0.5)
+        assert render.recycled == 1 and render.tasks == 0
+        # current memory, not the peak inherited from the parent
+        assert 0 < get_current_memory() <= get_peak_memory()
+    finally:
+        render.shutdown()
+
+
+def test_warmup_report(tmp_path):
+    """Test render warmup report."""
+    assert warmup_report(ReportFontsLoader(str(tmp_path)))
+
+
+def test_pdf_merge_file():
+    """Test merge pdf in spooled temp file."""
+    report, data = load_template()
+    _, report_file = gen_file_from_report("pdf", report, data, False, False)
+    pages = PyPDF2.PdfReader(spool_file(report_file, 1024)).pages
+
+    with PdfMergeFile(1024) as merge_file:
+        for _ in range(3):
+            merge_file.append(spool_file(report_file, 1024))
+
+        with merge_file.write() as output:
+            assert len(PyPDF2.PdfReader(output).pages) == len(pages) * 3
+
+    assert not merge_file.inputs
+
+
+async def test_spool_pdf():
+    """Test stream pdf chunks to spooled temp file."""
+    report, data = load_template()
+    _, report_file = gen_file_from_report("pdf", report, data, False, False)
+
+    async def chunks(content: bytes, size: int = 100):
+        for i in range(0, len(content), size):
+            yield content[i : i + size]
+
+    with await spool_pdf(chunks(report_file), 0, 1024) as fss:
+        assert fss.read() == report_file
+
+    with pytest.raises(HTTPException) as ex:
+        await spool_pdf(chunks(report_file), len(report_file) - 1, 1024)
+    assert ex.value.status_code == 400 and "too large" in ex.value.detail
+
+    with pytest.raises(HTTPException) as ex:
+        await spool_pdf(chunks(b"not pdf" * 100), 0, 1024)
+    assert ex.value.status_code == 400 and "not pdf" in ex.value.detail
+
+
+async def test_iter_file_chunks(tmp_path, monkeypatch):
+    """Test local file read in chunks off the event loop."""
+    fpath = tmp_path / "a.pdf"
+    fpath.write_bytes(b"a" * 100)
+    calls = []
+
+    async def run_in_threadpool(func, *args):
+        calls.append(func)
+        return func(*args)
+
+    monkeypatch.setattr(reportbro_api, "run_in_threadpool", run_in_threadpool)
+    chunks = [i async for i in iter_file_chunks(str(fpath), chunk_size=40)]
+    assert [len(i) for i in chunks] == [40, 40, 20]
+    assert len(calls) == 5 and calls[0] is open
+
+
+async def test_render_batch():
+    """Test batch render in order with item errors."""
+    render = RenderDispatcher("thread", pool_size=2)
+    report, data = load_template()
+    try:
+        rrr = [
+            i
+            async for i in render_batch(
+                render, "pdf", report, iter_batch_datas([data] * 5), False
+            )
+        ]
+        assert [i[0].index for i in rrr] == list(range(5))
+        assert len({i[1][0] for i in rrr}) == 5
+        assert all(filetype.guess(i[1][1]).extension == "pdf" for i in rrr)
+
+        rrr = [
+            i
+            async for i in render_batch(
+                render, "doc", report, iter_batch_datas([data] * 2), False
+            )
+        ]
+        assert all(i[0].error and i[1] is None for i in rrr)
+    finally:
+        render.shutdown()
+
+
+def test_gen_file_from_template(monkeypatch):
+    """Test batch items render their own definition, rendering change it."""
+    definitions = []
+
+    def gen_file(output_format, report_definition, *args):
+        report_definition["docElements"] = []
+        definitions.append(report_definition)
+        return "a.pdf", b""
+
+    report, _ = load_template()
+    template = json.dumps(report)
+    monkeypatch.setattr(reportbro_api, "gen_file_from_report", gen_file)
+    gen_file_from_template("pdf", template, {}, False)
+    gen_file_from_template("pdf", template, {}, False)
+    assert definitions[0] is not definitions[1]
+
+
+async def test_render_file_cached(tmp_path, monkeypatch):
+    """Test identical render reuse the stored file."""
+    monkeypatch.setattr(settings, "RENDER_CACHE_TTL", 60)
+    storage = StorageMange(LocalStorage(str(tmp_path), storage_ttl=600))
+    render = RenderDispatcher("inline")
+    report, data = load_template()
+    templage = TemplateConfigInfo(
+        tid="tid", version_id="vid", template_name="a", template_type="b", report=report
+    )
+
+    data_b = dict(reversed(list(deepcopy(data).items())))
+    key_a = await render_file_cached(render, storage, templage, "pdf", data, False)
+    filename, report_file = await storage.get_file(key_a)
+    assert filename.startswith("report-") and filetype.guess(report_file)
+
+    # same inputs in another key order, not rendered again
+    calls = []
+    monkeypatch.setattr(render, "run", lambda *a: calls.append(a))
+    key_b = await render_file_cached(render, storage, templage, "pdf", data_b, False)
+    assert key_b == key_a and not calls
+
+    # file older than ttl is not reused
+    assert await storage.get_file_cached(filename, 60) == key_a
+    assert await storage.get_file_cached(filename, 0) is None
+
+    # file near storage expired is not reused, it may be removed before download
+    fpath = next(tmp_path.rglob(filename))
+    os.utime(fpath, (time.time() - 400, time.time() - 400))
+    assert await storage.get_file_cached(filename, 3600) is None
+    assert make_render_hash("tid", "vid", "pdf", data_b, False) != make_render_hash(
+        "tid", "vid", "pdf", data_b, True
+    )
+
+
+async def test_inline_render_cached(tmp_path, monkeypatch):
+    """Test inline stored file reused by later renders of the same data."""
+    monkeypatch.setattr(settings, "RENDER_CACHE_TTL", 60)
+    storage = StorageMange(LocalStorage(str(tmp_path), storage_ttl=600))
+    render = RenderDispatcher("inline")
+    report, data = load_template()
+    templage = TemplateConfigInfo(
+        tid="tid", version_id="vid", template_name="a", template_type="b", report=report
+    )
+
+    class Client:
+        async def get_template_cached(self, tid, version_id=None):
+            return templage
+
+    async def generate(store: bool):
+        background_tasks = BackgroundTasks()
+        response = await generate_templates_gen(
+            None,
+            RequestGenerateTemplate(output_format="pdf", data=deepcopy(data)),
+            background_tasks,
+            tid="tid",
+            version_id=None,
+            disabled_fill=False,
+            delivery="inline",
+            store=store,
+            client=Client(),
+            storage=storage,
+            render=render,
+        )
+        await background_tasks()
+        return response
+
+    response = await generate(True)
+    calls = []
+    cached_render = RenderDispatcher("inline")
+    monkeypatch.setattr(cached_render, "run", lambda *a: calls.append(a))
+    key = await render_file_cached(
+        cached_render, storage, templage, "pdf", data, False
+    )
+    assert key == response.headers["X-Download-Key"] and not calls
+
+    # not stored, the render filename
+    response = await generate(False)
+    filename = make_render_filename(templage, "pdf", data, False)
+    assert filename not in response.headers["Content-Disposition"]
+    assert "X-Download-Key" not in response.headers
+
+
+async def test_inline_response_write_behind(tmp_path, monkeypatch):
+    """Test inline file is written to storage after response."""
+    storage = StorageMange(LocalStorage(str(tmp_path)))
+    background_tasks = BackgroundTasks()
+    report_file = spool_file(b"%PDF-1.4 test", 1024)
+    response = make_inline_response(
+        "pdf", "a.pdf", report_file, background_tasks, storage
+    )
+    assert response.media_type == "application/pdf"
+    key = response.headers["X-Download-Key"]
+
+    # streamed to the end before write behind
+    assert b"".join([i async for i in response.body_iterator]) == b"%PDF-1.4 test"
+    await background_tasks()
+    assert await storage.get_file(key) == ("a.pdf", b"%PDF-1.4 test")
+    assert report_file.closed
+
+
+async def test_redirect_fallback_local(tmp_path, monkeypatch):
+    """Test local storage download is proxied when redirect."""
+    storage = StorageMange(LocalStorage(str(tmp_path)))
+    key = await storage.put_file("a.pdf", b"%PDF-1.4 test")
+    assert await storage.get_presigned_url(key, 60) is None
+
+    response = await read_file_in_s3("pdf", key, storage, redirect=True)
+    assert response.status_code == 200 and response.media_type == "application/pdf"
+
+
+async def test_redirect_presigned_enabled(tmp_path, monkeypatch):
+    """Test download redirect to presigned url only when enabled."""
+    storage = StorageMange(LocalStorage(str(tmp_path)))
+    key = await storage.put_file("a.pdf", b"%PDF-1.4 test")
+
+    async def get_presigned_url(*args):
+        return "http://127.0.0.1:9000/a.pdf"
+
+    monkeypatch.setattr(storage, "get_presigned_url", get_presigned_url)
+    response = await read_file_in_s3("pdf", key, storage, redirect=True)
+    assert response.status_code == 200
+
+    monkeypatch.setattr(settings, "PRESIGNED_URL_ENABLED", True)
+    response = await read_file_in_s3("pdf", key, storage, redirect=True)
+    assert response.status_code == 307
+
+
+def test_parse_range():
+    """Test parse single bytes range."""
+    assert parse_range("", 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=90-200", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("bytes=a-b", 100) is None
+    with pytest.raises(HTTPException) as ex:
+        parse_range("bytes=100-", 100)
+    assert ex.value.status_code == 416
+
+
+async def test_stream_file_response(tmp_path, monkeypatch):
+    """Test stream stored file with range and etag."""
+    storage = StorageMange(LocalStorage(str(tmp_path)))
+    data = b"%PDF-1.4 " + bytes(range(256)) * 1024
+    key = await storage.put_file("a.pdf", data)
+
+    def make_request(**headers):
+        return Request(
+            {
+                "type": "http",
+                "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+            }
+        )
+
+    async def read_body(response):
+        return b"".join([i async for i in response.body_iterator])
+
+    response = await stream_file_response(
+        storage, key, "application/pdf", make_request()
+    )
+    assert response.status_code == 200 and await read_body(response) == data
+    etag = response.headers["etag"]
+
+    response = await stream_file_response(
+        storage, key, "application/pdf", make_request(range="bytes=10-70009")
+    )
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-70009/{len(data)}"
+    assert await read_body(response) == data[10:70010]
+
+    response = await stream_file_response(
+        storage, key, "application/pdf", make_request(**{"if-none-match": etag})
+    )
+    assert response.status_code == 304
+
+    # file expired after stat, raised before the response starts
+    fstat = await storage.stat_file(key)
+
+    async def stat_file(*args):
+        return fstat
+
+    monkeypatch.setattr(storage, "stat_file", stat_file)
+    next(tmp_path.rglob("a.pdf")).unlink()
+    with pytest.raises(StorageError):
+        await stream_file_response(storage, key, "application/pdf", make_request())
@@ -8,9 +8,14 @@
 """
 import asyncio
 import os
+import time
+from io import BytesIO
 
 import pytest
+from botocore.client import ClientError
 
+from reportbro_designer_api.clients import create_s3_client
+from reportbro_designer_api.errors import StorageError
 from reportbro_designer_api.storage import LocalStorage
 from reportbro_designer_api.storage import S3Storage
 from reportbro_designer_api.storage import StorageBase
@@ -39,6 +44,145 @@ async def test_local_api(localstorage: LocalStorage):
     """Test s3 reportbro api function."""
     localstorage.storage_ttl = 5
     await storage_test(localstorage)
-    assert os.path.exists("./upload/data/testfile.pdf")
-    await asyncio.sleep(6)
-    assert not os.path.exists("./upload/data/testfile.pdf")
+    fpath = localstorage.storage_path.joinpath("data/testfile.pdf")
+    assert fpath.exists()
+    assert await localstorage.sweep(time.time() + 6) == 1
+    assert not fpath.exists()
+
+
+async def test_local_sweeper(tmp_path):
+    """Test local storage remove expired files, and files left by last process."""
+    os.makedirs(tmp_path / "a")
+    (tmp_path / "a" / "old.pdf").write_bytes(b"old")
+    localstorage = LocalStorage(str(tmp_path), storage_ttl=60, sweep_batch=1)
+    await localstorage.start()
+    try:
+        await localstorage.put_file("s3://tests/a/new.pdf", b"new")
+        await localstorage.put_file("s3://tests/a/b.pdf", b"b")
+        assert len(localstorage.expires) == 3
+        assert await localstorage.sweep() == 0
+
+        # written again after tracked, not removed by the old expire
+        now = time.time()
+        os.utime(tmp_path / "a" / "b.pdf", (now + 30, now + 30))
+        assert await localstorage.sweep(now + 61) == 2
+        assert sorted(os.listdir(tmp_path / "a")) == ["b.pdf"]
+        assert not localstorage.expires
+    finally:
+        await localstorage.shutdown()
+
+    assert localstorage.sweeper is None
+
+
+async def test_s3_client_shared():
+    """Test s3 client is shared after open."""
+    s3cli = create_s3_client("s3://minioadmin:minioadmin@127.0.0.1:9000/reportbro")
+    assert s3cli.config.max_pool_connections == 50
+    async with s3cli.s3cli() as cli_a, s3cli.s3cli() as cli_b:
+        assert cli_a is not cli_b
+
+    await s3cli.open()
+    try:
+        async with s3cli.s3cli() as cli_a, s3cli.s3cli() as cli_b:
+            assert cli_a is cli_b
+    finally:
+        await s3cli.close()
+
+    async with s3cli.s3cli() as cli_b:
+        assert cli_a is not cli_b
+
+
+async def test_s3_client_bootstrap_once(monkeypatch):
+    """Test concurrent bucket bootstrap run once."""
+    s3cli = create_s3_client("s3://minioadmin:minioadmin@127.0.0.1:9000/reportbro")
+    calls = []
+
+    async def is_bucket_exist(*args):
+        calls.append(args)
+        await asyncio.sleep(0.01)
+        return True
+
+    async def enable(*args):
+        pass
+
+    monkeypatch.setattr(s3cli, "_S3Client__is_bucket_exist", is_bucket_exist)
+    monkeypatch.setattr(s3cli, "_S3Client__enable_bucket_versioning", enable)
+    monkeypatch.setattr(s3cli, "_S3Client__enable_bucket_lifecycle", enable)
+    await asyncio.gather(*[s3cli.create_bucket_when_not_exist() for _ in range(10)])
+    assert s3cli.ready and len(calls) == 1
+
+
+async def test_s3_client_lifecycle_merge():
+    """Test missing lifecycle rules added to existing bucket rules."""
+    s3cli = create_s3_client("s3://minioadmin:minioadmin@127.0.0.1:9000/reportbro")
+    old_rule = s3cli.lifecycle_rules()[0]
+    user_rule = {"ID": "UserRule", "Status": "Enabled", "Prefix": "user/"}
+
+    class FakeClient:
+        rules = [old_rule, user_rule]
+        puts = 0
+
+        async def get_bucket_lifecycle_configuration(self, Bucket):
+            return {"Rules": list(self.rules)}
+
+        async def put_bucket_lifecycle_configuration(self, Bucket, LifecycleConfiguration):
+            self.rules = LifecycleConfiguration["Rules"]
+            self.puts += 1
+            return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    client = FakeClient()
+    s3cli._client, s3cli._loop = client, asyncio.get_running_loop()
+    await s3cli._S3Client__enable_bucket_lifecycle()
+    assert [i["ID"] for i in client.rules] == [
+        "ReviewFileTemplate",
+        "UserRule",
+        "RenderJobs",
+    ]
+
+    # all rules exist, not put again
+    await s3cli._S3Client__enable_bucket_lifecycle()
+    assert client.puts == 1
+
+
+async def test_s3_iter_file_not_exist():
+    """Test s3 iter file raise StorageError when object not exist."""
+    s3cli = create_s3_client("s3://minioadmin:minioadmin@127.0.0.1:9000/reportbro")
+    bootstraps = []
+
+    async def bootstrap():
+        bootstraps.append(1)
+        s3cli.ready = True
+
+    class FakeClient:
+        async def get_object(self, **kwargs):
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+
+    s3cli.bootstrap = bootstrap
+    s3cli._client, s3cli._loop = FakeClient(), asyncio.get_running_loop()
+    storage = S3Storage(s3cli)
+    with pytest.raises(StorageError):
+        await storage.iter_file("s3://reportbro/review/a.pdf").__anext__()
+    assert bootstraps
+
+
+async def test_local_put_atomic(tmp_path):
+    """Test local storage write by rename, a failed write keep the old file."""
+    localstorage = LocalStorage(str(tmp_path), storage_ttl=0)
+    s3_key = "s3://tests/a/a.pdf"
+    assert await localstorage.get_file(s3_key) is None
+    assert await localstorage.stat_file(s3_key) is None
+
+    await localstorage.put_file(s3_key, BytesIO(b"a" * 100))
+    assert await localstorage.get_file(s3_key) == b"a" * 100
+
+    class BrokenFile(BytesIO):
+        def read(self, *args):
+            raise OSError("disk error")
+
+    with pytest.raises(OSError):
+        await localstorage.put_file(s3_key, BrokenFile())
+
+    assert os.listdir(tmp_path / "a") == ["a.pdf"]
+    chunks = [i async for i in localstorage.iter_file(s3_key, 10, 49, chunk_size=16)]
+    assert [len(i) for i in chunks] == [16, 16, 8] and b"".join(chunks) == b"a" * 40
+    assert not localstorage.expires
@@ -9,7 +9,10 @@
 
 import json
 import os
+import time
+import zipfile
 from copy import deepcopy
+from io import BytesIO
 from uuid import uuid1
 
 import filetype
@@ -18,9 +21,14 @@ from fastapi.testclient import TestClient
 
 from reportbro_designer_api.backend import DBBackend
 from reportbro_designer_api.backend import S3Backend
+from reportbro_designer_api.clients import get_storage_mange
 from reportbro_designer_api.endpoints import reportbro_schema as ss
+from reportbro_designer_api.endpoints.reportbro_api import MEDIA_TYPES
 from reportbro_designer_api.main import app
+from reportbro_designer_api.settings import settings
+from reportbro_designer_api.storage import LocalStorage
 from reportbro_designer_api.storage import S3Storage
+from reportbro_designer_api.storage import StorageMange
 
 client = TestClient(app)
 FPATH = os.path.abspath(os.path.dirname(__file__))
@@ -44,7 +52,12 @@ def backend_test():
     # check template empty
     response = client.get("/api/templates/list")
     assert response.status_code == 200
-    assert response.json() == {"code": 200, "error": "ok", "data": []}
+    assert response.json() == {
+        "code": 200,
+        "error": "ok",
+        "data": [],
+        "nextCursor": None,
+    }
 
     # ----------------------------------------------
     #        check version_id change by same id
@@ -341,7 +354,12 @@ def fixture_default_template():
     # check s3 empty
     response = client.get("/api/templates/list")
     assert response.status_code == 200
-    assert response.json() == {"code": 200, "error": "ok", "data": []}
+    assert response.json() == {
+        "code": 200,
+        "error": "ok",
+        "data": [],
+        "nextCursor": None,
+    }
 
     # create templates
     response = client.put(
@@ -462,6 +480,126 @@ def web_generate_pdf_review(default_template: ss.TemplateDescData):
     with open(out_path + "/generate_data_url.pdf", "wb") as fss:
         fss.write(response.content)
 
+    # presigned url disabled by default, redirect fall back to proxy the file
+    assert rrr.presigned_url is None
+    response = client.get(
+        f"/api/templates/{tid}/generate",
+        params={"key": filekey, "redirect": "true"},
+        follow_redirects=False,
+    )
+    assert response.status_code == 200 and is_pdf(response.content)
+
+    # s3 storage redirect to presigned url
+    settings.PRESIGNED_URL_ENABLED = True
+    try:
+        response = client.put(
+            f"/api/templates/{tid}/generate",
+            json=ss.RequestGenerateTemplate(
+                output_format="pdf",
+                data=data_json,
+            ).dict(),
+        )
+        rrr = ss.TemplateDownLoadResponse(**response.json()).data
+        assert rrr.presigned_url
+        response = client.get(
+            f"/api/templates/{tid}/generate",
+            params={"key": rrr.download_key, "redirect": "true"},
+            follow_redirects=False,
+        )
+        assert response.status_code == 307
+        location = response.headers["location"]
+        assert location.split("?")[0] == rrr.presigned_url.split("?")[0]
+    finally:
+        settings.PRESIGNED_URL_ENABLED = False
+
+
+def web_generate_pdf_job(default_template: ss.TemplateDescData):
+    """Test web api generate pdf in background job."""
+    tid = default_template.tid
+    data_path = FPATH + "/data/default_template_data.json"
+    with open(data_path, "r", encoding="utf8") as fss:
+        data_json = json.loads(fss.read())
+
+    # jobs run on the app loop, keep it alive while polling
+    with TestClient(app) as cli:
+        response = cli.put(
+            f"/api/templates/{tid}/generate/jobs",
+            json=ss.RequestGenerateTemplate(output_format="pdf", data=data_json).dict(),
+        )
+        assert response.status_code == 200
+        job = ss.JobResponse(**response.json()).data
+        assert job.job_id and job.tid == tid and not job.is_done
+
+        for _ in range(100):
+            response = cli.get(f"/api/templates/{tid}/generate/jobs/{job.job_id}")
+            assert response.status_code == 200
+            job = ss.JobResponse(**response.json()).data
+            if job.is_done:
+                break
+            time.sleep(0.1)
+
+        assert job.status == "success" and job.download_key.startswith("key:")
+        response = cli.get(job.download_url)
+        assert is_pdf(response.content)
+
+        response = cli.get(f"/api/templates/{tid}/generate/jobs/error_id")
+        assert response.status_code == 404
+
+
+def web_generate_pdf_batch(default_template: ss.TemplateDescData):
+    """Test web api batch generate pdf."""
+    tid = default_template.tid
+    data_path = FPATH + "/data/default_template_data.json"
+    with open(data_path, "r", encoding="utf8") as fss:
+        data_json = json.loads(fss.read())
+
+    response = client.put(
+        f"/api/templates/{tid}/generate/batch",
+        json=ss.RequestBatchGenerateTemplate(
+            output_format="pdf", datas=[data_json] * 3
+        ).dict(),
+    )
+    assert response.status_code == 200
+    rrr = ss.BatchGenerateResponse(**response.json()).data
+    assert [i.index for i in rrr.items] == [0, 1, 2]
+    assert len({i.download_key for i in rrr.items}) == 3
+    assert all(i.download_key.startswith("key:") and not i.error for i in rrr.items)
+
+    response = client.get(rrr.items[0].download_url)
+    assert is_pdf(response.content)
+
+    # xlsx items downloaded by download_url
+    response = client.put(
+        f"/api/templates/{tid}/generate/batch",
+        json=ss.RequestBatchGenerateTemplate(
+            output_format="xlsx", datas=[data_json] * 2
+        ).dict(),
+    )
+    assert response.status_code == 200
+    rrr = ss.BatchGenerateResponse(**response.json()).data
+    assert all(i.download_key and not i.error for i in rrr.items)
+
+    response = client.get(rrr.items[1].download_url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MEDIA_TYPES["xlsx"]
+    with zipfile.ZipFile(BytesIO(response.content)) as zip_file:
+        assert "xl/workbook.xml" in zip_file.namelist()
+
+    # ndjson body, zip output
+    response = client.put(
+        f"/api/templates/{tid}/generate/batch/ndjson",
+        params={"outputZip": "true"},
+        content="\n".join(json.dumps(data_json) for _ in range(3)),
+    )
+    assert response.status_code == 200
+    rrr = ss.BatchGenerateResponse(**response.json()).data
+    assert len(rrr.items) == 3 and rrr.download_key.startswith("key:")
+
+    response = client.get(rrr.download_url)
+    assert response.status_code == 200
+    with zipfile.ZipFile(BytesIO(response.content)) as zip_file:
+        assert len(zip_file.namelist()) == 3
+
 
 async def web_generate_pdf_mutil(
     s3storage: S3Storage,
@@ -574,6 +712,8 @@ async def test_s3_pdf_generate(
     """Test s3 reportbro api function."""
     assert s3cli
     web_generate_pdf_review(default_template)
+    web_generate_pdf_job(default_template)
+    web_generate_pdf_batch(default_template)
     await web_generate_pdf_mutil(s3storage, default_template)
 
 
@@ -586,6 +726,8 @@ async def test_pgsql_pdf_generate(
     """Test s3 reportbro api function."""
     assert pgsql_cli
     web_generate_pdf_review(default_template)
+    web_generate_pdf_job(default_template)
+    web_generate_pdf_batch(default_template)
     await web_generate_pdf_mutil(s3storage, default_template)
 
 
@@ -598,6 +740,8 @@ async def test_mysql_pdf_generate(
     """Test s3 reportbro api function."""
     assert mysql_cli
     web_generate_pdf_review(default_template)
+    web_generate_pdf_job(default_template)
+    web_generate_pdf_batch(default_template)
     await web_generate_pdf_mutil(s3storage, default_template)
 
 
@@ -610,4 +754,22 @@ async def test_sqlite_pdf_generate(
     """Test s3 reportbro api function."""
     assert sqlite_cli
     web_generate_pdf_review(default_template)
+    web_generate_pdf_job(default_template)
+    web_generate_pdf_batch(default_template)
     await web_generate_pdf_mutil(s3storage, default_template)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_local_batch_generate(
+    sqlite_cli: DBBackend,
+    tmp_path,
+    default_template: ss.TemplateDescData,
+):
+    """Test sqlite batch generate with local storage."""
+    assert sqlite_cli
+    storage = StorageMange(LocalStorage(str(tmp_path), storage_ttl=600))
+    app.dependency_overrides[get_storage_mange] = lambda: storage
+    try:
+        web_generate_pdf_batch(default_template)
+    finally:
+        app.dependency_overrides.pop(get_storage_mange)